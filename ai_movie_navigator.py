@@ -5,10 +5,17 @@ import re
 import json
 from dotenv import load_dotenv
 import google.genai as genai
-from google.genai.types import GenerateContentConfig
+from google.genai.types import GenerateContentConfig, HttpOptions
 from pydantic import BaseModel, Field
 import logging
 
+try:
+    from MovieWebApp.quota import gemini_quota, INTERACTIVE
+    from MovieWebApp.tracing import span, trace_headers
+except ModuleNotFoundError:
+    from quota import gemini_quota, INTERACTIVE
+    from tracing import span, trace_headers
+
 # Load environment variables
 load_dotenv()
 
@@ -19,11 +26,21 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 if not GEMINI_API_KEY:
     client = None
-    print("❌ ERROR: GEMINI_API_KEY IS MISSING or FAILED TO LOAD.") # <--- CHECK YOUR CONSOLE FOR THIS!
+    logging.error("GEMINI_API_KEY is missing or failed to load.")
 else:
-    # Print the last few characters to confirm it loaded (but not the whole key)
-    print(f"✅ GEMINI_API_KEY loaded. Ends with: ...{GEMINI_API_KEY[-4:]}")
+    # Log the last few characters to confirm it loaded (but not the whole key)
+    logging.info(f"GEMINI_API_KEY loaded. Ends with: ...{GEMINI_API_KEY[-4:]}")
     client = genai.Client(api_key=GEMINI_API_KEY)
+
+# One client per rotated key (GEMINI_API_KEYS), created on first use
+_clients = {GEMINI_API_KEY: client} if client else {}
+
+
+def _client_for(api_key):
+    """Return a cached Gemini client for the given key."""
+    if api_key not in _clients:
+        _clients[api_key] = genai.Client(api_key=api_key)
+    return _clients[api_key]
 # -----------------------------
 
 
@@ -39,7 +56,7 @@ class MovieSuggestionList(BaseModel):
     suggestions: list[MovieSuggestion] = Field(description="A list of 5 movies that match the user's request.")
 
 
-def get_ai_movie_suggestions(query, max_suggestions=5):
+def get_ai_movie_suggestions(query, max_suggestions=5, priority=INTERACTIVE):
     """
     Generates structured movie suggestions using the Gemini API,
     reliable for complex queries.
@@ -48,12 +65,17 @@ def get_ai_movie_suggestions(query, max_suggestions=5):
     """
     model_name = "gemini-2.5-flash"
 
-    if not client:
+    if not gemini_quota:
         logging.error("GEMINI_API_KEY is missing or invalid.")
         return ([], "API Key Missing")
     if not query:
         return ([], model_name)
 
+    api_key = gemini_quota.acquire(priority)
+    if api_key is None:
+        logging.error(f"Gemini quota exhausted, skipping query: '{query}'")
+        return ([], "Rate Limited")
+
     try:
         # ... (System Instruction and Config setup remain the same) ...
         system_instruction = (
@@ -66,20 +88,25 @@ def get_ai_movie_suggestions(query, max_suggestions=5):
 
         prompt = f"Suggest {max_suggestions} movies related to '{query}'."
 
+        # Propagate the request's trace ID so Gemini calls can be correlated
+        headers = trace_headers()
+
         config = GenerateContentConfig(
             system_instruction=system_instruction,
             response_mime_type="application/json",
             response_schema=MovieSuggestionList,
-            temperature=0.4
+            temperature=0.4,
+            http_options=HttpOptions(headers=headers) if headers else None
             #max_output_tokens=512,
         )
 
         # 🚀 THE GEMINI API CALL (MODERN SDK)
-        response = client.models.generate_content(
-            model=model_name,
-            contents=prompt,
-            config=config
-        )
+        with span("gemini", model=model_name):
+            response = _client_for(api_key).models.generate_content(
+                model=model_name,
+                contents=prompt,
+                config=config
+            )
 
         # 1. CRITICAL FIX: Check if the response text is None (e.g., due to safety block)
         if response.text is None:
@@ -112,11 +139,11 @@ def get_ai_movie_suggestions(query, max_suggestions=5):
         return (suggestions, model_name)
 
     except Exception as e:
+        # Upstream says this key is over its limit: stop handing it out
+        if "RESOURCE_EXHAUSTED" in str(e) or "429" in str(e):
+            gemini_quota.mark_exhausted(api_key, "minute")
         # Check 3: General API/Connection Error
         logging.error(f"General API error fetching AI suggestions for '{query}': {e}")
-        # === ⚠️ TEMPORARY DIAGNOSTIC LINE ===
-        print(f"⚠️ DIAGNOSTIC ERROR for query '{query[:50]}...': {e}")
-        # ===================================
 
         return ([], "Error")
 
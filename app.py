@@ -7,15 +7,17 @@ Fetches movie details from the OMDb API when adding a movie.
 Includes error handling and logging.
 """
 
-import re
 import os
+import sys
 import secrets
 import logging
-from datetime import datetime
+import functools
+import click
 from pathlib import Path
 from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask import (
-    Flask, render_template, request, redirect, url_for, flash
+    Flask, render_template, request, redirect, url_for, flash, jsonify, abort, session
 )
 import requests
 from ai_movie_navigator import get_ai_movie_suggestions
@@ -25,29 +27,59 @@ from ai_movie_navigator import get_ai_movie_suggestions
 # FLEXIBLE IMPORTS
 # -----------------------------
 try:
-    from MovieWebApp.data_manager import DataManager
-    from MovieWebApp.models import db, User, Movie
+    from MovieWebApp.data_manager import DataManager, VersionConflictError
+    from MovieWebApp.models import db, Movie, upgrade_schema
+    from MovieWebApp.cache import create_cache, cached, cached_view, invalidate_on_commit
+    from MovieWebApp.quota import omdb_quota, quota_stats, INTERACTIVE
+    from MovieWebApp.ratelimit import RouteLimiter, RateLimited
+    from MovieWebApp.profiler import init_profiler
+    from MovieWebApp.imdb_store import imdb_store
+    from MovieWebApp.routing import init_replicas, pinned_to_primary, primary_reads
+    from MovieWebApp.sharding import init_sharding
+    from MovieWebApp.tracing import init_tracing, span, trace_headers
+    from MovieWebApp.outbox import GitHubIssues, enqueue_contact, init_outbox
+    from MovieWebApp.semantic import SemanticIndex
+    from MovieWebApp.assets import init_assets, build_assets
+    from MovieWebApp.compression import init_compression
+    from MovieWebApp.validation import (
+        validate_form, current_year, UserForm, MovieForm, MovieUpdateForm,
+        AiMovieForm, ContactForm, SuggestionQueryForm
+    )
+    from MovieWebApp.export import (
+        EXPORT_FORMATS, export_response, iter_movie_rows, stream_csv, stream_ndjson,
+        write_columnar
+    )
 except ModuleNotFoundError:
-    from data_manager import DataManager
-    from models import db, User, Movie
+    from data_manager import DataManager, VersionConflictError
+    from models import db, Movie, upgrade_schema
+    from cache import create_cache, cached, cached_view, invalidate_on_commit
+    from quota import omdb_quota, quota_stats, INTERACTIVE
+    from ratelimit import RouteLimiter, RateLimited
+    from profiler import init_profiler
+    from imdb_store import imdb_store
+    from routing import init_replicas, pinned_to_primary, primary_reads
+    from sharding import init_sharding
+    from tracing import init_tracing, span, trace_headers
+    from outbox import GitHubIssues, enqueue_contact, init_outbox
+    from semantic import SemanticIndex
+    from assets import init_assets, build_assets
+    from compression import init_compression
+    from validation import (
+        validate_form, current_year, UserForm, MovieForm, MovieUpdateForm,
+        AiMovieForm, ContactForm, SuggestionQueryForm
+    )
+    from export import (
+        EXPORT_FORMATS, export_response, iter_movie_rows, stream_csv, stream_ndjson,
+        write_columnar
+    )
 
 # -----------------------------
 # ENVIRONMENT VARIABLES
 # -----------------------------
 load_dotenv()
-OMDB_API_KEY = os.getenv("OMDB_API_KEY")
 
-if not OMDB_API_KEY:
-    print("⚠️ Warning: OMDB_API_KEY not found. Add it to your .env file.")
-
-# -----------------------------
-# LOGGING CONFIGURATION
-# -----------------------------
-logging.basicConfig(
-    filename="app_errors.log",
-    level=logging.ERROR,
-    format="%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]"
-)
+if not omdb_quota:
+    logging.warning("OMDB_API_KEY not found. Add it to your .env file.")
 
 # -----------------------------
 # FLASK APP & DATABASE CONFIGURATION
@@ -55,6 +87,19 @@ logging.basicConfig(
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY") or secrets.token_hex(16)
 
+# Behind N reverse proxies, take the client address from X-Forwarded-For so
+# rate limits apply per client rather than to the proxy (see ratelimit.py)
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "0"))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
+
+# -----------------------------
+# LOGGING CONFIGURATION
+# -----------------------------
+# JSON logs (app.log) with trace IDs and tail sampling; errors still also go
+# to app_errors.log. Writes happen on a background queue listener thread.
+init_tracing(app, error_log="app_errors.log")
+
 # === 🚀 FIX FOR LONG QUERY POST REQUESTS ===
 # Sets the max content length for POST data to 5 Megabytes.
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024
@@ -65,27 +110,134 @@ DB_PATH = DATA_DIR / "movies.db"
 
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{DB_PATH}"
+app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH}")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# Read replicas: comma-separated URIs, registered as binds "replica_0", "replica_1", ...
+REPLICA_URIS = [
+    uri.strip() for uri in os.getenv("DATABASE_REPLICA_URIS", "").split(",") if uri.strip()
+]
+app.config["SQLALCHEMY_BINDS"] = {
+    f"replica_{index}": uri for index, uri in enumerate(REPLICA_URIS)
+}
+app.config["SQLALCHEMY_REPLICA_BINDS"] = list(app.config["SQLALCHEMY_BINDS"])
+
+# Shards for users and movies: comma-separated URIs, registered as binds
+# "shard_0", "shard_1", ... (see sharding.py). Only append to the list;
+# after changing it run `flask --app app shard-rebalance`.
+SHARD_URIS = [
+    uri.strip() for uri in os.getenv("DATABASE_SHARD_URIS", "").split(",") if uri.strip()
+]
+SHARD_BINDS = {f"shard_{index}": uri for index, uri in enumerate(SHARD_URIS)}
+app.config["SQLALCHEMY_BINDS"].update(SHARD_BINDS)
+app.config["SQLALCHEMY_SHARD_BINDS"] = list(SHARD_BINDS)
+
 db.init_app(app)
+init_replicas(app, db)
+shard_router = init_sharding(app, db)
+
+# SQL statement profiling / N+1 detection (SQL_PROFILE=1 or debug mode)
+init_profiler(app, db)
+
+# Fingerprinted, precompressed static files under /assets (see assets.py)
+init_assets(app)
+
+# gzip / brotli for rendered pages and JSON above COMPRESS_MIN_SIZE bytes
+init_compression(app)
+
+# Bring existing database files up to the current schema (e.g. row versions)
+with app.app_context():
+    db.create_all()
+    upgrade_schema()
 
 # -----------------------------
-# GitHub Cnnfiguration for the contact form
+# GitHub Cnnfiguration for the contact form (see outbox.py)
 # -----------------------------
 GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN")
 REPO_OWNER = "abhisakh"
 REPO_NAME = "MovieWebApp"
 
+# -----------------------------
+# CACHE
+# -----------------------------
+# Comma-separated backend URLs, fastest first, e.g.
+# "memory://,redis://localhost:6379/0" or "memory://,sqlite:///data/cache.db"
+CACHE_URL = os.getenv("CACHE_URL", f"memory://,sqlite:///{DATA_DIR / 'cache.db'}")
+cache = create_cache(CACHE_URL)
+omdb_cache = cache.child("omdb", 24 * 60 * 60)
+gemini_cache = cache.child("gemini", 6 * 60 * 60)
+
+# Rendered anonymous pages (/, /about, /contact). They list users in the
+# sidebar, so any committed user/movie change invalidates them.
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", "30"))
+page_cache = cache.child("pages", PAGE_CACHE_TTL)
+invalidate_on_commit(db.session, cache, {"user": "users", "movie": "movies"})
+if shard_router:
+    invalidate_on_commit(shard_router.session, cache, {"user": "users", "movie": "movies"})
+
+
+def skip_page_cache():
+    """
+    Pages carrying a flash message are per-client and must not be cached;
+    a client pinned to the primary after a write must see it, not a copy
+    another client rendered before (or from a lagging replica).
+    """
+    return "_flashes" in session or pinned_to_primary()
+
+
+# Shared entries are rendered from the primary so replica lag is never cached
+cached_page = cached_view(
+    page_cache, tags=("users", "movies"), unless=skip_page_cache, fill_context=primary_reads
+)
+
+# -----------------------------
+# RATE LIMITS & ADMISSION CONTROL
+# -----------------------------
+# "<requests>/<seconds>" per IP and per user; override with
+# RATE_LIMIT_AI_SUGGEST / MAX_CONCURRENT_AI_SUGGEST etc.
+ai_limiter = RouteLimiter.from_env("ai_suggest", "5/60", max_concurrent=2)
+omdb_limiter = RouteLimiter.from_env("omdb_add", "20/60", max_concurrent=4)
+
+# Only cache real answers, never errors or empty suggestion lists.
+# The semantic index answers paraphrases ("top science fiction films" vs.
+# "best sci-fi movies") from earlier results; the exact cache sits below it.
+# Only misses of both reach Gemini, and only they are rate limited.
+semantic_index = SemanticIndex()
+suggest_movies = semantic_index.cached(unless=lambda result: not result[0])(
+    cached(gemini_cache, unless=lambda result: not result[0])(
+        ai_limiter.limited(get_ai_movie_suggestions)
+    )
+)
+
 # -----------------------------
 # DATA MANAGER
 # -----------------------------
-data_manager = DataManager()
+data_manager = DataManager(cache=cache, shards=shard_router)
+
+# -----------------------------
+# CONTACT OUTBOX
+# -----------------------------
+# The contact form only writes to the outbox table; a background thread
+# creates the GitHub issues (set OUTBOX_DISPATCHER=0 to run it elsewhere)
+github_issues = GitHubIssues(REPO_OWNER, REPO_NAME, GITHUB_TOKEN)
+contact_outbox = init_outbox(app, github_issues)
+
+# -----------------------------
+# VALIDATION HELPER
+# -----------------------------
+def validation_failed(errors, redirect_to):
+    """400 with all errors for JSON clients, otherwise flash the first one."""
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({"errors": errors}), 400
+    flash(errors[0]["message"], "warning")
+    return redirect(redirect_to)
+
 
 # -----------------------------
 # ROUTES
 # -----------------------------
 @app.route("/")
+@cached_page
 def home():
     """Home page: lists all users."""
     try:
@@ -100,17 +252,13 @@ def home():
 @app.route("/users", methods=["POST"])
 def add_user():
     """Add a new user with validation."""
-    name = request.form.get("name", "").strip()
-    try:
-        if not name:
-            flash("⚠️ Name cannot be empty.", "warning")
-            return redirect(url_for("home"))
-
-        if not re.match(r"^[A-Za-z\s]+$", name):
-            flash("⚠️ Name must only contain letters and spaces.", "warning")
-            return redirect(url_for("home"))
+    form, errors = validate_form(UserForm, request.form)
+    if errors:
+        return validation_failed(errors, url_for("home"))
 
-        existing_user = User.query.filter(User.name.ilike(name)).first()
+    name = form.name
+    try:
+        existing_user = data_manager.find_user_by_name(name)
         if existing_user:
             flash(f"⚠️ User '{name}' already exists.", "info")
             return redirect(url_for("home"))
@@ -129,7 +277,9 @@ def add_user():
 def user_movies(user_id):
     """Show movies for a specific user."""
     try:
-        user = User.query.get_or_404(user_id)
+        user = data_manager.get_user(user_id)
+        if user is None:
+            abort(404)
         movies = data_manager.get_movies(user_id)
         users = data_manager.get_users()  # Add users for consistent nav
         return render_template("movies.html", user=user, movies=movies, users=users, request=request)
@@ -142,61 +292,34 @@ def user_movies(user_id):
 @app.route("/users/<int:user_id>/movies", methods=["POST"])
 def add_movie(user_id):
     """Add a movie manually or via OMDb API."""
-    movie_name = request.form.get("movie_name", "").strip()
-    director = request.form.get("director", "").strip()
-    year = request.form.get("year", "").strip()
-    rating = request.form.get("rating", "").strip()
+    form, errors = validate_form(MovieForm, request.form)
+    if errors:
+        return validation_failed(errors, url_for("user_movies", user_id=user_id))
 
+    movie_name = form.movie_name
     try:
-        if not movie_name:
-            flash("⚠️ Please enter a movie name.", "warning")
-            return redirect(url_for("user_movies", user_id=user_id))
-
-        existing = Movie.query.filter(
-            Movie.user_id == user_id,
-            Movie.name.ilike(movie_name)
-        ).first()
+        existing = data_manager.find_movie(user_id, movie_name)
         if existing:
             flash(f"⚠️ Movie '{movie_name}' already exists.", "info")
             return redirect(url_for("user_movies", user_id=user_id))
 
         # Manual input
-        year_val, rating_val = None, None
-        if director or year or rating:
-            if year:
-                if not year.isdigit():
-                    flash("⚠️ Year must be a number.", "warning")
-                    return redirect(url_for("user_movies", user_id=user_id))
-                year_val = int(year)
-                if year_val < 1888 or year_val > datetime.now().year + 1:
-                    flash("⚠️ Please enter a realistic year.", "warning")
-                    return redirect(url_for("user_movies", user_id=user_id))
-
-            if rating:
-                try:
-                    rating_val = float(rating)
-                    if not (0 <= rating_val <= 10):
-                        flash("⚠️ Rating must be between 0 and 10.", "warning")
-                        return redirect(url_for("user_movies", user_id=user_id))
-                except ValueError:
-                    flash("⚠️ Rating must be a valid number.", "warning")
-                    return redirect(url_for("user_movies", user_id=user_id))
-
+        if form.is_manual:
             movie = Movie(
                 name=movie_name,
-                director=director or "Unknown",
-                year=year_val or 0,
-                rating=rating_val or 0.0,
+                director=form.director or "Unknown",
+                year=form.year or 0,
+                rating=form.rating or 0.0,
                 poster_url="",
                 user_id=user_id
             )
-            db.session.add(movie)
-            db.session.commit()
+            data_manager.add_movie(movie)
             flash(f"✅ '{movie.name}' added manually!", "success")
             return redirect(url_for("user_movies", user_id=user_id))
 
-        # OMDb fetch
-        movie, suggestions, added = data_manager.add_movie_from_omdb(movie_name, user_id)
+        # OMDb fetch (multi-second upstream work, so admission-controlled)
+        with omdb_limiter.admit(user_id):
+            movie, suggestions, added = data_manager.add_movie_from_omdb(movie_name, user_id)
         if movie and added:
             flash(f"✅ '{movie.name}' added from OMDb!", "success")
         elif movie and not added:
@@ -210,6 +333,8 @@ def add_movie(user_id):
 
         return redirect(url_for("user_movies", user_id=user_id))
 
+    except RateLimited:
+        raise
     except Exception as e:
         logging.error(e)
         flash("❌ Failed to add movie.", "error")
@@ -219,46 +344,14 @@ def add_movie(user_id):
 @app.route("/users/<int:user_id>/movies/<int:movie_id>/update", methods=["POST"])
 def update_movie(user_id, movie_id):
     """Update movie details with validation."""
-    new_title = request.form.get("new_title", "").strip()
-    new_director = request.form.get("new_director", "").strip()
-    new_year = request.form.get("new_year", "").strip()
-    new_poster = request.form.get("new_poster", "").strip()
-    new_rating = request.form.get("new_rating", "").strip()
+    form, errors = validate_form(MovieUpdateForm, request.form)
+    if errors:
+        return validation_failed(errors, url_for("user_movies", user_id=user_id))
 
     try:
-        year_val, rating_val = None, None
-        if new_year:
-            if not new_year.isdigit():
-                flash("⚠️ Year must be a number.", "warning")
-                return redirect(url_for("user_movies", user_id=user_id))
-            year_val = int(new_year)
-            if year_val < 1888 or year_val > datetime.now().year + 1:
-                flash("⚠️ Please enter a realistic year.", "warning")
-                return redirect(url_for("user_movies", user_id=user_id))
-
-        if new_rating:
-            try:
-                rating_val = float(new_rating)
-                if not (0 <= rating_val <= 10):
-                    flash("⚠️ Rating must be between 0 and 10.", "warning")
-                    return redirect(url_for("user_movies", user_id=user_id))
-            except ValueError:
-                flash("⚠️ Rating must be a valid number.", "warning")
-                return redirect(url_for("user_movies", user_id=user_id))
-
-        if new_poster and not re.match(r"^https?://", new_poster):
-            flash("⚠️ Poster URL must start with http:// or https://", "warning")
-            return redirect(url_for("user_movies", user_id=user_id))
-
-        data = {k: v for k, v in {
-            "name": new_title or None,
-            "director": new_director or None,
-            "year": year_val,
-            "poster_url": new_poster or None,
-            "rating": rating_val
-        }.items() if v is not None}
-
-        updated = data_manager.update_movie(movie_id, **data)
+        updated = data_manager.update_movie(
+            movie_id, form.version, user_id=user_id, **form.changes()
+        )
         if updated:
             flash(f"✅ Movie '{updated.name}' updated successfully!", "success")
         else:
@@ -266,6 +359,17 @@ def update_movie(user_id, movie_id):
 
         return redirect(url_for("user_movies", user_id=user_id))
 
+    except VersionConflictError as conflict:
+        if request.accept_mimetypes.best == "application/json":
+            return jsonify({
+                "error": "version_conflict",
+                "movie_id": movie_id,
+                "expected_version": conflict.expected,
+                "current_version": conflict.current
+            }), 409
+        flash("⚠️ This movie was changed elsewhere. Please review and try again.", "warning")
+        return redirect(url_for("user_movies", user_id=user_id))
+
     except Exception as e:
         logging.error(e)
         flash("❌ Failed to update movie.", "error")
@@ -276,8 +380,10 @@ def update_movie(user_id, movie_id):
 def delete_movie(user_id, movie_id):
     """Delete a movie from user's list."""
     try:
-        data_manager.delete_movie(movie_id)
-        flash("✅ Movie deleted successfully!", "success")
+        if data_manager.delete_movie(movie_id, user_id=user_id):
+            flash("✅ Movie deleted successfully!", "success")
+        else:
+            flash("❌ Failed to delete movie — not found.", "error")
         return redirect(url_for("user_movies", user_id=user_id))
     except Exception as e:
         logging.error(e)
@@ -285,11 +391,170 @@ def delete_movie(user_id, movie_id):
         return redirect(url_for("user_movies", user_id=user_id))
 
 
+# -----------------------------
+# EXPORT ROUTES
+# -----------------------------
+@app.route("/users/<int:user_id>/movies/export.<fmt>")
+def export_user_movies(user_id, fmt):
+    """Download a user's movies as CSV, NDJSON, Parquet or Arrow."""
+    if data_manager.get_user(user_id) is None:
+        abort(404)
+    return export_response(fmt, user_id, session=data_manager.session)
+
+
+@app.route("/movies/export.<fmt>")
+def export_all_movies(fmt):
+    """Download every movie in the database."""
+    return export_response(fmt, session=data_manager.session)
+
+
+@app.cli.command("export-movies")
+@click.option("--format", "fmt", type=click.Choice(list(EXPORT_FORMATS)), default="csv")
+@click.option("--user-id", type=int, default=None, help="Only this user's movies.")
+@click.option("--output", type=click.Path(dir_okay=False), default=None,
+              help="Target file (default: stdout for csv/ndjson).")
+def export_movies_command(fmt, user_id, output):
+    """Stream movies to a file or stdout."""
+    rows = iter_movie_rows(user_id, session=data_manager.session)
+    if fmt in ("parquet", "arrow"):
+        if not output:
+            raise click.UsageError("--output is required for parquet/arrow")
+        count = write_columnar(rows, output, fmt)
+        click.echo(f"✅ Wrote {count} movies to {output}")
+        return
+
+    stream = stream_csv(rows) if fmt == "csv" else stream_ndjson(rows)
+    if output:
+        with open(output, "w", newline="") as handle:
+            handle.writelines(stream)
+        click.echo(f"✅ Exported movies to {output}")
+    else:
+        sys.stdout.writelines(stream)
+
+
+@app.cli.command("ingest-imdb")
+@click.argument("directory", type=click.Path(exists=True, file_okay=False))
+@click.option("--force", is_flag=True, help="Reload files even if unchanged.")
+def ingest_imdb_command(directory, force):
+    """Load IMDb TSV dumps (title.basics, ratings, crew, name.basics) locally."""
+    report = imdb_store.ingest_directory(directory, force=force)
+    for name, rows in report.items():
+        status = "unchanged, skipped" if rows is None else f"{rows} rows"
+        click.echo(f"✅ {name}: {status}")
+
+
+@app.cli.command("deliver-contacts")
+def deliver_contacts_command():
+    """Deliver queued contact messages to GitHub until the outbox is drained."""
+    while True:
+        counts = contact_outbox.run_once()
+        click.echo(", ".join(f"{key}: {value}" for key, value in counts.items()))
+        if counts["claimed"] < contact_outbox.batch_size or counts["deferred"]:
+            break
+
+
+@app.cli.command("build-assets")
+def build_assets_command():
+    """Fingerprint, precompress and resize static files into static/dist."""
+    manifest = build_assets()
+    for logical, built in manifest["files"].items():
+        click.echo(f"✅ {logical} -> {built}")
+    for logical, variants in manifest["images"].items():
+        click.echo(f"✅ {logical} -> {', '.join(v['file'] for v in variants)}")
+
+
+def require_shards():
+    if shard_router is None:
+        raise click.UsageError("Sharding is off; set DATABASE_SHARD_URIS first")
+    return shard_router
+
+
+@app.cli.command("shard-status")
+def shard_status_command():
+    """Show users / movies per shard and how many users await rebalancing."""
+    status = require_shards().status()
+    for name, counts in status["shards"].items():
+        click.echo(f"{name}: {counts['users']} users, {counts['movies']} movies")
+    click.echo(f"Pending moves: {status['pending_moves']}")
+
+
+@app.cli.command("shard-rebalance")
+@click.option("--dry-run", is_flag=True, help="Only list the moves.")
+def shard_rebalance_command(dry_run):
+    """Move users to the shard the hash ring assigns them (after adding shards)."""
+    moves = require_shards().rebalance(dry_run=dry_run)
+    for user_id, source, target in moves:
+        click.echo(f"{'Would move' if dry_run else '✅ Moved'} user {user_id}: {source} -> {target}")
+    click.echo(f"{len(moves)} users {'to move' if dry_run else 'moved'}")
+
+
+@app.cli.command("shard-move")
+@click.argument("user_id", type=int)
+@click.argument("shard")
+def shard_move_command(user_id, shard):
+    """Move one user (and their movies) to SHARD, e.g. shard_2."""
+    try:
+        moved = require_shards().move_user(user_id, shard)
+    except (LookupError, ValueError) as e:
+        raise click.ClickException(str(e))
+    click.echo(f"✅ User {user_id} is on {shard} ({moved} movies moved)")
+
+
+@app.cli.command("shard-import")
+def shard_import_command():
+    """Move users and movies from the unsharded primary database onto the shards."""
+    count = require_shards().import_primary()
+    click.echo(f"✅ Imported {count} users")
+
+
 @app.route("/about")
+@cached_page
 def about():
     return render_template("about.html")
 
 
+# Operational endpoints expose key labels and internals: debug mode, or
+# "Authorization: Bearer $STATS_TOKEN"; everyone else gets a 404
+STATS_TOKEN = os.getenv("STATS_TOKEN")
+
+
+def stats_access(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not app.debug and not (STATS_TOKEN and secrets.compare_digest(supplied, STATS_TOKEN)):
+            abort(404)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@app.route("/cache/stats")
+@stats_access
+def cache_stats():
+    """Hit/miss statistics for every cache namespace."""
+    stats = cache.all_stats()
+    stats["semantic"] = semantic_index.stats()
+    return jsonify(stats)
+
+
+@app.route("/quota/stats")
+@stats_access
+def quota_status():
+    """Remaining upstream API quota per key, plus route admission state."""
+    stats = quota_stats()
+    stats["routes"] = {
+        limiter.name: limiter.stats() for limiter in (ai_limiter, omdb_limiter)
+    }
+    return jsonify(stats)
+
+
+@app.route("/outbox/stats")
+@stats_access
+def outbox_stats():
+    """Contact messages per delivery status."""
+    return jsonify(contact_outbox.stats())
+
+
 # -----------------------------
 # ERROR HANDLERS
 # -----------------------------
@@ -302,6 +567,18 @@ def page_not_found(e):
     return render_template("404.html", request=request, users=users), 404
 
 
+@app.errorhandler(429)
+def too_many_requests(e):
+    """429 Too Many Requests (rate limit or admission control)."""
+    users = data_manager.get_users()
+    response = app.make_response((
+        render_template("429.html", request=request, users=users, message=e.description),
+        429
+    ))
+    response.headers["Retry-After"] = str(getattr(e, "retry_after", 1))
+    return response
+
+
 @app.errorhandler(500)
 def internal_server_error(e):
     """500 Internal Server Error."""
@@ -347,59 +624,36 @@ def inject_globals():
         pass
 
     return {
-        "current_year": datetime.now().year,
+        "current_year": current_year(),
         "users": all_users,
         "current_user": current_user  # <-- NEW: Injects the user object for sidebar
     }
 
 
 # -----------------------------
-# GITHUB ROUTE
+# CONTACT ROUTE
 # -----------------------------
-def save_contact_to_github(name, email, message):
-    url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/issues"
-    headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github+json"
-    }
-    data = {
-        "title": f"Contact: {name} ({email})",
-        "body": message
-    }
-    response = requests.post(url, json=data, headers=headers)
-    return response.status_code == 201  # True if issue created
-
-
 @app.route("/contact", methods=["GET", "POST"])
+@cached_page
 def contact():
     if request.method == "POST":
-        name = request.form.get("name", "").strip()
-        email = request.form.get("email", "").strip()
-        message = request.form.get("message", "").strip()
-
         # -----------------------------
         # VALIDATION
         # -----------------------------
-        if not name:
-            flash("⚠️ Name cannot be empty.", "warning")
-            return redirect(url_for("home"))
-
-        if not re.match(r"^[A-Za-z\s]+$", name):
-            flash("⚠️ Name must only contain letters and spaces.", "warning")
-            return redirect(url_for("home"))
-
-        # Optional: validate email format
-        email_pattern = r"^[\w\.-]+@[\w\.-]+\.\w+$"
-        if not re.match(email_pattern, email):
-            flash("⚠️ Please enter a valid email address.", "warning")
-            return redirect(url_for("contact"))
+        form, errors = validate_form(ContactForm, request.form)
+        if errors:
+            return validation_failed(errors, url_for("contact"))
 
         # -----------------------------
-        # SEND TO GITHUB
+        # QUEUE FOR GITHUB (delivered by the outbox dispatcher)
         # -----------------------------
-        if save_contact_to_github(name, email, message):
+        try:
+            enqueue_contact(form.name, form.email, form.message)
+            contact_outbox.notify()
             flash("✅ Your message has been sent!", "success")
-        else:
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Failed to queue contact message: {e}")
             flash("❌ Failed to send message. Try again later.", "error")
 
         return redirect(url_for("contact"))
@@ -412,18 +666,43 @@ def contact():
 # -----------------------------
 # In your app.py, add this function somewhere before the ai_suggest route
 
-def fetch_omdb_details(title, year=None):
-    """Fetches full movie details (Poster, Rating, Year) from OMDb."""
-    # OMDB_API_KEY is already loaded globally at the top of app.py
-    if not OMDB_API_KEY:
+@cached(omdb_cache, unless=lambda details: details is None)
+def fetch_omdb_details(title, year=None, priority=INTERACTIVE):
+    """
+    Fetches full movie details (Poster, Rating, Year) from OMDb.
+
+    Pages a user is waiting on draw from the full quota; pass
+    priority=BACKGROUND from bulk / batch enrichment so it leaves the
+    reserve to them.
+    """
+    # Local IMDb metadata first; OMDb is then only needed for the poster
+    local = imdb_store.lookup_title(title, year)
+    if local:
+        return {
+            "title": local["title"],
+            "year": local["year"],
+            "director": local["director"],
+            "poster_url": fetch_omdb_poster(local["imdb_id"], priority=priority)
+            or url_for('static', filename='placeholder.jpg'),
+            "rating": local["rating"]
+        }
+
+    api_key = omdb_quota.acquire(priority)
+    if not api_key:
         return None
 
-    params = {'apikey': OMDB_API_KEY, 't': title, 'type': 'movie'}
+    params = {'apikey': api_key, 't': title, 'type': 'movie'}
     if year and year != 0:
         params['y'] = year
 
     try:
-        response = requests.get('http://www.omdbapi.com/', params=params)
+        with span("omdb", title=title):
+            response = requests.get(
+                'https://www.omdbapi.com/', params=params, headers=trace_headers(), timeout=5
+            )
+        if response.status_code == 401 and "limit" in response.text.lower():
+            omdb_quota.mark_exhausted(api_key)
+            return None
         response.raise_for_status()
         data = response.json()
 
@@ -457,57 +736,63 @@ def fetch_omdb_details(title, year=None):
     return None
 
 
+@cached(omdb_cache, unless=lambda poster: poster is None)
+def fetch_omdb_poster(imdb_id, priority=INTERACTIVE):
+    """Fetches only the poster URL for an IMDb ID (None on failure)."""
+    api_key = omdb_quota.acquire(priority)
+    if not api_key:
+        return None
+    try:
+        with span("omdb", imdb_id=imdb_id):
+            response = requests.get(
+                'https://www.omdbapi.com/', params={'apikey': api_key, 'i': imdb_id},
+                headers=trace_headers(), timeout=5
+            )
+        if response.status_code == 401 and "limit" in response.text.lower():
+            omdb_quota.mark_exhausted(api_key)
+            return None
+        response.raise_for_status()
+        poster = response.json().get('Poster', '')
+        return '' if poster == 'N/A' else poster
+    except (requests.RequestException, ValueError) as e:
+        logging.error(f"OMDb poster lookup failed for '{imdb_id}': {e}")
+        return None
+
+
 # -----------------------------
 # AI ROUTE (MODIFIED)
 # -----------------------------
 @app.route("/add_ai_movie", methods=["POST"])
 def add_ai_movie():
     """Adds a movie suggestion to the specified user's list."""
-    user_id_str = request.form.get("user_id")
-    movie_name = request.form.get("movie_name", "").strip()
-    director = request.form.get("director", "").strip()
-    year_str = request.form.get("year", "").strip()
-    rating_str = request.form.get("rating", "").strip()
-    # 💡 ADDED LINE: Extract the poster_url from the submitted form data
-    poster_url = request.form.get("poster_url", "").strip()
+    form, errors = validate_form(AiMovieForm, request.form)
+    if errors:
+        return validation_failed(errors, url_for("ai_suggest"))
 
+    user_id = form.user_id
+    movie_name = form.movie_name
     try:
-        if not user_id_str or not user_id_str.isdigit():
-            flash("❌ Invalid user selected.", "error")
-            return redirect(url_for("ai_suggest"))
-
-        user_id = int(user_id_str)
-
         # Check if movie already exists for this user
-        existing = Movie.query.filter(
-            Movie.user_id == user_id,
-            Movie.name.ilike(movie_name)
-        ).first()
+        existing = data_manager.find_movie(user_id, movie_name)
 
         if existing:
             flash(f"⚠️ Movie '{movie_name}' is already on this user's list.", "info")
             return redirect(url_for("user_movies", user_id=user_id))
 
-        # Prepare data
-        year_val = int(year_str) if year_str and year_str.isdigit() else 0
-        rating_val = float(rating_str) if rating_str else 0.0
-
         # Create the new movie entry
         new_movie = Movie(
             name=movie_name,
-            director=director or "Unknown",
-            year=year_val,
-            rating=rating_val,
+            director=form.director or "Unknown",
+            year=form.year,
+            rating=form.rating,
             # 💡 CORRECTED LINE: Use the poster_url from the form
-            poster_url=poster_url,
+            poster_url=form.poster_url,
             user_id=user_id
         )
 
-        db.session.add(new_movie)
-        db.session.commit()
+        data_manager.add_movie(new_movie)
 
-        # FIX APPLIED for LegacyAPIWarning
-        user_for_flash = db.session.get(User, user_id)
+        user_for_flash = data_manager.get_user(user_id)
 
         flash(f"✅ Movie '{movie_name}' added to {user_for_flash.name}'s list!", "success")
         return redirect(url_for("user_movies", user_id=user_id))
@@ -529,13 +814,14 @@ def ai_suggest():
     model_name = "Unknown"
 
     if request.method == "POST":
-        query = request.form.get("movie_query", "").strip()
-        if not query:
-            flash("⚠️ Please enter a movie name or topic for suggestions.", "warning")
+        form, errors = validate_form(SuggestionQueryForm, request.form)
+        query = form.movie_query if form else ""
+        if errors:
+            flash(errors[0]["message"], "warning")
         else:
             try:
                 # 1. GET RAW SUGGESTIONS (Title, Year, Director) FROM GEMINI
-                result = get_ai_movie_suggestions(query)
+                result = suggest_movies(query)
                 if isinstance(result, tuple):
                     raw_suggestions, model_name = result
                 else:
@@ -570,6 +856,8 @@ def ai_suggest():
                 if not enriched_suggestions:
                     flash("❌ Failed to find any detailed movie suggestions. Try a different query.", "error")
 
+            except RateLimited:
+                raise
             except Exception as e:
                 logging.error(f"AI suggestion error: {e}")
                 flash("❌ Failed to communicate with the AI model or OMDb.", "error")
@@ -0,0 +1,320 @@
+# assets.py
+"""
+Assets - Fingerprinted, precompressed static files with far-future caching.
+
+build_assets() copies every file in static/ to static/dist/ under a
+content-hashed name (style.css -> style.3f9a0c1be2.css), writes .gz and
+.br siblings for text assets, and turns large images into responsive WebP
+sizes. A manifest.json maps the logical names to the built files.
+
+/assets/<file> serves the build: the brotli or gzip variant when the
+client's Accept-Encoding allows it, with
+"Cache-Control: public, max-age=31536000, immutable". A changed file gets
+a new name, so browsers never revalidate and repeat visits transfer no
+asset bytes at all.
+
+Templates use asset_url("style.css") and asset_srcset("movie_welcome.jpg");
+both fall back to the plain /static URL when no build exists.
+
+Builds hold a file lock, so concurrent workers never interleave writes or
+prune each other's output. Files dropped from the manifest stay on disk for
+ASSETS_GRACE_SECONDS: workers still holding the old manifest and cached
+pages keep linking to them until they pick up the new build.
+
+In production build through the CLI (ASSETS_AUTOBUILD defaults to on only
+under debug, where static/ is also re-checked every few seconds).
+
+Pillow (WebP) and brotli are optional; without them those outputs are
+skipped. Usage:
+    flask --app app build-assets
+"""
+
+import os
+import io
+import sys
+import gzip
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import mimetypes
+from contextlib import contextmanager
+from pathlib import Path
+from flask import abort, request, send_file, url_for
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not serialized across processes
+    fcntl = None
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # optional: no WebP variants
+    Image = None
+
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+DIST_DIRNAME = "dist"
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".build.lock"
+
+# How long outputs of a previous build outlive it (old manifests, cached pages)
+ASSETS_GRACE_SECONDS = float(os.getenv("ASSETS_GRACE_SECONDS", str(24 * 60 * 60)))
+# Debug only: minimum seconds between checks of static/ for edits
+DEBUG_CHECK_SECONDS = 2.0
+
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt", ".html", ".map"}
+IMAGE_TYPES = {".jpg", ".jpeg", ".png"}
+RESPONSIVE_WIDTHS = (480, 960, 1600)
+RESPONSIVE_MIN_BYTES = 100 * 1024   # smaller images are only fingerprinted
+WEBP_QUALITY = 80
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def _fingerprinted(name: str, digest: str) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{digest}{ext}"
+
+
+def _write(path: Path, data: bytes) -> None:
+    """Write atomically (unique temp file + rename) so no one serves half a file."""
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.",
+                                     suffix=".tmp", delete=False) as tmp:
+        tmp.write(data)
+    try:
+        os.replace(tmp.name, path)
+    except OSError:
+        os.unlink(tmp.name)
+        raise
+
+
+@contextmanager
+def _build_lock(dist: Path):
+    """Exclusive lock on dist/ for one build + prune, across processes."""
+    with open(dist / LOCK_NAME, "a") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _precompress(path: Path, data: bytes) -> None:
+    """Write .gz / .br next to path when they are actually smaller."""
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        _write(path.with_name(path.name + ".gz"), gz)
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            _write(path.with_name(path.name + ".br"), br)
+
+
+def _responsive_webp(source: Path, data: bytes, dist: Path) -> list[dict]:
+    """WebP copies of an image at RESPONSIVE_WIDTHS (never upscaled)."""
+    if Image is None:
+        logging.warning(f"Pillow not installed; no WebP variants for {source.name}")
+        return []
+    variants = []
+    with Image.open(io.BytesIO(data)) as image:
+        # Skip sizes within 10% of the original, which is always included
+        widths = [w for w in RESPONSIVE_WIDTHS if w < image.width * 0.9] + [image.width]
+        for width in sorted(set(widths)):
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+            buffer = io.BytesIO()
+            resized.save(buffer, "WEBP", quality=WEBP_QUALITY, method=6)
+            webp = buffer.getvalue()
+            name = _fingerprinted(f"{source.stem}-{width}w.webp", _digest(webp))
+            _write(dist / name, webp)
+            variants.append({"file": name, "width": width, "height": height})
+    return variants
+
+
+# -----------------------------
+# BUILD
+# -----------------------------
+def build_assets(static_dir: Path = STATIC_DIR) -> dict:
+    """Build static/dist and its manifest; return the manifest."""
+    static_dir = Path(static_dir)
+    dist = static_dir / DIST_DIRNAME
+    dist.mkdir(parents=True, exist_ok=True)
+    with _build_lock(dist):
+        return _build(static_dir, dist)
+
+
+def _build(static_dir: Path, dist: Path) -> dict:
+    # Re-read under the lock: another process may have just built
+    previous = load_manifest(static_dir)
+    manifest = {"files": {}, "images": {}, "sources": {}, "retired": {}}
+    for source in sorted(static_dir.rglob("*")):
+        if not source.is_file() or dist in source.parents:
+            continue
+        logical = source.relative_to(static_dir).as_posix()
+        stat = source.stat()
+        signature = [stat.st_size, stat.st_mtime]
+
+        # Unchanged since the last build and its outputs still exist
+        old_file = previous.get("files", {}).get(logical)
+        if previous.get("sources", {}).get(logical) == signature and old_file \
+                and (dist / old_file).exists():
+            manifest["files"][logical] = old_file
+            if logical in previous.get("images", {}):
+                manifest["images"][logical] = previous["images"][logical]
+            manifest["sources"][logical] = signature
+            continue
+
+        data = source.read_bytes()
+        built = _fingerprinted(logical, _digest(data))
+        target = dist / built
+        target.parent.mkdir(parents=True, exist_ok=True)
+        _write(target, data)
+        suffix = source.suffix.lower()
+        if suffix in COMPRESSIBLE:
+            _precompress(target, data)
+        if suffix in IMAGE_TYPES and len(data) >= RESPONSIVE_MIN_BYTES:
+            manifest["images"][logical] = _responsive_webp(source, data, dist)
+        manifest["files"][logical] = built
+        manifest["sources"][logical] = signature
+
+    # Outputs the new build dropped stay servable for the grace period
+    now = time.time()
+    current = _outputs(manifest)
+    retired = {name: at for name, at in previous.get("retired", {}).items()
+               if at > now - ASSETS_GRACE_SECONDS and name not in current}
+    for name in _outputs(previous) - current:
+        retired.setdefault(name, now)
+    manifest["retired"] = retired
+
+    _write(dist / MANIFEST_NAME, json.dumps(manifest, indent=2).encode("utf-8"))
+    _prune(dist, current | set(retired))
+    return manifest
+
+
+def _outputs(manifest: dict) -> set:
+    """Every built file a manifest links to."""
+    files = set(manifest.get("files", {}).values())
+    for variants in manifest.get("images", {}).values():
+        files.update(v["file"] for v in variants)
+    return files
+
+
+def _prune(dist: Path, keep: set) -> None:
+    """Remove build outputs (and stray temp files) not in keep."""
+    keep = keep | {MANIFEST_NAME, LOCK_NAME}
+    for path in dist.rglob("*"):
+        if not path.is_file():
+            continue
+        name = path.relative_to(dist).as_posix()
+        base = name[:-3] if name.endswith((".gz", ".br")) else name
+        if base not in keep:
+            path.unlink(missing_ok=True)
+
+
+def load_manifest(static_dir: Path = STATIC_DIR) -> dict:
+    path = Path(static_dir) / DIST_DIRNAME / MANIFEST_NAME
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _is_stale(static_dir: Path, manifest: dict) -> bool:
+    sources = manifest.get("sources", {})
+    dist = static_dir / DIST_DIRNAME
+    current = {}
+    for source in static_dir.rglob("*"):
+        if source.is_file() and dist not in source.parents:
+            stat = source.stat()
+            current[source.relative_to(static_dir).as_posix()] = [stat.st_size, stat.st_mtime]
+    return current != sources
+
+
+# -----------------------------
+# FLASK INTEGRATION
+# -----------------------------
+def _preferred_encoding(path: Path) -> str | None:
+    """'br' or 'gzip' if the client accepts it and a precompressed file exists."""
+    for encoding, ext in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[encoding] > 0 and path.with_name(path.name + ext).exists():
+            return encoding
+    return None
+
+
+def init_assets(app, static_dir: Path = STATIC_DIR) -> dict:
+    """
+    Register /assets/<file> and the asset_url / asset_srcset template
+    helpers. Under debug (or ASSETS_AUTOBUILD=1) builds the assets first
+    when static/ changed since the last build; otherwise run
+    `flask build-assets` as a deploy step.
+    """
+    static_dir = Path(static_dir)
+    dist = (static_dir / DIST_DIRNAME).resolve()
+    state = {"manifest": load_manifest(static_dir), "checked": time.monotonic()}
+
+    autobuild = os.getenv("ASSETS_AUTOBUILD", "1" if app.debug else "0") != "0"
+    if autobuild and _is_stale(static_dir, state["manifest"]):
+        try:
+            state["manifest"] = build_assets(static_dir)
+        except OSError as e:
+            logging.error(f"Asset build failed, serving plain static files: {e}")
+
+    def asset_url(name: str) -> str:
+        built = state["manifest"].get("files", {}).get(name)
+        if built is None:
+            return url_for("static", filename=name)
+        return url_for("assets", filename=built)
+
+    def asset_srcset(name: str) -> str:
+        variants = state["manifest"].get("images", {}).get(name) or []
+        return ", ".join(
+            f"{url_for('assets', filename=v['file'])} {v['width']}w" for v in variants
+        )
+
+    @app.route("/assets/<path:filename>")
+    def assets(filename):
+        path = (dist / filename).resolve()
+        if dist not in path.parents or not path.is_file() or filename in (MANIFEST_NAME, LOCK_NAME):
+            abort(404)
+
+        encoding = _preferred_encoding(path)
+        served = path.with_name(path.name + {"br": ".br", "gzip": ".gz"}[encoding]) if encoding else path
+        mimetype = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        response = send_file(served, mimetype=mimetype, etag=False, conditional=False, max_age=None)
+        # The name is the content hash, so it doubles as the ETag
+        response.set_etag(f"{path.name}-{encoding or 'identity'}")
+        response.headers["Cache-Control"] = IMMUTABLE
+        response.vary.add("Accept-Encoding")
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        return response.make_conditional(request)
+
+    @app.before_request
+    def _rebuild_in_debug():
+        # The reloader only watches Python files; pick up CSS/JS edits too
+        if not app.debug or time.monotonic() - state["checked"] < DEBUG_CHECK_SECONDS:
+            return
+        state["checked"] = time.monotonic()
+        if _is_stale(static_dir, state["manifest"]):
+            state["manifest"] = build_assets(static_dir)
+
+    app.jinja_env.globals.update(asset_url=asset_url, asset_srcset=asset_srcset)
+    return state["manifest"]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    result = build_assets(Path(sys.argv[1]) if len(sys.argv) > 1 else STATIC_DIR)
+    print(json.dumps(result["files"], indent=2))
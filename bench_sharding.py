@@ -0,0 +1,88 @@
+# bench_sharding.py
+"""
+Benchmark: write throughput with 1, 2 and 4 SQLite shards (sharding.py).
+
+Worker processes add movies one commit at a time (like the add-movie
+route) for users spread over all shards. With one shard every commit
+waits for the same database lock; with N shards up to N commits run at
+once, so throughput should grow roughly with the shard count until the
+disk or the CPU saturates.
+
+Run:
+    python bench_sharding.py [workers] [movies_per_worker]
+"""
+
+import sys
+import time
+import tempfile
+import multiprocessing
+from pathlib import Path
+from flask import Flask
+
+from models import db, Movie
+from sharding import init_sharding
+from data_manager import DataManager
+
+USERS = 64
+
+
+def make_app(directory: Path, shards: int) -> Flask:
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{directory / 'primary.db'}"
+    app.config["SQLALCHEMY_BINDS"] = {
+        f"shard_{index}": {
+            "url": f"sqlite:///{directory / f'shard_{index}.db'}",
+            "connect_args": {"timeout": 60},
+        }
+        for index in range(shards)
+    }
+    app.config["SQLALCHEMY_SHARD_BINDS"] = list(app.config["SQLALCHEMY_BINDS"])
+    db.init_app(app)
+    return app
+
+
+def worker(directory: Path, shards: int, user_ids: list[int], count: int, offset: int) -> None:
+    app = make_app(directory, shards)
+    manager = DataManager(shards=init_sharding(app, db))
+    with app.app_context():
+        for index in range(count):
+            user_id = user_ids[(offset + index) % len(user_ids)]
+            manager.add_movie(Movie(
+                name=f"Movie {offset}-{index}", director="Unknown", year=2000,
+                rating=5.0, poster_url="", user_id=user_id
+            ))
+            manager.session.remove()
+
+
+def run(shards: int, workers: int, count: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        app = make_app(directory, shards)
+        manager = DataManager(shards=init_sharding(app, db))
+        with app.app_context():
+            db.create_all()
+            user_ids = manager.bulk_create_users([f"User {i}" for i in range(USERS)])
+
+        processes = [
+            multiprocessing.Process(target=worker, args=(directory, shards, user_ids, count, n * count))
+            for n in range(workers)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return workers * count / (time.perf_counter() - start)
+
+
+def main(workers: int = 8, count: int = 200):
+    print(f"{'shards':<8}{'writes/s':>10}{'speedup':>10}")
+    baseline = None
+    for shards in (1, 2, 4):
+        rate = run(shards, workers, count)
+        baseline = baseline or rate
+        print(f"{shards:<8}{rate:>10.0f}{rate / baseline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,97 @@
+# bench_validation.py
+"""
+Micro-benchmark: schema validation (validation.py) vs. the previous
+hand-written checks in app.py, on typical add/update movie payloads.
+
+Run:
+    python bench_validation.py
+"""
+
+import re
+import timeit
+from datetime import datetime
+
+from validation import validate_form, MovieForm, MovieUpdateForm, UserForm
+
+ADD_PAYLOAD = {"movie_name": "Inception", "director": "Christopher Nolan",
+               "year": "2010", "rating": "8.8"}
+UPDATE_PAYLOAD = {"new_title": "Inception", "new_year": "2010",
+                  "new_poster": "https://example.com/p.jpg", "new_rating": "8.8",
+                  "version": "3"}
+USER_PAYLOAD = {"name": "Abhi Sakh"}
+
+
+# -----------------------------
+# PREVIOUS IMPLEMENTATION (inlined from app.py)
+# -----------------------------
+def legacy_add(form):
+    movie_name = form.get("movie_name", "").strip()
+    year = form.get("year", "").strip()
+    rating = form.get("rating", "").strip()
+    if not movie_name:
+        return None
+    year_val = rating_val = None
+    if year:
+        if not year.isdigit():
+            return None
+        year_val = int(year)
+        if year_val < 1888 or year_val > datetime.now().year + 1:
+            return None
+    if rating:
+        try:
+            rating_val = float(rating)
+            if not (0 <= rating_val <= 10):
+                return None
+        except ValueError:
+            return None
+    return movie_name, year_val, rating_val
+
+
+def legacy_update(form):
+    new_year = form.get("new_year", "").strip()
+    new_rating = form.get("new_rating", "").strip()
+    new_poster = form.get("new_poster", "").strip()
+    year_val = rating_val = None
+    if new_year:
+        if not new_year.isdigit():
+            return None
+        year_val = int(new_year)
+        if year_val < 1888 or year_val > datetime.now().year + 1:
+            return None
+    if new_rating:
+        try:
+            rating_val = float(new_rating)
+            if not (0 <= rating_val <= 10):
+                return None
+        except ValueError:
+            return None
+    if new_poster and not re.match(r"^https?://", new_poster):
+        return None
+    return year_val, rating_val
+
+
+def legacy_user(form):
+    name = form.get("name", "").strip()
+    if not name or not re.match(r"^[A-Za-z\s]+$", name):
+        return None
+    return name
+
+
+def main(number: int = 50_000):
+    cases = [
+        ("add movie", lambda: legacy_add(ADD_PAYLOAD),
+         lambda: validate_form(MovieForm, ADD_PAYLOAD)),
+        ("update movie", lambda: legacy_update(UPDATE_PAYLOAD),
+         lambda: validate_form(MovieUpdateForm, UPDATE_PAYLOAD)),
+        ("add user", lambda: legacy_user(USER_PAYLOAD),
+         lambda: validate_form(UserForm, USER_PAYLOAD)),
+    ]
+    print(f"{'payload':<14}{'legacy µs':>12}{'schema µs':>12}")
+    for name, legacy, schema in cases:
+        legacy_us = timeit.timeit(legacy, number=number) / number * 1e6
+        schema_us = timeit.timeit(schema, number=number) / number * 1e6
+        print(f"{name:<14}{legacy_us:>12.2f}{schema_us:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
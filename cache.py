@@ -0,0 +1,709 @@
+# cache.py
+"""
+Cache - Multi-tier cache with pluggable backends.
+
+A Cache reads through an ordered list of backends (e.g. in-process LRU in
+front of a SQLite file or Redis) and back-fills the faster tiers on a hit.
+Entries can carry tags; bumping a tag invalidates every entry stamped with
+it, in every tier and every worker process sharing the slower tiers.
+
+Backends:
+    MemoryBackend  - in-process LRU with per-entry TTL
+    SQLiteBackend  - single file, shared between worker processes
+    RedisBackend   - speaks the Redis protocol (RESP) over a plain socket
+
+Build one from a URL list with create_cache("memory://,sqlite:///data/cache.db").
+"""
+
+import functools
+import hashlib
+import logging
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+
+_MISSING = object()
+_TAG_PREFIX = "__tag__:"
+
+
+# -----------------------------
+# BACKENDS
+# -----------------------------
+class CacheBackend:
+    """Storage interface every tier implements. Keys are plain strings."""
+
+    name = "backend"
+
+    def get_many(self, keys: list[str]) -> dict:
+        """Return {key: value} for the keys that are present and not expired."""
+        raise NotImplementedError
+
+    def set_many(self, mapping: dict, ttl: float | None = None) -> None:
+        """Store every key/value pair, expiring after ttl seconds if given."""
+        raise NotImplementedError
+
+    def delete_many(self, keys: list[str]) -> None:
+        """Remove the given keys (missing keys are ignored)."""
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        """Atomically increment an integer counter and return the new value."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Thread-safe in-process LRU cache.
+
+    Tag versions are kept outside the LRU: evicting one would reset the tag
+    to version 0 and revive entries stamped with an older version.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (expires_at | None, value)
+        self._tags = {}             # tag key -> version, never evicted
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key.startswith(_TAG_PREFIX):
+                    if key in self._tags:
+                        found[key] = self._tags[key]
+                    continue
+                item = self._data.get(key)
+                if item is None:
+                    continue
+                expires_at, value = item
+                if expires_at is not None and expires_at <= now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, mapping, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            for key, value in mapping.items():
+                self._data[key] = (expires_at, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+                self._tags.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            if key.startswith(_TAG_PREFIX):
+                value = self._tags[key] = self._tags.get(key, 0) + 1
+                return value
+            expires_at, value = self._data.get(key, (None, 0))
+            value = int(value) + 1
+            self._data[key] = (expires_at, value)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Cache stored in a SQLite file; safe to share between processes.
+
+    Every purge_every writes (per process) expired rows are deleted and the
+    table is trimmed to max_entries, oldest writes first. Tag versions are
+    never trimmed.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, table: str = "cache", max_entries: int = 10000,
+                 purge_every: int = 500):
+        self.path = str(path)
+        self.table = table
+        self.max_entries = max_entries
+        self.purge_every = purge_every
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection (sqlite3 objects are not thread-safe)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys):
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        rows = self._connect().execute(
+            f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders}) "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (*keys, time.time())
+        ).fetchall()
+        return {key: pickle.loads(value) for key, value in rows}
+
+    def set_many(self, mapping, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) "
+                "VALUES (?, ?, ?)",
+                [(key, pickle.dumps(value), expires_at) for key, value in mapping.items()]
+            )
+        with self._writes_lock:
+            self._writes += len(mapping)
+            due = self._writes >= self.purge_every
+            if due:
+                self._writes = 0
+        if due:
+            self.purge_expired()
+
+    def delete_many(self, keys):
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                f"DELETE FROM {self.table} WHERE key = ?", [(key,) for key in keys]
+            )
+
+    def incr(self, key):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                f"SELECT value FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            value = (pickle.loads(row[0]) if row else 0) + 1
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) "
+                "VALUES (?, ?, NULL)",
+                (key, pickle.dumps(value))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def purge_expired(self) -> int:
+        """
+        Delete expired rows, then the oldest rows beyond max_entries.
+        Returns how many rows were removed.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN")
+            removed = conn.execute(
+                f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (time.time(),)
+            ).rowcount
+            # INSERT OR REPLACE gives a new rowid, so low rowids are the oldest writes
+            removed += conn.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN ("
+                f"SELECT rowid FROM {self.table} WHERE key NOT GLOB ? ORDER BY rowid "
+                f"LIMIT max(0, (SELECT COUNT(*) FROM {self.table} WHERE key NOT GLOB ?) - ?))",
+                (f"{_TAG_PREFIX}*", f"{_TAG_PREFIX}*", self.max_entries)
+            ).rowcount
+        return removed
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute(f"DELETE FROM {self.table}")
+
+
+class RedisBackend(CacheBackend):
+    """
+    Minimal Redis client using the RESP protocol directly.
+
+    Only GET/MGET/SET/DEL/INCR/FLUSHDB are used, so any Redis-compatible
+    server (or a small local stand-in) works.
+    """
+
+    name = "redis"
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0,
+                 password: str | None = None, timeout: float = 2.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    # --- protocol helpers ---
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+            if self.password:
+                self._command("AUTH", self.password)
+            if self.db:
+                self._command("SELECT", str(self.db))
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn[0].close()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RuntimeError(f"Redis error: {payload.decode()}")
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            if count == -1:
+                return None
+            return [self._read_reply(reader) for _ in range(count)]
+        raise RuntimeError(f"Unexpected Redis reply: {line!r}")
+
+    def _command(self, *args):
+        sock, reader = self._connection()
+        try:
+            sock.sendall(self._encode(*args))
+            return self._read_reply(reader)
+        except (OSError, ConnectionError):
+            self._reset()
+            raise
+
+    # --- backend API ---
+    def get_many(self, keys):
+        if not keys:
+            return {}
+        values = self._command("MGET", *keys)
+        return {
+            # Tag versions are native Redis integers (see incr)
+            key: int(value) if key.startswith(_TAG_PREFIX) else pickle.loads(value)
+            for key, value in zip(keys, values) if value is not None
+        }
+
+    def set_many(self, mapping, ttl=None):
+        for key, value in mapping.items():
+            if ttl:
+                self._command("SET", key, pickle.dumps(value), "PX", int(ttl * 1000))
+            else:
+                self._command("SET", key, pickle.dumps(value))
+
+    def delete_many(self, keys):
+        if keys:
+            self._command("DEL", *keys)
+
+    def incr(self, key):
+        return self._command("INCR", key)
+
+    def clear(self):
+        self._command("FLUSHDB")
+
+
+# -----------------------------
+# CACHE FRONT-END
+# -----------------------------
+class CacheStats:
+    """Hit/miss counters for one namespace."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.deletes = 0
+        self.errors = 0
+        self.tier_hits = {}
+        self._lock = threading.Lock()
+
+    def record(self, field: str, amount: int = 1, tier: str | None = None):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+            if tier:
+                self.tier_hits[tier] = self.tier_hits.get(tier, 0) + amount
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "sets": self.sets,
+            "deletes": self.deletes,
+            "errors": self.errors,
+            "tier_hits": dict(self.tier_hits),
+        }
+
+
+class Cache:
+    """
+    Read-through cache over one or more backends.
+
+    Values are stored as (value, {tag: version}, expires_at) so that tag
+    invalidation works without scanning keys: an entry is stale as soon as
+    any of its tag versions moved on. expires_at (wall clock, None = never)
+    lets back-filled copies in faster tiers expire with the original.
+    """
+
+    def __init__(self, backends: list[CacheBackend], namespace: str = "default",
+                 default_ttl: float | None = 300, _registry: dict | None = None):
+        self.backends = backends
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        self._registry = _registry if _registry is not None else {}
+        self._registry.setdefault(namespace, CacheStats())
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._registry[self.namespace]
+
+    def child(self, namespace: str, default_ttl: float | None = _MISSING) -> "Cache":
+        """Return a cache sharing the same backends under another namespace."""
+        ttl = self.default_ttl if default_ttl is _MISSING else default_ttl
+        return Cache(self.backends, namespace, ttl, self._registry)
+
+    def all_stats(self) -> dict:
+        """Return stats for every namespace created from this cache."""
+        return {name: stats.as_dict() for name, stats in self._registry.items()}
+
+    # --- key helpers ---
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f"{_TAG_PREFIX}{tag}"
+
+    def _tag_versions(self, tags) -> dict:
+        """Return the current version of each tag (0 if never invalidated)."""
+        if not tags:
+            return {}
+        keys = [self._tag_key(tag) for tag in tags]
+        # Tag versions live in the slowest (shared) tier so every worker agrees
+        found = self._safe(self.backends[-1].get_many, keys) or {}
+        return {tag: found.get(self._tag_key(tag), 0) for tag in tags}
+
+    def _safe(self, func, *args):
+        """Run a backend call; a broken tier must never break a request."""
+        try:
+            return func(*args)
+        except Exception as e:
+            self.stats.record("errors")
+            logging.error(f"Cache backend error in '{self.namespace}': {e}")
+            return None
+
+    # --- public API ---
+    def get(self, key: str, default=None):
+        """Return the cached value for key, or default."""
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys: list[str]) -> dict:
+        """Return {key: value} for the keys found in any tier."""
+        wanted = {self._key(key): key for key in keys}
+        found = {}
+        missing = list(wanted)
+        for index, backend in enumerate(self.backends):
+            if not missing:
+                break
+            hits = self._safe(backend.get_many, missing) or {}
+            if not hits:
+                continue
+            found.update({k: (index, v) for k, v in hits.items()})
+            missing = [k for k in missing if k not in hits]
+
+        # Drop entries whose tags were invalidated since they were written
+        all_tags = {tag for _, entry in found.values() for tag in entry[1]}
+        current = self._tag_versions(all_tags)
+        result = {}
+        backfill = {}
+        now = time.time()
+        for full_key, (index, entry) in found.items():
+            if len(entry) == 2:
+                # Written before entries carried their expiry
+                entry = (*entry, now + self.default_ttl if self.default_ttl else None)
+            value, tags, expires_at = entry
+            if any(current.get(tag, 0) != version for tag, version in tags.items()):
+                continue
+            if expires_at is not None and expires_at <= now:
+                continue
+            result[wanted[full_key]] = value
+            self.stats.record("hits", tier=self.backends[index].name)
+            # Faster tiers keep the copy only for the time the entry has left
+            ttl = None if expires_at is None else expires_at - now
+            for faster in range(index):
+                backfill.setdefault((faster, ttl), {})[full_key] = entry
+
+        for (index, ttl), mapping in backfill.items():
+            self._safe(self.backends[index].set_many, mapping, ttl)
+
+        self.stats.record("misses", len(keys) - len(result))
+        return result
+
+    def set(self, key: str, value, ttl: float | None = _MISSING, tags=None) -> None:
+        """Store value under key in every tier."""
+        self.set_many({key: value}, ttl=ttl, tags=tags)
+
+    def set_many(self, mapping: dict, ttl: float | None = _MISSING, tags=None) -> None:
+        """Store several values sharing the same TTL and tags."""
+        ttl = self.default_ttl if ttl is _MISSING else ttl
+        stamped = self._tag_versions(tags or [])
+        expires_at = time.time() + ttl if ttl else None
+        entries = {
+            self._key(key): (value, stamped, expires_at) for key, value in mapping.items()
+        }
+        for backend in self.backends:
+            self._safe(backend.set_many, entries, ttl)
+        self.stats.record("sets", len(entries))
+
+    def delete(self, key: str) -> None:
+        """Remove key from every tier."""
+        self.delete_many([key])
+
+    def delete_many(self, keys: list[str]) -> None:
+        """Remove several keys from every tier."""
+        full_keys = [self._key(key) for key in keys]
+        for backend in self.backends:
+            self._safe(backend.delete_many, full_keys)
+        self.stats.record("deletes", len(full_keys))
+
+    def invalidate_tags(self, *tags: str) -> None:
+        """Invalidate every entry (in any namespace) stamped with these tags."""
+        for tag in tags:
+            self._safe(self.backends[-1].incr, self._tag_key(tag))
+
+    def clear(self) -> None:
+        """Drop everything in every tier (all namespaces)."""
+        for backend in self.backends:
+            self._safe(backend.clear)
+
+
+# -----------------------------
+# DECORATORS
+# -----------------------------
+def make_key(func, args, kwargs) -> str:
+    """Build a stable cache key from a function and its arguments."""
+    raw = repr((args, sorted(kwargs.items())))
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    return f"{func.__module__}.{func.__qualname__}:{digest}"
+
+
+def cached(cache, ttl: float | None = _MISSING, tags=None, unless=None):
+    """
+    Cache a function's return value.
+
+    cache may be a Cache instance, or - for DataManager methods - the name of
+    an attribute on self holding one (e.g. @cached("omdb_cache")), in which
+    case self is not part of the key and a missing cache means no caching.
+
+    unless(result) -> bool lets callers skip caching failures/empty results.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if isinstance(cache, str):
+                target = getattr(args[0], cache, None) if args else None
+                key_args = args[1:]
+            else:
+                target = cache
+                key_args = args
+            if target is None:
+                return func(*args, **kwargs)
+
+            key = make_key(func, key_args, kwargs)
+            value = target.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            value = func(*args, **kwargs)
+            if unless is None or not unless(value):
+                target.set(key, value, ttl=ttl, tags=tags)
+            return value
+        return wrapper
+    return decorator
+
+
+def cached_view(cache, ttl: float | None = _MISSING, tags=None, unless=None, vary_on=(),
+                fill_context=None):
+    """
+    Cache a Flask view's rendered response for GET requests.
+
+    The key is the request path plus the query args named in vary_on (the
+    ones that change the page); a request carrying any other query arg
+    bypasses the cache, so junk query strings cannot fill it with copies
+    of one page and debug switches (?sql_debug=1) are never served stale.
+    Only 200 responses are stored. unless() -> bool can veto caching per request
+    (e.g. when there are pending flash messages). Responses whose rendering
+    changed the session (e.g. consumed a flash message) are not stored.
+    fill_context() -> context manager wraps the view on a miss, e.g. to
+    render entries shared by every client from the primary database.
+    """
+    from flask import current_app, request, make_response, session
+    from urllib.parse import urlencode
+
+    vary_on = frozenset(vary_on)
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if (request.method != "GET" or not vary_on.issuperset(request.args)
+                    or (unless is not None and unless())):
+                return view(*args, **kwargs)
+
+            key = f"view:{request.path}"
+            if request.args:
+                key += "?" + urlencode(sorted(request.args.items(multi=True)))
+            hit = cache.get(key)
+            if hit is not None:
+                body, status, headers = hit
+                # Stored headers already carry the Content-Type
+                response = current_app.response_class(body, status, headers=headers)
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            if fill_context is None:
+                response = make_response(view(*args, **kwargs))
+            else:
+                with fill_context():
+                    response = make_response(view(*args, **kwargs))
+            if (response.status_code == 200 and not response.direct_passthrough
+                    and not getattr(session, "modified", False)):
+                headers = [(k, v) for k, v in response.headers
+                           if k.lower() not in ("content-length", "set-cookie")]
+                cache.set(key, (response.get_data(), 200, headers), ttl=ttl, tags=tags)
+                response.headers["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
+
+
+def invalidate_on_commit(session, cache, table_tags: dict) -> None:
+    """
+    Invalidate cache tags whenever a commit wrote to certain tables.
+
+    session is a SQLAlchemy Session class or scoped_session (e.g. db.session);
+    table_tags maps table names to tags, e.g. {"user": "users"}. Both unit
+    of work changes and ORM bulk INSERT/UPDATE/DELETE statements count.
+    """
+    from sqlalchemy import event
+
+    # Per registration, so several caches can watch the same session
+    info_key = ("_cache_tags", id(cache))
+
+    def _remember(session_, tables):
+        tags = {table_tags[t] for t in tables if t in table_tags}
+        if tags:
+            session_.info.setdefault(info_key, set()).update(tags)
+
+    @event.listens_for(session, "after_flush")
+    def _after_flush(session_, flush_context):
+        changed = (*session_.new, *session_.dirty, *session_.deleted)
+        _remember(session_, {getattr(obj, "__tablename__", None) for obj in changed})
+
+    @event.listens_for(session, "do_orm_execute")
+    def _bulk_statement(state):
+        if (state.is_insert or state.is_update or state.is_delete) and state.bind_mapper:
+            _remember(state.session, {table.name for table in state.bind_mapper.tables})
+
+    @event.listens_for(session, "after_commit")
+    def _after_commit(session_):
+        tags = session_.info.pop(info_key, None)
+        if tags:
+            cache.invalidate_tags(*sorted(tags))
+
+    @event.listens_for(session, "after_rollback")
+    def _after_rollback(session_):
+        session_.info.pop(info_key, None)
+
+
+# -----------------------------
+# FACTORY
+# -----------------------------
+def backend_from_url(url: str) -> CacheBackend:
+    """
+    Create a backend from a URL:
+
+        memory://?max_entries=2048
+        sqlite:///data/cache.db?max_entries=10000
+        redis://:password@localhost:6379/0
+    """
+    parsed = urlparse(url.strip())
+    options = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+
+    if parsed.scheme == "memory":
+        return MemoryBackend(max_entries=int(options.get("max_entries", 1024)))
+    if parsed.scheme == "sqlite":
+        # Same convention as SQLAlchemy: sqlite:///relative, sqlite:////absolute
+        return SQLiteBackend(
+            parsed.path[1:], max_entries=int(options.get("max_entries", 10000))
+        )
+    if parsed.scheme == "redis":
+        return RedisBackend(
+            host=parsed.hostname or "localhost",
+            port=parsed.port or 6379,
+            db=int(parsed.path.lstrip("/") or 0),
+            password=parsed.password
+        )
+    raise ValueError(f"Unsupported cache backend URL: {url}")
+
+
+def create_cache(urls: str = "memory://", default_ttl: float | None = 300) -> Cache:
+    """Create a tiered cache from a comma-separated list of backend URLs (fastest first)."""
+    backends = [backend_from_url(url) for url in urls.split(",") if url.strip()]
+    if not backends:
+        backends = [MemoryBackend()]
+    return Cache(backends, default_ttl=default_ttl)
@@ -0,0 +1,90 @@
+# compression.py
+"""
+Compression - gzip / brotli for dynamic responses.
+
+Rendered pages repeat the whole sidebar user list, so HTML grows with the
+number of users. init_compression() adds an after_request hook that
+compresses text responses larger than COMPRESS_MIN_SIZE with the best
+encoding the client accepts (brotli when installed, else gzip), and always
+marks such responses with "Vary: Accept-Encoding" so shared caches keep
+the variants apart.
+
+Skipped: streamed responses (exports), files sent directly (send_file),
+responses that already carry a Content-Encoding (e.g. /assets), ranges,
+"Cache-Control: no-transform" and anything that is not text-like.
+"""
+
+import os
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = 6
+# Dynamic content: fast brotli levels beat gzip -6 in size at similar cost
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = {
+    "text/html", "text/css", "text/plain", "text/csv", "text/javascript",
+    "application/javascript", "application/json", "application/x-ndjson",
+    "image/svg+xml",
+}
+
+
+def _choose_encoding() -> str | None:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"] > 0:
+        return "br"
+    if accepted["gzip"] > 0:
+        return "gzip"
+    return None
+
+
+def compress_response(response, min_size: int = COMPRESS_MIN_SIZE):
+    """Compress response in place if worthwhile; always returns it."""
+    if (response.mimetype not in COMPRESSIBLE_TYPES
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.is_streamed or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or "no-transform" in response.headers.get("Cache-Control", "")
+            or request.range is not None):
+        return response
+
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+
+    # The representation depends on Accept-Encoding even when we send identity
+    response.vary.add("Accept-Encoding")
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    if len(compressed) >= len(body):
+        return response
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    # A strong ETag identifies the uncompressed bytes; keep variants distinct
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+    return response
+
+
+def init_compression(app, min_size: int = COMPRESS_MIN_SIZE) -> None:
+    """Compress responses after every other after_request hook has run."""
+    def _compress(response):
+        return compress_response(response, min_size)
+
+    # after_request hooks run in reverse registration order; putting this one
+    # first makes it run last, after e.g. the SQL profiler has edited the body
+    app.after_request_funcs.setdefault(None, []).insert(0, _compress)
@@ -2,50 +2,160 @@
 """
 DataManager - Handles CRUD operations for Users and Movies,
 including OMDb API integration for fetching movie details.
+
+With a sharding.ShardRouter attached, users and movies live on the shards:
+per-user reads and writes go to the owning shard, everything else is
+scattered over all shards (see sharding.py).
 """
 
-import os
+from datetime import datetime
 import requests
 from dotenv import load_dotenv
+from sqlalchemy import insert, update, delete, or_
+from sqlalchemy.exc import IntegrityError
 
 try:
     from MovieWebApp.models import db, User, Movie
+    from MovieWebApp.cache import cached
+    from MovieWebApp.quota import omdb_quota, INTERACTIVE
+    from MovieWebApp.imdb_store import imdb_store
+    from MovieWebApp.tracing import span, trace_headers
 except ModuleNotFoundError:
     from models import db, User, Movie
+    from cache import cached
+    from quota import omdb_quota, INTERACTIVE
+    from imdb_store import imdb_store
+    from tracing import span, trace_headers
 
 # Load environment variables
 load_dotenv()
-OMDB_API_KEY = os.getenv("OMDB_API_KEY")
+OMDB_URL = "https://www.omdbapi.com/"
+OMDB_CACHE_TTL = 24 * 60 * 60  # OMDb metadata rarely changes
+
+# Columns callers may change through update_movie / update_user
+MOVIE_UPDATABLE_FIELDS = ("name", "director", "year", "poster_url", "rating")
+USER_UPDATABLE_FIELDS = ("name",)
+
+
+class VersionConflictError(Exception):
+    """Raised when a row was modified by someone else since it was read."""
+
+    def __init__(self, model_name: str, row_id: int, expected: int, current: int):
+        self.model_name = model_name
+        self.row_id = row_id
+        self.expected = expected
+        self.current = current
+        super().__init__(
+            f"{model_name} {row_id} is at version {current}, expected {expected}"
+        )
 
 
 class DataManager:
     """Manage CRUD operations for Users and Movies."""
 
+    def __init__(self, cache=None, shards=None):
+        """
+        Optionally attach a cache.Cache used for OMDb responses and a
+        sharding.ShardRouter holding users and movies.
+        """
+        self.omdb_cache = cache.child("omdb", OMDB_CACHE_TTL) if cache else None
+        self.shards = shards
+
+    @property
+    def session(self):
+        """Session for users and movies: the shard session or db.session."""
+        return self.shards.session if self.shards else db.session
+
     # -------------------------
     # USER OPERATIONS
     # -------------------------
     def create_user(self, name: str) -> User:
         """Create a new user and commit to the database."""
         user = User(name=name)
-        db.session.add(user)
-        db.session.commit()
+        if self.shards:
+            (user.id, _), = self.shards.place_new_users(1)
+        self.session.add(user)
+        self.session.commit()
         return user
 
+    def update_user(
+        self, user_id: int, expected_version: int | None = None, **kwargs
+    ) -> User | None:
+        """Rename a user with an optimistic version check (see update_movie)."""
+        return self._compare_and_swap(
+            User, user_id, expected_version, kwargs, USER_UPDATABLE_FIELDS
+        )
+
     def get_users(self) -> list[User]:
         """Return a list of all users. (Filter methods like .all() are fine)"""
-        return User.query.all()
+        users = self.session.query(User).all()
+        # Shards answer one after another; keep the single-database order
+        return sorted(users, key=lambda user: user.id) if self.shards else users
+
+    def get_user(self, user_id: int) -> User | None:
+        """Return a user by ID, or None."""
+        user = self.session.get(User, user_id)
+        if user is None and self.shards:
+            # The cached placement may predate a move to another shard
+            self.shards.forget(user_id)
+            user = self.session.get(User, user_id)
+        return user
+
+    def find_user_by_name(self, name: str) -> User | None:
+        """Return the user with this name (case-insensitive), or None."""
+        return self.session.query(User).filter(User.name.ilike(name)).first()
 
     # -------------------------
     # MOVIE OPERATIONS
     # -------------------------
     def get_movies(self, user_id: int) -> list[Movie]:
         """Return all movies for a specific user."""
-        return Movie.query.filter_by(user_id=user_id).all()
+        query = self.session.query(Movie).filter_by(user_id=user_id)
+        movies = query.all()
+        if not movies and self.shards and self.shards.revalidate(user_id):
+            # Empty because the cached placement predates a move
+            movies = query.all()
+        return movies
+
+    def find_movie(self, user_id: int, name: str) -> Movie | None:
+        """Return the user's movie with this name (case-insensitive), or None."""
+        query = self.session.query(Movie).filter(
+            Movie.user_id == user_id,
+            Movie.name.ilike(name)
+        )
+        movie = query.first()
+        if movie is None and self.shards and self.shards.revalidate(user_id):
+            movie = query.first()
+        return movie
 
     def add_movie(self, movie: Movie) -> Movie:
-        """Add a Movie object to the database."""
-        db.session.add(movie)
-        db.session.commit()
+        """
+        Add a Movie object to the database.
+
+        Sharded, a write sent to a shard the user has just left is rerouted;
+        if the user's new shard already has a movie with this name, that
+        movie is returned instead of adding a duplicate.
+        """
+        if not self.shards:
+            self.session.add(movie)
+            self.session.commit()
+            return movie
+
+        if movie.id is None:
+            movie.id, = self.shards.allocate_ids("movie")
+        try:
+            self.session.add(movie)
+            self.session.commit()
+        except IntegrityError:
+            # Routed by a cached placement the user has since moved away from;
+            # the caller's duplicate check ran against the old shard too
+            self.session.rollback()
+            self.shards.reroute(movie)
+            existing = self.find_movie(movie.user_id, movie.name)
+            if existing is not None:
+                return existing
+            self.session.add(movie)
+            self.session.commit()
         return movie
 
     # -------------------------
@@ -63,28 +173,25 @@ class DataManager:
             added (bool): True if newly added
         """
         movie_name = movie_name.strip()
-        if not movie_name or not OMDB_API_KEY:
+        if not movie_name:
             return None, [], False
 
         # Check if movie already exists in DB
-        existing = Movie.query.filter(
-            Movie.user_id == user_id,
-            Movie.name.ilike(movie_name)
-        ).first()
+        existing = self.find_movie(user_id, movie_name)
         if existing:
             return existing, [], False
 
+        # Local IMDb metadata first; OMDb is then only needed for the poster
+        local = imdb_store.lookup_title(movie_name)
+        if local:
+            movie = self._create_movie_from_local(local, user_id)
+            return movie, [], True
+
+        if not omdb_quota:
+            return None, [], False
+
         # Try exact match
-        try:
-            response = requests.get(
-                "https://www.omdbapi.com/",
-                params={"t": movie_name, "apikey": OMDB_API_KEY},
-                timeout=5
-            )
-            response.raise_for_status()
-            data = response.json()
-        except requests.RequestException:
-            data = {}
+        data = self._omdb_get({"t": movie_name}) or {}
 
         if data.get("Response") == "True" and \
            data.get("Title", "").lower() == movie_name.lower():
@@ -93,15 +200,8 @@ class DataManager:
 
         # Exact match failed → suggestions
         padded_query = movie_name if len(movie_name) > 2 else f"{movie_name}  "
-        try:
-            search_response = requests.get(
-                "https://www.omdbapi.com/",
-                params={"s": padded_query, "apikey": OMDB_API_KEY},
-                timeout=5
-            )
-            search_response.raise_for_status()
-            search_data = search_response.json()
-        except requests.RequestException:
+        search_data = self._omdb_get({"s": padded_query})
+        if search_data is None:
             return None, [], False
 
         if search_data.get("Response") == "True":
@@ -114,44 +214,75 @@ class DataManager:
     # -------------------------
     # HELPER METHODS
     # -------------------------
+    @cached("omdb_cache", unless=lambda data: data is None)
+    def _omdb_get(self, params: dict) -> dict | None:
+        """
+        Query OMDb and return the decoded JSON, or None on network errors.
+
+        Successful responses (including "not found" answers) are cached so
+        repeated lookups of the same title cost no upstream call. Each call
+        draws from the shared OMDb quota; a key the upstream reports as
+        exhausted is drained and the next key is tried.
+        """
+        for _ in range(max(len(omdb_quota.keys), 1)):
+            api_key = omdb_quota.acquire(INTERACTIVE)
+            if api_key is None:
+                return None
+            try:
+                with span("omdb", query=params):
+                    response = requests.get(
+                        OMDB_URL,
+                        params={**params, "apikey": api_key},
+                        headers=trace_headers(),
+                        timeout=5
+                    )
+                if response.status_code == 401 and "limit" in response.text.lower():
+                    omdb_quota.mark_exhausted(api_key)
+                    continue
+                response.raise_for_status()
+                return response.json()
+            except (requests.RequestException, ValueError):
+                return None
+        return None
+
     def _fetch_movie_by_title(self, title: str, user_id: int) -> Movie | None:
         """Fetch full movie details using OMDb title search."""
-        if not OMDB_API_KEY:
-            return None
-        try:
-            response = requests.get(
-                "https://www.omdbapi.com/",
-                params={"t": title, "apikey": OMDB_API_KEY},
-                timeout=5
-            )
-            response.raise_for_status()
-        except requests.RequestException:
+        if not omdb_quota:
             return None
-
-        data = response.json()
-        if data.get("Response") == "False":
+        data = self._omdb_get({"t": title})
+        if not data or data.get("Response") == "False":
             return None
         return self._create_movie_from_data(data, user_id)
 
     def _fetch_movie_by_imdb_id(self, imdb_id: str, user_id: int) -> Movie | None:
         """Fetch full movie details using IMDb ID."""
-        if not OMDB_API_KEY:
+        if not omdb_quota:
             return None
-        try:
-            response = requests.get(
-                "https://www.omdbapi.com/",
-                params={"i": imdb_id, "apikey": OMDB_API_KEY},
-                timeout=5
-            )
-            response.raise_for_status()
-        except requests.RequestException:
-            return None
-
-        data = response.json()
-        if data.get("Response") == "False":
+        data = self._omdb_get({"i": imdb_id})
+        if not data or data.get("Response") == "False":
             return None
         return self._create_movie_from_data(data, user_id)
 
+    def fetch_poster(self, imdb_id: str) -> str:
+        """Return the OMDb poster URL for an IMDb ID ('' if unavailable)."""
+        if not omdb_quota:
+            return ""
+        data = self._omdb_get({"i": imdb_id}) or {}
+        poster = data.get("Poster", "")
+        return "" if poster == "N/A" else poster
+
+    def _create_movie_from_local(self, local: dict, user_id: int) -> Movie:
+        """Create and commit a Movie from local IMDb metadata (+ OMDb poster)."""
+        movie = Movie(
+            name=local["title"],
+            director=local["director"],
+            year=local["year"],
+            poster_url=self.fetch_poster(local["imdb_id"]),
+            user_id=user_id,
+            rating=local["rating"]
+        )
+        return self.add_movie(movie)
+
     def _create_movie_from_data(self, data: dict, user_id: int) -> Movie:
         """Create and commit a Movie object from OMDb data."""
         try:
@@ -172,31 +303,288 @@ class DataManager:
             user_id=user_id,
             rating=rating
         )
-        db.session.add(movie)
-        db.session.commit()
-        return movie
+        return self.add_movie(movie)
 
     # -------------------------
     # UPDATE & DELETE
     # -------------------------
-    def update_movie(self, movie_id: int, **kwargs) -> Movie | None:
-        """Update movie fields dynamically."""
-        # ⚠️ FIX APPLIED: Replaced Movie.query.get(movie_id) with db.session.get()
-        movie = db.session.get(Movie, movie_id)
-        if not movie:
-            return None
-        for key, value in kwargs.items():
-            if hasattr(movie, key) and value is not None:
-                setattr(movie, key, value)
-        db.session.commit()
-        return movie
+    def update_movie(
+        self, movie_id: int, expected_version: int | None = None,
+        user_id: int | None = None, **kwargs
+    ) -> Movie | None:
+        """
+        Update movie fields with a single compare-and-swap UPDATE.
+
+        If expected_version is given, the write only applies when the row is
+        still at that version; otherwise VersionConflictError is raised.
+        If user_id is given, only that user's movie can be changed.
+        Updates that would not change anything skip the commit entirely.
 
-    def delete_movie(self, movie_id: int) -> bool:
-        """Delete a movie by ID. Returns True if successful."""
+        Returns:
+            movie (Movie | None): The current movie, or None if not found
+        """
+        owner = {"user_id": user_id} if user_id is not None else {}
+        return self._compare_and_swap(
+            Movie, movie_id, expected_version, kwargs, MOVIE_UPDATABLE_FIELDS, owner
+        )
+
+    def delete_movie(self, movie_id: int, user_id: int | None = None) -> bool:
+        """Delete a movie by ID (only user_id's, if given). Returns True if successful."""
         # ⚠️ FIX APPLIED: Replaced Movie.query.get(movie_id) with db.session.get()
-        movie = db.session.get(Movie, movie_id)
+        movie = self.session.get(Movie, movie_id)
+        if movie and user_id is not None and movie.user_id != user_id:
+            movie = None
         if movie:
-            db.session.delete(movie)
-            db.session.commit()
+            self.session.delete(movie)
+            self.session.commit()
             return True
-        return False
\ No newline at end of file
+        return False
+    # -------------------------
+    # BULK OPERATIONS
+    # -------------------------
+    # Set-based statements in a single transaction; no ORM objects are built
+    # per row, so these stay fast on large tables.
+    def bulk_create_users(self, names: list[str]) -> list[int]:
+        """Insert many users at once and return their new IDs (in order)."""
+        if not names:
+            return []
+        now = datetime.utcnow()
+        rows = [
+            {"name": name, "created_at": now, "updated_at": now, "version": 1}
+            for name in names
+        ]
+        if self.shards:
+            placements = self.shards.place_new_users(len(rows))
+            by_shard = {}
+            for row, (user_id, shard) in zip(rows, placements):
+                row["id"] = user_id
+                by_shard.setdefault(shard, []).append(row)
+            self._insert_per_shard(User, by_shard)
+            return [user_id for user_id, _ in placements]
+        try:
+            ids = self.session.execute(
+                insert(User).returning(User.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return list(ids)
+
+    def bulk_add_movies(self, movies: list[dict]) -> int:
+        """
+        Insert many movies (dicts with at least name and user_id) in one
+        executemany. Missing fields get the same defaults as a manual add.
+        Returns the number of rows inserted.
+        """
+        if not movies:
+            return 0
+        now = datetime.utcnow()
+        rows = [
+            {
+                "name": movie["name"],
+                "user_id": movie["user_id"],
+                "director": movie.get("director") or "Unknown",
+                "year": movie.get("year") or 0,
+                "rating": movie.get("rating") or 0.0,
+                "poster_url": movie.get("poster_url") or "",
+                "created_at": now,
+                "updated_at": now,
+                "version": 1,
+            }
+            for movie in movies
+        ]
+        if self.shards:
+            by_shard = {}
+            for row, movie_id in zip(rows, self.shards.allocate_ids("movie", len(rows))):
+                row["id"] = movie_id
+                by_shard.setdefault(self.shards.shard_for(row["user_id"], fresh=True), []).append(row)
+            self._insert_per_shard(Movie, by_shard)
+            return len(rows)
+        try:
+            self.session.execute(insert(Movie), rows)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return len(rows)
+
+    def bulk_update_movies(self, values: dict, **filters) -> int:
+        """
+        UPDATE movie SET ... WHERE <filters>; bumps each row's version.
+
+        Filters are column=value pairs; a list/tuple/set value means IN.
+        Returns the number of rows changed.
+        """
+        changes = {
+            key: value for key, value in values.items()
+            if key in MOVIE_UPDATABLE_FIELDS
+        }
+        if not changes:
+            return 0
+        stmt = (
+            update(Movie)
+            .where(*self._filter_clauses(Movie, filters))
+            .values(**changes, version=Movie.version + 1, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        return self._execute_bulk(stmt)
+
+    def bulk_delete_movies(self, **filters) -> int:
+        """DELETE FROM movie WHERE <filters>. Returns the number of rows deleted."""
+        stmt = (
+            delete(Movie)
+            .where(*self._filter_clauses(Movie, filters))
+            .execution_options(synchronize_session=False)
+        )
+        return self._execute_bulk(stmt)
+
+    def delete_user(self, user_id: int) -> bool:
+        """
+        Delete a user and all their movies with two set-based DELETEs in one
+        transaction (instead of loading every Movie for the ORM cascade).
+        """
+        try:
+            self.session.execute(
+                delete(Movie)
+                .where(Movie.user_id == user_id)
+                .execution_options(synchronize_session=False)
+            )
+            result = self.session.execute(
+                delete(User)
+                .where(User.id == user_id)
+                .execution_options(synchronize_session=False)
+            )
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        if self.shards:
+            self.shards.remove_users([user_id])
+        return result.rowcount > 0
+
+    def bulk_delete_users(self, user_ids: list[int]) -> int:
+        """Delete many users and their movies in one transaction."""
+        if not user_ids:
+            return 0
+        try:
+            self.session.execute(
+                delete(Movie)
+                .where(Movie.user_id.in_(user_ids))
+                .execution_options(synchronize_session=False)
+            )
+            result = self.session.execute(
+                delete(User)
+                .where(User.id.in_(user_ids))
+                .execution_options(synchronize_session=False)
+            )
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        if self.shards:
+            self.shards.remove_users(list(user_ids))
+        return result.rowcount
+
+    @staticmethod
+    def _filter_clauses(model, filters: dict) -> list:
+        """Turn column=value filters into WHERE clauses (refusing empty filters)."""
+        if not filters:
+            raise ValueError("Bulk operations need at least one filter.")
+        clauses = []
+        for key, value in filters.items():
+            column = getattr(model, key, None)
+            if column is None or key not in model.__table__.columns:
+                raise ValueError(f"Unknown {model.__name__} column: {key}")
+            if isinstance(value, (list, tuple, set)):
+                clauses.append(column.in_(list(value)))
+            else:
+                clauses.append(column == value)
+        return clauses
+
+    def _execute_bulk(self, stmt) -> int:
+        """
+        Run one set-based statement in its own transaction; return rowcount.
+        On shards it runs wherever the filters point (summed rowcount).
+        """
+        try:
+            result = self.session.execute(stmt)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return result.rowcount
+
+    def _insert_per_shard(self, model, rows_by_shard: dict) -> None:
+        """executemany INSERT of pre-numbered rows on each shard, one commit."""
+        try:
+            for shard, rows in rows_by_shard.items():
+                # "raw": plain executemany; ORM bulk INSERT cannot target a shard
+                self.session.execute(
+                    insert(model).execution_options(dml_strategy="raw"),
+                    rows,
+                    bind_arguments={"shard_id": shard}
+                )
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+
+    # -------------------------
+    # OPTIMISTIC CONCURRENCY
+    # -------------------------
+    def _compare_and_swap(self, model, row_id, expected_version, kwargs, allowed, scope=None):
+        """
+        Run UPDATE ... WHERE id=? [AND <scope>] [AND version=?] AND <something differs>.
+
+        scope holds column=value conditions the row must also meet (e.g. the
+        owning user_id); a row outside the scope counts as not found.
+
+        The happy path is one round trip (UPDATE ... RETURNING). Only when no
+        row matched do we look the row up to tell apart "not found",
+        "version conflict" and "nothing to change".
+        """
+        changes = {
+            key: value for key, value in kwargs.items()
+            if key in allowed and value is not None
+        }
+
+        scope = scope or {}
+        conditions = [model.id == row_id]
+        conditions += [getattr(model, key) == value for key, value in scope.items()]
+        if expected_version is not None:
+            conditions.append(model.version == expected_version)
+        if changes:
+            # IS DISTINCT FROM keeps no-op writes (e.g. retried submits) out of the DB
+            conditions.append(or_(*[
+                getattr(model, key).is_distinct_from(value)
+                for key, value in changes.items()
+            ]))
+
+        if changes:
+            stmt = (
+                update(model)
+                .where(*conditions)
+                .values(
+                    **changes,
+                    version=model.version + 1,
+                    updated_at=datetime.utcnow()
+                )
+                .returning(model)
+                .execution_options(populate_existing=True)
+            )
+            row = self.session.execute(stmt).scalars().first()
+            if row is not None:
+                self.session.commit()
+                return row
+            self.session.rollback()
+
+        # Nothing written: not found, stale version, or a no-op update
+        current = self.session.get(model, row_id)
+        if current is None or any(getattr(current, k) != v for k, v in scope.items()):
+            return None
+        if expected_version is not None and current.version != expected_version:
+            raise VersionConflictError(
+                model.__name__, row_id, expected_version, current.version
+            )
+        return current
@@ -0,0 +1,181 @@
+# export.py
+"""
+Export - Stream movie collections out as CSV, NDJSON or Parquet/Arrow.
+
+Rows are read with a server-side cursor (stream_results + yield_per), so
+memory stays flat no matter how large the collection is: only one chunk
+of rows is ever held at once, and the HTTP responses are generators.
+"""
+
+import csv
+import io
+import json
+import logging
+import tempfile
+from datetime import datetime
+from flask import Response, abort, send_file, stream_with_context
+from sqlalchemy import select
+
+try:
+    from MovieWebApp.models import db, Movie
+except ModuleNotFoundError:
+    from models import db, Movie
+
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_COLUMNS = (
+    "id", "user_id", "name", "director", "year", "rating", "poster_url", "created_at"
+)
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+
+# -----------------------------
+# ROW ITERATION
+# -----------------------------
+def iter_movie_rows(user_id: int | None = None, chunk_size: int = EXPORT_CHUNK_SIZE,
+                    session=None):
+    """
+    Yield movies as plain dicts, chunk by chunk.
+
+    Selects columns rather than ORM entities so no Movie objects (and no
+    identity-map entries) are built per row. Pass the shard session to
+    export from shards; rows are then ordered by id within each shard.
+    """
+    stmt = select(*[getattr(Movie, column) for column in EXPORT_COLUMNS]).order_by(Movie.id)
+    if user_id is not None:
+        stmt = stmt.where(Movie.user_id == user_id)
+
+    result = (session or db.session).execute(
+        stmt.execution_options(stream_results=True, yield_per=chunk_size)
+    )
+    try:
+        for partition in result.partitions():
+            for row in partition:
+                yield dict(row._mapping)
+    finally:
+        result.close()
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+
+# -----------------------------
+# TEXT FORMATS (STREAMED)
+# -----------------------------
+def stream_csv(rows, flush_every: int = EXPORT_CHUNK_SIZE):
+    """Yield CSV text in chunks of flush_every rows (header first)."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % flush_every == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(rows, flush_every: int = EXPORT_CHUNK_SIZE):
+    """Yield newline-delimited JSON in chunks of flush_every rows."""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, default=_json_default))
+        if len(lines) >= flush_every:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+# -----------------------------
+# COLUMNAR FORMATS (OPTIONAL)
+# -----------------------------
+def write_columnar(rows, destination, fmt: str = "parquet",
+                   batch_size: int = EXPORT_CHUNK_SIZE) -> int:
+    """
+    Write rows to a Parquet or Arrow IPC file one record batch at a time.
+
+    Requires pyarrow (optional dependency). Returns the number of rows written.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet/Arrow export requires 'pyarrow' (pip install pyarrow)") from e
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("name", pa.string()),
+        ("director", pa.string()),
+        ("year", pa.int32()),
+        ("rating", pa.float64()),
+        ("poster_url", pa.string()),
+        ("created_at", pa.timestamp("us")),
+    ])
+
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(destination, schema)
+    elif fmt == "arrow":
+        writer = pa.ipc.new_file(destination, schema)
+    else:
+        raise ValueError(f"Unsupported columnar format: {fmt}")
+
+    total = 0
+    batch = []
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+                total += len(batch)
+                batch = []
+        if batch:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            total += len(batch)
+    finally:
+        writer.close()
+    return total
+
+
+# -----------------------------
+# HTTP RESPONSES
+# -----------------------------
+def export_response(fmt: str, user_id: int | None = None, session=None):
+    """Stream movies (one user's or all) in the requested format."""
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+
+    filename = f"movies_user_{user_id}.{fmt}" if user_id else f"movies_all.{fmt}"
+    rows = iter_movie_rows(user_id, session=session)
+
+    if fmt in ("parquet", "arrow"):
+        # Columnar files need a seekable target; spool to disk, not memory
+        spool = tempfile.TemporaryFile()
+        try:
+            write_columnar(rows, spool, fmt)
+        except RuntimeError as e:
+            spool.close()
+            logging.error(e)
+            abort(501)
+        spool.seek(0)
+        return send_file(
+            spool, mimetype=EXPORT_FORMATS[fmt], as_attachment=True, download_name=filename
+        )
+
+    stream = stream_csv(rows) if fmt == "csv" else stream_ndjson(rows)
+    return Response(
+        stream_with_context(stream),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
@@ -0,0 +1,311 @@
+# imdb_store.py
+"""
+ImdbStore - Local movie metadata built from the public IMDb TSV dumps.
+
+Loads title.basics, title.ratings, title.crew and name.basics
+(https://datasets.imdbws.com/, plain or .gz) into an indexed SQLite file so
+title / year / director / rating can be resolved without calling OMDb.
+Files are streamed line by line and written in chunks, so multi-gigabyte
+dumps never have to fit in memory. Re-running the ingest only reloads files
+whose size or modification time changed (rows are upserted). Reloading
+title.basics drops titles no longer in the dump and re-applies ratings and
+crew, whose rows only update titles that exist.
+
+Usage:
+    flask --app app ingest-imdb /path/to/imdb/dumps
+"""
+
+import csv
+import gzip
+import os
+import sqlite3
+import sys
+import threading
+import time
+import logging
+from pathlib import Path
+
+IMDB_DB_PATH = os.getenv(
+    "IMDB_DB_PATH", str(Path(__file__).resolve().parent / "data" / "imdb.db")
+)
+INGEST_CHUNK_SIZE = 50_000
+
+# Only feature-length titles are relevant for a movie collection
+MOVIE_TITLE_TYPES = {"movie", "tvMovie"}
+
+# Ingest order matters: ratings and crew only update titles that exist
+DATASET_FILES = ("title.basics", "title.ratings", "title.crew", "name.basics")
+# Reloaded whenever title.basics is, even if unchanged themselves
+DEPENDS_ON_BASICS = {"title.ratings", "title.crew"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS titles (
+    tconst TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    title_lower TEXT NOT NULL,
+    year INTEGER,
+    rating REAL,
+    votes INTEGER,
+    directors TEXT,
+    generation INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_titles_lookup ON titles (title_lower, year);
+CREATE TABLE IF NOT EXISTS names (
+    nconst TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ingest_state (
+    file TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    rows INTEGER NOT NULL,
+    finished_at REAL NOT NULL
+);
+"""
+
+
+def _null(value: str):
+    """IMDb uses \\N for missing values."""
+    return None if value == "\\N" else value
+
+
+def _open_tsv(path: Path):
+    """Open a (possibly gzipped) TSV dump as a text stream."""
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _find_file(directory: Path, name: str) -> Path | None:
+    for candidate in (f"{name}.tsv.gz", f"{name}.tsv"):
+        path = directory / candidate
+        if path.exists():
+            return path
+    return None
+
+
+class ImdbStore:
+    """Read/write access to the local IMDb metadata database."""
+
+    def __init__(self, path: str = IMDB_DB_PATH):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(titles)")}
+            if "generation" not in columns:
+                # Stores built before deletions were tracked
+                conn.execute("ALTER TABLE titles ADD COLUMN generation INTEGER NOT NULL DEFAULT 0")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def available(self) -> bool:
+        """True once an ingest has completed (cheap check, no DB file created)."""
+        if not os.path.exists(self.path):
+            return False
+        row = self._connect().execute("SELECT COUNT(*) FROM ingest_state").fetchone()
+        return bool(row and row[0])
+
+    # -----------------------------
+    # LOOKUP
+    # -----------------------------
+    def lookup_title(self, title: str, year: int | None = None) -> dict | None:
+        """
+        Resolve a title (case-insensitive exact match) to its metadata.
+
+        Prefers the given year, then the most-voted title. Returns None if
+        the store is empty or nothing matches.
+        """
+        title = (title or "").strip()
+        if not title or not self.available:
+            return None
+
+        row = self._connect().execute(
+            "SELECT tconst, title, year, rating, directors FROM titles "
+            "WHERE title_lower = ? "
+            "ORDER BY (year = ?) DESC, COALESCE(votes, 0) DESC LIMIT 1",
+            (title.lower(), year or -1)
+        ).fetchone()
+        if row is None:
+            return None
+
+        tconst, found_title, found_year, rating, directors = row
+        return {
+            "imdb_id": tconst,
+            "title": found_title,
+            "year": found_year or 0,
+            "rating": rating or 0.0,
+            "director": self._director_names(directors) or "Unknown",
+        }
+
+    def _director_names(self, directors: str | None) -> str:
+        if not directors:
+            return ""
+        ids = directors.split(",")
+        placeholders = ",".join("?" * len(ids))
+        names = dict(self._connect().execute(
+            f"SELECT nconst, name FROM names WHERE nconst IN ({placeholders})", ids
+        ).fetchall())
+        return ", ".join(names[nconst] for nconst in ids if nconst in names)
+
+    # -----------------------------
+    # INGESTION
+    # -----------------------------
+    def ingest_directory(self, directory: str, force: bool = False) -> dict:
+        """Ingest every dataset file found in directory; return rows per file."""
+        directory = Path(directory)
+        report = {}
+        for name in DATASET_FILES:
+            path = _find_file(directory, name)
+            if path is None:
+                logging.warning(f"IMDb dataset {name} not found in {directory}")
+                continue
+            # New titles from a reloaded basics file have no rating / director yet
+            reload = force or (name in DEPENDS_ON_BASICS
+                               and report.get("title.basics") is not None)
+            report[name] = self.ingest_file(name, path, force=reload)
+        return report
+
+    def ingest_file(self, name: str, path: Path, force: bool = False) -> int | None:
+        """
+        Stream one dataset file into the store.
+
+        Returns the number of rows processed, or None if the file is
+        unchanged since the last ingest.
+        """
+        conn = self._connect()
+        stat = path.stat()
+        previous = conn.execute(
+            "SELECT size, mtime FROM ingest_state WHERE file = ?", (name,)
+        ).fetchone()
+        if not force and previous == (stat.st_size, stat.st_mtime):
+            return None
+
+        handler = {
+            "title.basics": self._ingest_basics,
+            "title.ratings": self._ingest_ratings,
+            "title.crew": self._ingest_crew,
+            "name.basics": self._ingest_names,
+        }[name]
+
+        # Bulk-load settings: durability is irrelevant, the dump can be re-read
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        started = time.monotonic()
+        try:
+            with _open_tsv(path) as handle:
+                reader = csv.reader(handle, delimiter="\t", quoting=csv.QUOTE_NONE)
+                next(reader, None)  # header
+                rows = handler(conn, reader)
+
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO ingest_state (file, size, mtime, rows, finished_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (name, stat.st_size, stat.st_mtime, rows, time.time())
+                )
+        finally:
+            conn.execute("PRAGMA synchronous=NORMAL")
+        logging.info(f"Ingested {rows} rows from {path} in {time.monotonic() - started:.1f}s")
+        return rows
+
+    @staticmethod
+    def _write_chunks(conn, sql: str, records) -> int:
+        """executemany records in INGEST_CHUNK_SIZE batches, one commit per batch."""
+        total = 0
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= INGEST_CHUNK_SIZE:
+                with conn:
+                    conn.executemany(sql, chunk)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            with conn:
+                conn.executemany(sql, chunk)
+            total += len(chunk)
+        return total
+
+    def _ingest_basics(self, conn, reader) -> int:
+        # tconst, titleType, primaryTitle, originalTitle, isAdult, startYear, ...
+        # Every row of this load gets a new generation; titles still on an
+        # older one were dropped from the dump and are deleted at the end
+        generation = 1 + conn.execute("SELECT COALESCE(MAX(generation), 0) FROM titles").fetchone()[0]
+
+        def records():
+            for row in reader:
+                if len(row) < 6 or row[1] not in MOVIE_TITLE_TYPES:
+                    continue
+                year = _null(row[5])
+                yield (row[0], row[2], row[2].lower(), int(year) if year else None, generation)
+
+        rows = self._write_chunks(
+            conn,
+            "INSERT INTO titles (tconst, title, title_lower, year, generation) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(tconst) DO UPDATE SET "
+            "title = excluded.title, title_lower = excluded.title_lower, year = excluded.year, "
+            "generation = excluded.generation",
+            records()
+        )
+        with conn:
+            removed = conn.execute(
+                "DELETE FROM titles WHERE generation < ?", (generation,)
+            ).rowcount
+        if removed:
+            logging.info(f"Removed {removed} titles no longer in title.basics")
+        return rows
+
+    def _ingest_ratings(self, conn, reader) -> int:
+        # tconst, averageRating, numVotes
+        def records():
+            for row in reader:
+                if len(row) >= 3:
+                    yield (float(row[1]), int(row[2]), row[0])
+
+        return self._write_chunks(
+            conn, "UPDATE titles SET rating = ?, votes = ? WHERE tconst = ?", records()
+        )
+
+    def _ingest_crew(self, conn, reader) -> int:
+        # tconst, directors, writers
+        def records():
+            for row in reader:
+                if len(row) >= 2 and _null(row[1]):
+                    yield (row[1], row[0])
+
+        return self._write_chunks(
+            conn, "UPDATE titles SET directors = ? WHERE tconst = ?", records()
+        )
+
+    def _ingest_names(self, conn, reader) -> int:
+        # nconst, primaryName, ...
+        def records():
+            for row in reader:
+                if len(row) >= 2:
+                    yield (row[0], row[1])
+
+        return self._write_chunks(
+            conn,
+            "INSERT INTO names (nconst, name) VALUES (?, ?) "
+            "ON CONFLICT(nconst) DO UPDATE SET name = excluded.name",
+            records()
+        )
+
+
+# Shared instance used by DataManager and app.py
+imdb_store = ImdbStore()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2:
+        print("Usage: python imdb_store.py <directory-with-imdb-tsv-files> [--force]")
+        sys.exit(1)
+    print(imdb_store.ingest_directory(sys.argv[1], force="--force" in sys.argv))
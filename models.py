@@ -2,7 +2,13 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 
-db = SQLAlchemy()
+try:
+    from MovieWebApp.routing import RoutingSession
+except ModuleNotFoundError:
+    from routing import RoutingSession
+
+# RoutingSession sends reads to replicas when any are configured (see routing.py)
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
 class User(db.Model):
@@ -23,6 +29,10 @@ class User(db.Model):
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Optimistic-concurrency row version, bumped on every successful update
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=True)
+
     def __repr__(self):
         """Return string representation of the User."""
         return f"<User {self.name}>"
@@ -49,6 +59,72 @@ class Movie(db.Model):
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Optimistic-concurrency row version, bumped on every successful update
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=True)
+
     def __repr__(self):
         """Return string representation of the Movie."""
         return f"<Movie {self.name}>"
+
+
+class ContactMessage(db.Model):
+    """Contact form submission waiting to be delivered as a GitHub issue (see outbox.py)."""
+
+    __tablename__ = 'contact_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(255), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+
+    # Hash of the submission; a double-submitted form is stored only once
+    dedup_key = db.Column(db.String(64), nullable=False, unique=True)
+
+    # pending -> sent, or failed after permanent errors / too many attempts
+    status = db.Column(db.String(16), nullable=False, default="pending", index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    claimed_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    issue_url = db.Column(db.String(255), nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    delivered_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        """Return string representation of the ContactMessage."""
+        return f"<ContactMessage {self.id} {self.status}>"
+
+
+# -----------------------------
+# SCHEMA UPGRADES
+# -----------------------------
+# Columns added after the first release. db.create_all() never alters an
+# existing table, so older SQLite files get them through ALTER TABLE.
+_ADDED_COLUMNS = {
+    "user": {
+        "version": "INTEGER NOT NULL DEFAULT 1",
+        "updated_at": "DATETIME",
+    },
+    "movie": {
+        "version": "INTEGER NOT NULL DEFAULT 1",
+        "updated_at": "DATETIME",
+    },
+}
+
+
+def upgrade_schema(engine=None):
+    """Add any missing columns to existing tables (idempotent)."""
+    engine = engine or db.engine
+    inspector = db.inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with engine.begin() as conn:
+        for table, columns in _ADDED_COLUMNS.items():
+            if table not in existing_tables:
+                continue
+            present = {col["name"] for col in inspector.get_columns(table)}
+            for name, ddl in columns.items():
+                if name not in present:
+                    conn.execute(db.text(f'ALTER TABLE "{table}" ADD COLUMN {name} {ddl}'))
@@ -0,0 +1,419 @@
+# outbox.py
+"""
+Outbox - Deliver contact form messages to GitHub Issues off the request path.
+
+The /contact route only inserts a ContactMessage row (enqueue_contact) and
+returns. A background OutboxDispatcher thread then:
+
+    * claims due messages in batches with a short lease (UPDATE ...
+      RETURNING), so several workers / processes never send the same row;
+      the lease is renewed right before each send, and a row whose lease
+      was lost to another worker is skipped
+    * posts them over one keep-alive session with connect/read timeouts
+    * retries timeouts, connection errors and 5xx with exponential backoff
+      and jitter; 400/401/403/404/410/422 mark the message failed
+    * pauses all delivery on GitHub rate limits (429, or 403 with
+      Retry-After / X-RateLimit-Remaining: 0) until the limit resets
+    * dedups: double-submitted forms share one row (dedup_key), and each
+      issue body carries a marker, so a retry after an ambiguous failure
+      first checks whether the issue was already created - as does the
+      first send of a row taken over from a worker whose lease expired
+
+The thread starts with the first request a process serves, so CLI commands
+and the reloader's parent process never run one. GITHUB_API_URL points the
+sender at a local HTTP stand-in for testing. Run a single pass without the
+thread via `flask --app app deliver-contacts`.
+"""
+
+import os
+import time
+import random
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+import requests
+from sqlalchemy import select, update, and_, or_, func
+from sqlalchemy.exc import IntegrityError
+
+try:
+    from MovieWebApp.models import db, ContactMessage
+    from MovieWebApp.tracing import span, trace_headers
+except ModuleNotFoundError:
+    from models import db, ContactMessage
+    from tracing import span, trace_headers
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "10"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+# Lease per message; renewed before each send, so it only has to cover one
+# dedup lookup plus one create (2 x (3.05 + 10)s worst case)
+CLAIM_SECONDS = 120
+BACKOFF_BASE = 30
+BACKOFF_MAX = 6 * 60 * 60
+
+# Client errors that no retry will fix
+# (401/403 only land here without rate-limit headers: a bad token or scope)
+PERMANENT_STATUSES = {400, 401, 403, 404, 410, 422}
+
+
+class DeliveryError(Exception):
+    """A message could not be delivered (yet)."""
+
+    def __init__(self, message: str, permanent: bool = False, retry_after: float | None = None):
+        self.permanent = permanent
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+def _marker(dedup_key: str) -> str:
+    return f"<!-- contact-outbox:{dedup_key} -->"
+
+
+# -----------------------------
+# GITHUB CLIENT
+# -----------------------------
+class GitHubIssues:
+    """Minimal GitHub Issues client for one repository."""
+
+    def __init__(self, owner: str, repo: str, token: str | None,
+                 api_url: str = GITHUB_API_URL, timeout=GITHUB_TIMEOUT):
+        self.url = f"{api_url.rstrip('/')}/repos/{owner}/{repo}/issues"
+        self.token = token
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.token)
+
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"token {self.token}",
+            "Accept": "application/vnd.github+json",
+            **trace_headers(),
+        }
+
+    def create_issue(self, title: str, body: str) -> str:
+        """Create an issue and return its URL; raises DeliveryError."""
+        with span("github", endpoint="issues"):
+            try:
+                response = self.session.post(
+                    self.url, json={"title": title, "body": body},
+                    headers=self._headers(), timeout=self.timeout
+                )
+            except requests.RequestException as e:
+                raise DeliveryError(f"GitHub request failed: {e}")
+        self._raise_for_status(response)
+        return response.json().get("html_url", "")
+
+    def find_issue(self, marker: str, since: datetime) -> str | None:
+        """URL of an issue created since `since` whose body contains marker."""
+        with span("github", endpoint="issues.list"):
+            try:
+                response = self.session.get(
+                    self.url,
+                    params={"state": "all", "since": since.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                            "per_page": 100},
+                    headers=self._headers(), timeout=self.timeout
+                )
+            except requests.RequestException as e:
+                raise DeliveryError(f"GitHub request failed: {e}")
+        self._raise_for_status(response)
+        for issue in response.json():
+            if marker in (issue.get("body") or ""):
+                return issue.get("html_url", "")
+        return None
+
+    @staticmethod
+    def _raise_for_status(response) -> None:
+        status = response.status_code
+        if status < 300:
+            return
+
+        retry_after = response.headers.get("Retry-After")
+        rate_limited = status == 429 or (status == 403 and (
+            retry_after or response.headers.get("X-RateLimit-Remaining") == "0"
+        ))
+        if rate_limited:
+            if retry_after and retry_after.isdigit():
+                wait = float(retry_after)
+            else:
+                reset = response.headers.get("X-RateLimit-Reset", "")
+                wait = float(reset) - time.time() if reset.isdigit() else 60.0
+            raise DeliveryError(f"GitHub rate limit ({status})", retry_after=max(wait, 1.0))
+
+        raise DeliveryError(
+            f"GitHub returned {status}: {response.text[:200]}",
+            permanent=status in PERMANENT_STATUSES
+        )
+
+
+# -----------------------------
+# ENQUEUE
+# -----------------------------
+def enqueue_contact(name: str, email: str, message: str) -> ContactMessage:
+    """
+    Store a contact message for delivery and return it.
+
+    The same name/email/message on the same day is stored once, so
+    double submits and browser retries do not open duplicate issues.
+    """
+    raw = "\x1f".join([
+        name.strip().lower(), email.strip().lower(), message.strip(),
+        datetime.utcnow().date().isoformat()
+    ])
+    dedup_key = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    lookup = select(ContactMessage).where(ContactMessage.dedup_key == dedup_key)
+    existing = db.session.scalar(lookup)
+    if existing is not None:
+        return existing
+
+    contact = ContactMessage(name=name, email=email, message=message, dedup_key=dedup_key)
+    db.session.add(contact)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Concurrent identical submit won the race
+        db.session.rollback()
+        return db.session.scalar(lookup)
+    return contact
+
+
+# -----------------------------
+# DISPATCHER
+# -----------------------------
+class OutboxDispatcher:
+    """Background thread that drains the contact outbox (see module doc)."""
+
+    def __init__(self, app, sender: GitHubIssues, batch_size: int = OUTBOX_BATCH_SIZE,
+                 poll_seconds: float = OUTBOX_POLL_SECONDS,
+                 max_attempts: int = OUTBOX_MAX_ATTEMPTS):
+        self.app = app
+        self.sender = sender
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._warned = False
+        self._paused_until = 0.0  # monotonic time GitHub's rate limit resets
+
+    # -------------------------
+    # THREAD CONTROL
+    # -------------------------
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="contact-outbox", daemon=True)
+            self._thread.start()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout: float = 5) -> None:
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def notify(self) -> None:
+        """Wake the dispatcher now instead of at the next poll."""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            claimed = 0
+            try:
+                with self.app.app_context():
+                    claimed = self.run_once()["claimed"]
+            except Exception as e:
+                logging.error(f"Contact outbox pass failed: {e}")
+            # Keep draining while batches come back full
+            if claimed < self.batch_size:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    # -------------------------
+    # DELIVERY
+    # -------------------------
+    def run_once(self) -> dict:
+        """Claim and deliver one batch. Needs an app context."""
+        counts = {"claimed": 0, "sent": 0, "retried": 0, "failed": 0, "deferred": 0, "lost": 0}
+        if not self.sender.configured:
+            if not self._warned:
+                logging.warning("GITHUB_TOKEN not set; contact messages stay in the outbox.")
+                self._warned = True
+            return counts
+        if time.monotonic() < self._paused_until:
+            return counts
+
+        batch, leases, taken_over = self._claim()
+        counts["claimed"] = len(batch)
+        for position, contact in enumerate(batch):
+            lease = self._renew(contact.id, leases[contact.id])
+            if lease is None:
+                # Our lease ran out and another worker claimed the row
+                db.session.expire(contact)
+                counts["lost"] += 1
+                continue
+            leases[contact.id] = lease
+            try:
+                contact.issue_url = self._deliver(contact, check_existing=contact.id in taken_over)
+            except DeliveryError as e:
+                if e.retry_after is not None:
+                    # Rate limited: not the message's fault, push the rest back unchanged
+                    self._defer(batch[position:], leases, e.retry_after)
+                    self._paused_until = time.monotonic() + e.retry_after
+                    counts["deferred"] += len(batch) - position
+                    logging.warning(f"Contact outbox paused for {e.retry_after:.0f}s: {e}")
+                    db.session.commit()
+                    break
+                counts[self._record_failure(contact, e)] += 1
+            else:
+                contact.status = "sent"
+                contact.delivered_at = datetime.utcnow()
+                contact.claimed_until = None
+                counts["sent"] += 1
+            db.session.commit()
+        return counts
+
+    def _claim(self) -> tuple[list[ContactMessage], dict, set]:
+        """
+        Lease up to batch_size due messages.
+
+        Returns (messages, {id: lease expiry}, ids taken over from a worker
+        whose lease expired mid-delivery).
+        """
+        now = datetime.utcnow()
+        lease = now + timedelta(seconds=CLAIM_SECONDS)
+        due = and_(
+            ContactMessage.status == "pending",
+            ContactMessage.next_attempt_at <= now,
+            or_(ContactMessage.claimed_until.is_(None), ContactMessage.claimed_until < now),
+        )
+        candidates = db.session.execute(
+            select(ContactMessage.id, ContactMessage.claimed_until).where(due)
+            .order_by(ContactMessage.next_attempt_at)
+            .limit(self.batch_size)
+        ).all()
+        if not candidates:
+            db.session.commit()
+            return [], {}, set()
+        # Leases are cleared on every normal outcome; one still set means
+        # its worker died or stalled, possibly after GitHub created the issue
+        taken_over = {row.id for row in candidates if row.claimed_until is not None}
+
+        # `due` is repeated on the UPDATE so a row claimed concurrently is skipped
+        stmt = (
+            update(ContactMessage)
+            .where(ContactMessage.id.in_([row.id for row in candidates]), due)
+            .values(claimed_until=lease)
+            .returning(ContactMessage.id)
+            .execution_options(synchronize_session=False)
+        )
+        ids = db.session.execute(stmt).scalars().all()
+        db.session.commit()
+        if not ids:
+            return [], {}, set()
+        batch = list(db.session.scalars(
+            select(ContactMessage).where(ContactMessage.id.in_(ids)).order_by(ContactMessage.id)
+            .execution_options(populate_existing=True)
+        ))
+        return batch, {contact_id: lease for contact_id in ids}, taken_over & set(ids)
+
+    def _renew(self, contact_id: int, lease: datetime) -> datetime | None:
+        """
+        Extend our lease on a row before sending it. Returns the new expiry,
+        or None if the lease is no longer ours.
+        """
+        renewed = datetime.utcnow() + timedelta(seconds=CLAIM_SECONDS)
+        result = db.session.execute(
+            update(ContactMessage)
+            .where(ContactMessage.id == contact_id,
+                   ContactMessage.status == "pending",
+                   ContactMessage.claimed_until == lease)
+            .values(claimed_until=renewed)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return renewed if result.rowcount == 1 else None
+
+    def _deliver(self, contact: ContactMessage, check_existing: bool = False) -> str:
+        marker = _marker(contact.dedup_key)
+        if contact.attempts or check_existing:
+            # An earlier attempt may have created the issue before failing
+            existing = self.sender.find_issue(marker, contact.created_at - timedelta(minutes=1))
+            if existing is not None:
+                return existing
+        return self.sender.create_issue(
+            f"Contact: {contact.name} ({contact.email})",
+            f"{contact.message}\n\n{marker}"
+        )
+
+    def _record_failure(self, contact: ContactMessage, error: DeliveryError) -> str:
+        contact.attempts += 1
+        contact.last_error = str(error)
+        contact.claimed_until = None
+        if error.permanent or contact.attempts >= self.max_attempts:
+            contact.status = "failed"
+            logging.error(f"Contact message {contact.id} failed permanently: {error}")
+            return "failed"
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (contact.attempts - 1))
+        delay *= random.uniform(0.5, 1.0)
+        contact.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        logging.warning(
+            f"Contact message {contact.id} attempt {contact.attempts} failed, "
+            f"retrying in {delay:.0f}s: {error}"
+        )
+        return "retried"
+
+    @staticmethod
+    def _defer(contacts: list[ContactMessage], leases: dict, seconds: float) -> None:
+        """Push messages back unchanged, leaving rows another worker now leases alone."""
+        retry_at = datetime.utcnow() + timedelta(seconds=seconds)
+        for contact in contacts:
+            db.session.execute(
+                update(ContactMessage)
+                .where(ContactMessage.id == contact.id,
+                       ContactMessage.claimed_until == leases[contact.id])
+                .values(next_attempt_at=retry_at, claimed_until=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.expire(contact)
+
+    def stats(self) -> dict:
+        """Message counts per status. Needs an app context."""
+        rows = db.session.execute(
+            select(ContactMessage.status, func.count()).group_by(ContactMessage.status)
+        ).all()
+        return {
+            "running": self.running,
+            **{status: count for status, count in rows},
+        }
+
+
+def init_outbox(app, sender: GitHubIssues) -> OutboxDispatcher:
+    """
+    Register the outbox dispatcher on the app. Its thread starts with the
+    first request the process serves (never in CLI commands or the
+    reloader's parent), unless OUTBOX_DISPATCHER=0 (e.g. when a separate
+    worker runs `flask deliver-contacts`).
+    """
+    dispatcher = OutboxDispatcher(app, sender)
+    app.extensions["contact_outbox"] = dispatcher
+    if os.getenv("OUTBOX_DISPATCHER", "1") != "0":
+        @app.before_request
+        def _start_outbox_dispatcher():
+            if not dispatcher.running:
+                dispatcher.start()
+    return dispatcher
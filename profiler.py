@@ -0,0 +1,214 @@
+# profiler.py
+"""
+Profiler - Per-request SQL profiling and N+1 detection (debug / staging only).
+
+Hooks SQLAlchemy's cursor events to record every statement executed while
+handling a request: SQL text, parameters, duration and the application
+line that triggered it. After the request it flags
+
+    * repeated statements  - identical SQL *and* parameters run more than once
+    * N+1 patterns         - identical SQL run many times with different
+                             parameters (typically a lazy relationship load
+                             inside a template loop)
+
+and reports a summary in the X-SQL-Profile response header. Append
+?sql_debug=1 to an HTML page to get a debug panel with the full list.
+Statements slower than SQL_SLOW_MS are written to the slow-query log
+together with their EXPLAIN QUERY PLAN output, taken on the engine (primary,
+replica or shard) the statement actually ran on.
+
+Enable with SQL_PROFILE=1 (always on under app.debug or FLASK_DEBUG=1). The
+check happens per request, so app.run(debug=True) switches it on too.
+"""
+
+import os
+import json
+import time
+import logging
+import traceback
+from collections import Counter, defaultdict
+from pathlib import Path
+from markupsafe import escape
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQL_SLOW_MS = float(os.getenv("SQL_SLOW_MS", "100"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "3"))
+
+_PROJECT_DIR = str(Path(__file__).resolve().parent)
+_THIS_FILE = str(Path(__file__).resolve())
+
+slow_query_logger = logging.getLogger("sql.slow")
+
+
+def _origin() -> str:
+    """Return 'file:line in func' of the innermost project frame that ran the query."""
+    for frame in reversed(traceback.extract_stack()[:-3]):
+        if frame.filename.startswith(_PROJECT_DIR) and frame.filename != _THIS_FILE:
+            return f"{Path(frame.filename).name}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+
+# -----------------------------
+# SQLALCHEMY EVENT HOOKS
+# -----------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "sql_queries" in g:
+        conn.info.setdefault("profiler_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not (has_request_context() and "sql_queries" in g):
+        return
+    starts = conn.info.get("profiler_start")
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    g.sql_queries.append({
+        "statement": statement,
+        "parameters": repr(parameters),
+        "raw_parameters": parameters,
+        "duration_ms": round(elapsed_ms, 3),
+        "origin": _origin(),
+        "url": str(conn.engine.url),
+        "engine": conn.engine,
+    })
+
+
+# -----------------------------
+# ANALYSIS
+# -----------------------------
+def analyze(queries: list[dict]) -> dict:
+    """Summarise recorded queries and flag repeats and N+1 patterns."""
+    by_statement = defaultdict(list)
+    for query in queries:
+        by_statement[query["statement"]].append(query)
+
+    exact = Counter((q["statement"], q["parameters"]) for q in queries)
+    repeated = [
+        {"statement": statement, "parameters": params, "count": count}
+        for (statement, params), count in exact.items() if count > 1
+    ]
+
+    n_plus_one = []
+    for statement, group in by_statement.items():
+        distinct_params = {q["parameters"] for q in group}
+        if len(group) >= N_PLUS_ONE_THRESHOLD and len(distinct_params) > 1:
+            n_plus_one.append({
+                "statement": statement,
+                "count": len(group),
+                "origins": sorted({q["origin"] for q in group}),
+            })
+
+    return {
+        "count": len(queries),
+        "total_ms": round(sum(q["duration_ms"] for q in queries), 3),
+        "repeated": repeated,
+        "n_plus_one": n_plus_one,
+        "slow": [q for q in queries if q["duration_ms"] >= SQL_SLOW_MS],
+    }
+
+
+def explain(engine: Engine, statement: str, parameters) -> list:
+    """
+    Return EXPLAIN QUERY PLAN rows (SQLite) or EXPLAIN output for a statement,
+    run on the engine that executed it.
+    """
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    if isinstance(parameters, list):
+        # executemany: the plan is the same for every parameter set
+        parameters = parameters[0] if parameters else ()
+    try:
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql(prefix + statement, parameters or ()).fetchall()
+        return [tuple(row) for row in rows]
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+
+
+def _debug_panel(summary: dict, queries: list[dict]) -> str:
+    """Render a small HTML panel listing the request's queries."""
+    rows = "".join(
+        f"<tr><td>{q['duration_ms']}</td><td>{escape(q['origin'])}</td>"
+        f"<td><code>{escape(q['statement'])}</code><br><small>{escape(q['parameters'])}</small></td></tr>"
+        for q in queries
+    )
+    return (
+        '<div id="sql-debug" style="background:#111;color:#eee;padding:1rem;font-size:12px;">'
+        f"<h3>SQL: {summary['count']} queries, {summary['total_ms']} ms, "
+        f"{len(summary['repeated'])} repeated, {len(summary['n_plus_one'])} N+1</h3>"
+        f"<table><tr><th>ms</th><th>origin</th><th>statement</th></tr>{rows}</table></div>"
+    )
+
+
+# -----------------------------
+# FLASK INTEGRATION
+# -----------------------------
+def profiling_enabled(app) -> bool:
+    return app.debug or os.getenv("SQL_PROFILE") == "1" or os.getenv("FLASK_DEBUG") == "1"
+
+
+def init_profiler(app, db) -> None:
+    """
+    Attach the profiler to app. Each request is profiled only while
+    SQL_PROFILE is set or app.debug is on (checked per request).
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    slow_log = os.getenv("SQL_SLOW_LOG", "sql_slow.log")
+    if slow_log and not slow_query_logger.handlers:
+        # delay: no log file unless a slow query is actually recorded
+        handler = logging.FileHandler(slow_log, delay=True)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(logging.INFO)
+        slow_query_logger.propagate = False
+
+    @app.before_request
+    def _start_sql_profile():
+        if profiling_enabled(app):
+            g.sql_queries = []
+
+    @app.after_request
+    def _finish_sql_profile(response):
+        queries = g.pop("sql_queries", None)
+        if queries is None:
+            return response
+        summary = analyze(queries)
+
+        response.headers["X-SQL-Profile"] = (
+            f"count={summary['count']}; total_ms={summary['total_ms']}; "
+            f"repeated={len(summary['repeated'])}; n_plus_one={len(summary['n_plus_one'])}"
+        )
+
+        for pattern in summary["n_plus_one"]:
+            logging.warning(
+                f"Possible N+1 on {request.path}: {pattern['count']}x "
+                f"{pattern['statement'][:120]} from {pattern['origins']}"
+            )
+
+        for query in summary["slow"]:
+            slow_query_logger.info(json.dumps({
+                "path": request.path,
+                "duration_ms": query["duration_ms"],
+                "origin": query["origin"],
+                "statement": query["statement"],
+                "parameters": query["parameters"],
+                "url": query["url"],
+                "plan": [
+                    str(row) for row in
+                    explain(query["engine"], query["statement"], query["raw_parameters"])
+                ],
+            }))
+
+        if (request.args.get("sql_debug") == "1"
+                and response.mimetype == "text/html"
+                and not response.direct_passthrough):
+            body = response.get_data(as_text=True)
+            panel = _debug_panel(summary, queries)
+            response.set_data(body.replace("</body>", panel + "</body>", 1))
+
+        return response
@@ -0,0 +1,301 @@
+# quota.py
+"""
+Quota - Token-bucket rate limiting for upstream API keys (OMDb, Gemini).
+
+Bucket state lives in a small SQLite file so every worker process draws
+from the same budget. Each upstream has a pool of (possibly rotated) keys;
+a key may carry several limits (e.g. requests per minute and per day) and
+is only handed out when all of them have tokens left.
+
+Background work (bulk enrichment) is only served while a key stays above a
+reserve, so interactive adds keep working when quota runs low. A key the
+upstream itself rejected is blocked outright until an explicit time
+instead of refilling gradually.
+"""
+
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Fraction of every bucket that background callers may not consume
+BACKGROUND_RESERVE = float(os.getenv("QUOTA_BACKGROUND_RESERVE", "0.2"))
+
+# Longest block for a key the upstream reported exhausted without a Retry-After
+EXHAUSTED_BLOCK_SECONDS = float(os.getenv("QUOTA_EXHAUSTED_BLOCK_SECONDS", "3600"))
+
+QUOTA_DB_PATH = os.getenv(
+    "QUOTA_DB_PATH", str(Path(__file__).resolve().parent / "data" / "quota.db")
+)
+
+
+@dataclass(frozen=True)
+class Limit:
+    """A token bucket: `capacity` requests refilled evenly over `per_seconds`."""
+    name: str
+    capacity: float
+    per_seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.per_seconds
+
+
+# -----------------------------
+# SHARED BUCKET STORE
+# -----------------------------
+class BucketStore:
+    """Token buckets persisted in SQLite, updated under an IMMEDIATE lock."""
+
+    def __init__(self, path: str = QUOTA_DB_PATH):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS blocks ("
+            "name TEXT PRIMARY KEY, blocked_until REAL NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def transaction(self):
+        """Return a connection inside BEGIN IMMEDIATE (one writer at a time)."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    @staticmethod
+    def refill(conn, name: str, limit: Limit, now: float) -> float:
+        """Return the current token count for a bucket (full if never used)."""
+        row = conn.execute(
+            "SELECT tokens, updated_at FROM buckets WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            return limit.capacity
+        tokens, updated_at = row
+        return min(limit.capacity, tokens + max(0.0, now - updated_at) * limit.rate)
+
+    @staticmethod
+    def blocked_until(conn, name: str, now: float) -> float:
+        """Time until which the upstream refuses this key (0 if not blocked)."""
+        row = conn.execute(
+            "SELECT blocked_until FROM blocks WHERE name = ?", (name,)
+        ).fetchone()
+        return row[0] if row and row[0] > now else 0.0
+
+    @staticmethod
+    def block(conn, name: str, until: float) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO blocks (name, blocked_until) VALUES (?, ?)", (name, until)
+        )
+
+    @staticmethod
+    def save(conn, name: str, tokens: float, now: float) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+            (name, tokens, now)
+        )
+
+    def take(self, name: str, limit: Limit, cost: float = 1.0,
+             reserve: float = 0.0) -> tuple[bool, float, float]:
+        """
+        Try to take `cost` tokens from a single bucket.
+
+        Returns:
+            allowed (bool): True if the tokens were taken
+            remaining (float): Tokens left afterwards
+            retry_after (float): Seconds until enough tokens are available
+        """
+        now = time.time()
+        conn = self.transaction()
+        try:
+            tokens = self.refill(conn, name, limit, now)
+            allowed = tokens - cost >= reserve
+            if allowed:
+                tokens -= cost
+            self.save(conn, name, tokens, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        retry_after = 0.0 if allowed else (cost + reserve - tokens) / limit.rate
+        return allowed, tokens, retry_after
+
+
+# -----------------------------
+# API KEY POOLS
+# -----------------------------
+class ApiKeyPool:
+    """Rotating set of API keys for one upstream, each with its own limits."""
+
+    def __init__(self, upstream: str, keys: list[str], limits: list[Limit],
+                 store: BucketStore | None = None):
+        self.upstream = upstream
+        self.keys = [key for key in keys if key]
+        self.limits = limits
+        self._store = store
+        self.denied = {INTERACTIVE: 0, BACKGROUND: 0}
+
+    @property
+    def store(self) -> BucketStore:
+        # Created lazily so importing this module never touches the disk
+        if self._store is None:
+            self._store = BucketStore()
+        return self._store
+
+    def __bool__(self) -> bool:
+        return bool(self.keys)
+
+    @staticmethod
+    def _label(key: str) -> str:
+        """Short, non-secret identifier for a key (hash of the whole key)."""
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:10]
+
+    def _bucket_prefix(self, key: str) -> str:
+        return f"{self.upstream}:{self._label(key)}"
+
+    def _bucket(self, key: str, limit: Limit) -> str:
+        return f"{self._bucket_prefix(key)}:{limit.name}"
+
+    def acquire(self, priority: str = INTERACTIVE) -> str | None:
+        """
+        Take one request's worth of quota and return the key to use.
+
+        Picks the key with the most headroom. Returns None when every key is
+        out of quota (or, for background work, down to the reserve).
+        """
+        if not self.keys:
+            return None
+
+        now = time.time()
+        conn = self.store.transaction()
+        try:
+            best_key, best_tokens, best_score = None, None, -1.0
+            for key in self.keys:
+                if self.store.blocked_until(conn, self._bucket_prefix(key), now):
+                    continue
+                tokens = {
+                    limit: self.store.refill(conn, self._bucket(key, limit), limit, now)
+                    for limit in self.limits
+                }
+                reserve = BACKGROUND_RESERVE if priority == BACKGROUND else 0.0
+                if all(tokens[limit] - 1 >= limit.capacity * reserve for limit in self.limits):
+                    score = min(tokens[limit] / limit.capacity for limit in self.limits)
+                    if score > best_score:
+                        best_key, best_tokens, best_score = key, tokens, score
+
+            if best_key is not None:
+                for limit, value in best_tokens.items():
+                    self.store.save(conn, self._bucket(best_key, limit), value - 1, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if best_key is None:
+            self.denied[priority] = self.denied.get(priority, 0) + 1
+            logging.warning(f"{self.upstream} quota exhausted for {priority} request")
+        return best_key
+
+    def mark_exhausted(self, key: str, limit_name: str | None = None,
+                       retry_after: float | None = None) -> None:
+        """
+        Empty a key's buckets and block the key after the upstream itself
+        reported a limit: for retry_after seconds if the upstream said so,
+        else for the affected limit's window (at most EXHAUSTED_BLOCK_SECONDS).
+        """
+        now = time.time()
+        affected = [
+            limit for limit in self.limits if limit_name is None or limit.name == limit_name
+        ]
+        if retry_after is None:
+            retry_after = min(
+                [limit.per_seconds for limit in affected] + [EXHAUSTED_BLOCK_SECONDS]
+            )
+        conn = self.store.transaction()
+        try:
+            for limit in affected:
+                self.store.save(conn, self._bucket(key, limit), 0.0, now)
+            self.store.block(conn, self._bucket_prefix(key), now + retry_after)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def remaining(self) -> dict:
+        """Return remaining tokens per key and limit (for metrics)."""
+        now = time.time()
+        conn = self.store._connect()
+        return {
+            "keys": {
+                self._label(key): {
+                    **{
+                        limit.name: {
+                            "remaining": round(
+                                self.store.refill(conn, self._bucket(key, limit), limit, now), 2
+                            ),
+                            "capacity": limit.capacity,
+                        }
+                        for limit in self.limits
+                    },
+                    "blocked_for": round(max(
+                        0.0, self.store.blocked_until(conn, self._bucket_prefix(key), now) - now
+                    ), 1),
+                }
+                for key in self.keys
+            },
+            "denied": dict(self.denied),
+        }
+
+
+def _env_keys(plural: str, single: str) -> list[str]:
+    """Read a comma-separated key list, falling back to the single-key variable."""
+    raw = os.getenv(plural) or os.getenv(single) or ""
+    return [key.strip() for key in raw.split(",") if key.strip()]
+
+
+# -----------------------------
+# DEFAULT POOLS
+# -----------------------------
+# OMDb free keys allow 1,000 requests per day
+omdb_quota = ApiKeyPool(
+    "omdb",
+    _env_keys("OMDB_API_KEYS", "OMDB_API_KEY"),
+    [Limit("day", float(os.getenv("OMDB_DAILY_LIMIT", "1000")), 24 * 60 * 60)]
+)
+
+# Gemini free tier is limited per minute and per day
+gemini_quota = ApiKeyPool(
+    "gemini",
+    _env_keys("GEMINI_API_KEYS", "GEMINI_API_KEY"),
+    [
+        Limit("minute", float(os.getenv("GEMINI_RPM", "10")), 60),
+        Limit("day", float(os.getenv("GEMINI_DAILY_LIMIT", "250")), 24 * 60 * 60),
+    ]
+)
+
+
+def quota_stats() -> dict:
+    """Remaining quota for every upstream."""
+    return {"omdb": omdb_quota.remaining(), "gemini": gemini_quota.remaining()}
@@ -0,0 +1,297 @@
+# ratelimit.py
+"""
+RateLimit - Per-client rate limiting and admission control for expensive routes.
+
+Two independent guards, both backed by a SQLite file so that every worker
+process sees the same counters:
+
+    * a token bucket per client (IP address and, when known, user id)
+    * a cross-process concurrency cap: at most N requests run the expensive
+      section at once, a short queue may wait briefly, everyone else gets an
+      immediate 429 instead of tying up a worker
+
+Clients are identified by request.remote_addr. Behind a reverse proxy set
+TRUSTED_PROXIES (number of proxies in front of the app) so app.py applies
+werkzeug's ProxyFix; otherwise every client shares the proxy's bucket.
+"""
+
+import os
+import time
+import uuid
+import logging
+import functools
+from contextlib import contextmanager
+from pathlib import Path
+from flask import request
+from werkzeug.exceptions import TooManyRequests
+
+try:
+    from MovieWebApp.quota import BucketStore, Limit
+except ModuleNotFoundError:
+    from quota import BucketStore, Limit
+
+RATELIMIT_DB_PATH = os.getenv(
+    "RATELIMIT_DB_PATH", str(Path(__file__).resolve().parent / "data" / "ratelimit.db")
+)
+
+# Seconds after which a slot held by a crashed worker is reclaimed
+SLOT_LEASE_SECONDS = 120
+QUEUE_POLL_SECONDS = 0.05
+# Idle buckets (full again) and expired slots are deleted every N checks
+PURGE_EVERY = 500
+
+
+class RateLimited(TooManyRequests):
+    """429 carrying a Retry-After hint."""
+
+    def __init__(self, description: str, retry_after: float):
+        super().__init__(description)
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+    def get_headers(self, environ=None, scope=None):
+        headers = super().get_headers(environ, scope)
+        headers.append(("Retry-After", str(self.retry_after)))
+        return headers
+
+
+def parse_rate(value: str) -> Limit:
+    """Parse "10/60" (10 requests per 60 seconds) into a Limit."""
+    count, _, seconds = value.partition("/")
+    return Limit("rate", float(count), float(seconds or 60))
+
+
+# -----------------------------
+# STORE
+# -----------------------------
+class AdmissionStore(BucketStore):
+    """Bucket store plus a table of concurrency slots and waiters."""
+
+    def __init__(self, path: str = RATELIMIT_DB_PATH):
+        super().__init__(path)
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS slots ("
+            "id TEXT PRIMARY KEY, name TEXT NOT NULL, state TEXT NOT NULL, "
+            "expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_slots_name ON slots (name, state)")
+        self._checks = 0
+
+    def take_all(self, names: list[str], limit: Limit,
+                 cost: float = 1.0) -> tuple[str | None, float]:
+        """
+        Take cost tokens from every bucket, or from none of them.
+
+        Returns (None, 0) when allowed, else (first denying bucket,
+        seconds until it has enough tokens).
+        """
+        now = time.time()
+        conn = self.transaction()
+        try:
+            tokens = {name: self.refill(conn, name, limit, now) for name in names}
+            denied = next((name for name in names if tokens[name] < cost), None)
+            if denied is None:
+                for name in names:
+                    self.save(conn, name, tokens[name] - cost, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._checks += 1
+        if self._checks % PURGE_EVERY == 0:
+            self.purge(names[0].split(":", 1)[0], limit)
+        if denied is None:
+            return None, 0.0
+        return denied, (cost - tokens[denied]) / limit.rate
+
+    def purge(self, prefix: str, limit: Limit) -> None:
+        """Drop this limiter's buckets that have refilled completely, and dead slots."""
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "DELETE FROM buckets WHERE name GLOB ? AND updated_at <= ?",
+                (f"{prefix}:*", now - limit.per_seconds)
+            )
+            conn.execute("DELETE FROM slots WHERE expires_at <= ?", (now,))
+
+    def try_enter(self, name: str, ticket: str, max_active: int, max_queue: int,
+                  waiting: bool) -> str:
+        """
+        Try to claim an active slot for ticket.
+
+        Returns "active" (slot claimed), "queued" (wait and retry) or
+        "rejected" (queue full).
+        """
+        now = time.time()
+        conn = self.transaction()
+        try:
+            conn.execute("DELETE FROM slots WHERE expires_at <= ?", (now,))
+            active = conn.execute(
+                "SELECT COUNT(*) FROM slots WHERE name = ? AND state = 'active'", (name,)
+            ).fetchone()[0]
+            if active < max_active:
+                conn.execute(
+                    "INSERT OR REPLACE INTO slots (id, name, state, expires_at) "
+                    "VALUES (?, ?, 'active', ?)",
+                    (ticket, name, now + SLOT_LEASE_SECONDS)
+                )
+                outcome = "active"
+            elif waiting:
+                conn.execute(
+                    "UPDATE slots SET expires_at = ? WHERE id = ?",
+                    (now + SLOT_LEASE_SECONDS, ticket)
+                )
+                outcome = "queued"
+            else:
+                queued = conn.execute(
+                    "SELECT COUNT(*) FROM slots WHERE name = ? AND state = 'queued'", (name,)
+                ).fetchone()[0]
+                if queued < max_queue:
+                    conn.execute(
+                        "INSERT INTO slots (id, name, state, expires_at) "
+                        "VALUES (?, ?, 'queued', ?)",
+                        (ticket, name, now + SLOT_LEASE_SECONDS)
+                    )
+                    outcome = "queued"
+                else:
+                    outcome = "rejected"
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return outcome
+
+    def leave(self, ticket: str) -> None:
+        """Release a slot or queue position."""
+        conn = self._connect()
+        conn.execute("DELETE FROM slots WHERE id = ?", (ticket,))
+
+    def occupancy(self, name: str) -> dict:
+        rows = self._connect().execute(
+            "SELECT state, COUNT(*) FROM slots WHERE name = ? AND expires_at > ? "
+            "GROUP BY state",
+            (name, time.time())
+        ).fetchall()
+        return dict(rows)
+
+
+# -----------------------------
+# LIMITER
+# -----------------------------
+class RouteLimiter:
+    """Rate limit and concurrency cap for one named group of routes."""
+
+    def __init__(self, name: str, rate: str, max_concurrent: int = 4,
+                 max_queue: int = 4, queue_timeout: float = 2.0,
+                 store: AdmissionStore | None = None):
+        self.name = name
+        self.limit = parse_rate(rate)
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._store = store
+
+    @classmethod
+    def from_env(cls, name: str, rate: str, max_concurrent: int = 4, **kwargs):
+        """Build a limiter, letting RATE_LIMIT_<NAME> / MAX_CONCURRENT_<NAME> override."""
+        prefix = name.upper()
+        return cls(
+            name,
+            os.getenv(f"RATE_LIMIT_{prefix}", rate),
+            int(os.getenv(f"MAX_CONCURRENT_{prefix}", max_concurrent)),
+            **kwargs
+        )
+
+    @property
+    def store(self) -> AdmissionStore:
+        if self._store is None:
+            self._store = AdmissionStore()
+        return self._store
+
+    @staticmethod
+    def client_keys(user_id=None) -> list[str]:
+        """Identities a request is counted against."""
+        keys = [f"ip:{request.remote_addr or 'unknown'}"]
+        if user_id is not None:
+            keys.append(f"user:{user_id}")
+        return keys
+
+    def check_rate(self, user_id=None) -> None:
+        """
+        Consume one token per identity or raise RateLimited. A denied
+        request costs no identity anything (all buckets or none).
+        """
+        buckets = [f"{self.name}:{key}" for key in self.client_keys(user_id)]
+        denied, retry_after = self.store.take_all(buckets, self.limit)
+        if denied is not None:
+            logging.warning(f"Rate limit hit on '{self.name}' for {denied.split(':', 1)[1]}")
+            raise RateLimited("Too many requests. Please slow down.", retry_after)
+
+    @contextmanager
+    def slot(self):
+        """Hold one of max_concurrent slots for the duration of the block."""
+        ticket = uuid.uuid4().hex
+        deadline = time.monotonic() + self.queue_timeout
+        waiting = False
+        try:
+            while True:
+                outcome = self.store.try_enter(
+                    self.name, ticket, self.max_concurrent, self.max_queue, waiting
+                )
+                if outcome == "active":
+                    break
+                if outcome == "rejected" or time.monotonic() >= deadline:
+                    logging.warning(f"Admission rejected on '{self.name}' ({outcome})")
+                    raise RateLimited("The server is busy. Please try again shortly.", 1)
+                waiting = True
+                time.sleep(QUEUE_POLL_SECONDS)
+            yield
+        finally:
+            self.store.leave(ticket)
+
+    @contextmanager
+    def admit(self, user_id=None):
+        """Rate-limit then hold a concurrency slot (use around expensive work)."""
+        self.check_rate(user_id)
+        with self.slot():
+            yield
+
+    def guard(self, methods=("POST",), user_arg: str | None = "user_id"):
+        """
+        Decorator applying admit() to a Flask view for the given methods.
+
+        The user id is taken from the URL (or form) field named user_arg.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method not in methods:
+                    return view(*args, **kwargs)
+                user_id = None
+                if user_arg:
+                    user_id = kwargs.get(user_arg) or request.form.get(user_arg)
+                with self.admit(user_id):
+                    return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def limited(self, func):
+        """
+        Decorator applying admit() to each call of func - for upstream work
+        behind a cache, so requests the cache answers cost no tokens.
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.admit():
+                return func(*args, **kwargs)
+        return wrapper
+
+    def stats(self) -> dict:
+        return {
+            "rate": f"{self.limit.capacity:g}/{self.limit.per_seconds:g}s",
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "occupancy": self.store.occupancy(self.name),
+        }
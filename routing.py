@@ -0,0 +1,188 @@
+# routing.py
+"""
+Routing - Read/write splitting across a primary database and read replicas.
+
+Replicas are ordinary Flask-SQLAlchemy binds (SQLALCHEMY_BINDS). The
+RoutingSession sends:
+
+    * flushes, INSERT/UPDATE/DELETE and anything after a write in the same
+      request to the primary
+    * reads from a client that wrote within READ_AFTER_WRITE_SECONDS to the
+      primary (tracked in the Flask session cookie), so users see their own
+      changes despite replica lag
+    * every other read to a healthy replica, round-robin
+
+pinned_to_primary() tells other layers (e.g. the page cache) that this
+client must not be served replica-era data; inside `with primary_reads():`
+every read goes to the primary.
+
+A replica that fails a health check (or a query) is skipped for a cooldown
+period; with no healthy replica, reads fall back to the primary.
+
+Locally this works with several SQLite files, e.g.
+DATABASE_REPLICA_URIS=sqlite:///data/replica1.db,sqlite:///data/replica2.db
+"""
+
+import time
+import logging
+import threading
+import itertools
+from contextlib import contextmanager
+import sqlalchemy as sa
+from flask import current_app, g, has_app_context, has_request_context, session
+from flask_sqlalchemy.session import Session
+
+READ_AFTER_WRITE_SECONDS = 5
+HEALTH_CHECK_INTERVAL = 30
+UNHEALTHY_COOLDOWN = 30
+
+
+class ReplicaRouter:
+    """Round-robin over replica bind keys with periodic health checks."""
+
+    def __init__(self, bind_keys: list[str], read_after_write: float = READ_AFTER_WRITE_SECONDS):
+        self.bind_keys = list(bind_keys)
+        self.read_after_write = read_after_write
+        self._cycle = itertools.cycle(self.bind_keys) if self.bind_keys else None
+        self._lock = threading.Lock()
+        self._checked_at = {}   # bind key -> last successful check
+        self._down_until = {}   # bind key -> time it may be retried
+
+    def mark_down(self, bind_key: str) -> None:
+        with self._lock:
+            self._down_until[bind_key] = time.monotonic() + UNHEALTHY_COOLDOWN
+        logging.error(f"Read replica '{bind_key}' marked unhealthy")
+
+    def _healthy(self, bind_key: str, engine) -> bool:
+        now = time.monotonic()
+        if self._down_until.get(bind_key, 0) > now:
+            return False
+        if now - self._checked_at.get(bind_key, 0) < HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            with engine.connect() as conn:
+                conn.execute(sa.text("SELECT 1"))
+        except Exception as e:
+            logging.error(f"Health check failed for replica '{bind_key}': {e}")
+            self.mark_down(bind_key)
+            return False
+        self._checked_at[bind_key] = now
+        return True
+
+    def choose(self, engines) -> sa.engine.Engine | None:
+        """Return the next healthy replica engine, or None to use the primary."""
+        if not self._cycle:
+            return None
+        for _ in range(len(self.bind_keys)):
+            with self._lock:
+                bind_key = next(self._cycle)
+            engine = engines.get(bind_key)
+            if engine is not None and self._healthy(bind_key, engine):
+                return engine
+        return None
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        return {
+            key: "down" if self._down_until.get(key, 0) > now else "up"
+            for key in self.bind_keys
+        }
+
+
+def _router():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("replica_router")
+
+
+def pinned_to_primary() -> bool:
+    """True if this client wrote recently enough that replicas may lag behind."""
+    if not has_request_context():
+        return False
+    return session.get("_primary_until", 0) > time.time()
+
+
+@contextmanager
+def primary_reads():
+    """Send every read in the block to the primary (e.g. to fill a shared cache)."""
+    if not has_app_context():
+        yield
+        return
+    g._primary_reads = g.get("_primary_reads", 0) + 1
+    try:
+        yield
+    finally:
+        g._primary_reads -= 1
+
+
+def _forced_primary() -> bool:
+    return has_app_context() and g.get("_primary_reads", 0) > 0
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that splits reads and writes (see module doc)."""
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        self._wrote = False
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        router = _router()
+        if router is None or bind is not None:
+            return primary
+
+        # Models bound to another bind key keep their own engine
+        if primary is not self._db.engines.get(None):
+            return primary
+
+        is_write = self._flushing or isinstance(clause, sa.sql.expression.UpdateBase)
+        if is_write:
+            self._wrote = True
+            return primary
+        if self._wrote or pinned_to_primary() or _forced_primary():
+            return primary
+
+        return router.choose(self._db.engines) or primary
+
+    def commit(self):
+        wrote = self._wrote or bool(self.new or self.dirty or self.deleted)
+        super().commit()
+        router = _router()
+        if wrote and router is not None and has_request_context():
+            session["_primary_until"] = time.time() + router.read_after_write
+
+    def close(self):
+        self._wrote = False
+        super().close()
+
+
+def init_replicas(app, db) -> ReplicaRouter | None:
+    """
+    Register the replica router for replica binds in app.config.
+
+    Expects SQLALCHEMY_REPLICA_BINDS: list of bind keys present in
+    SQLALCHEMY_BINDS. Must run after db.init_app(app).
+    """
+    bind_keys = app.config.get("SQLALCHEMY_REPLICA_BINDS") or []
+    if not bind_keys:
+        return None
+
+    router = ReplicaRouter(
+        bind_keys,
+        float(app.config.get("READ_AFTER_WRITE_SECONDS", READ_AFTER_WRITE_SECONDS))
+    )
+    app.extensions["replica_router"] = router
+
+    def _error_listener(bind_key):
+        def _on_error(context):
+            if context.is_disconnect:
+                router.mark_down(bind_key)
+        return _on_error
+
+    # A replica whose connection breaks mid-request is taken out of rotation
+    with app.app_context():
+        for key in bind_keys:
+            sa.event.listen(db.engines[key], "handle_error", _error_listener(key))
+
+    return router
@@ -0,0 +1,362 @@
+# semantic.py
+"""
+Semantic - Near-duplicate detection for AI suggestion queries.
+
+"best sci fi films", "top science fiction movies" and "great sci-fi movies"
+ask for the same thing. Queries are normalized (lowercase, synonyms,
+stopwords, light stemming of genre words) and embedded as hashed word / bigram /
+character-trigram features in a fixed-size NumPy vector. Past queries and
+their suggestion lists live in a small SQLite file; an in-memory matrix of
+their vectors is searched with one dot product, and a stored result is
+reused when the cosine similarity reaches SEMANTIC_THRESHOLD and both
+queries name exactly the same titles / people (every token outside the
+genre vocabulary must match as typed: "like Alien" never answers "like
+Aliens").
+
+Only genuinely new intents reach Gemini. Embeddings use crc32, so vectors
+are identical across processes and restarts.
+"""
+
+import os
+import re
+import time
+import zlib
+import pickle
+import sqlite3
+import logging
+import functools
+import threading
+from pathlib import Path
+import numpy as np
+
+SEMANTIC_DB_PATH = os.getenv(
+    "SEMANTIC_DB_PATH", str(Path(__file__).resolve().parent / "data" / "semantic.db")
+)
+SEMANTIC_THRESHOLD = float(os.getenv("SEMANTIC_THRESHOLD", "0.8"))
+SEMANTIC_TTL = float(os.getenv("SEMANTIC_TTL", str(7 * 24 * 60 * 60)))
+SEMANTIC_MAX_ENTRIES = int(os.getenv("SEMANTIC_MAX_ENTRIES", "2000"))
+# Past max_entries, evict down to this fraction in one go (every eviction
+# makes each process reload its matrix); the newest fraction is never evicted
+EVICT_TO = 0.9
+PROTECT_NEWEST = 0.1
+
+EMBED_DIM = 1024
+
+# Feature weights: whole words dominate, bigrams keep some word order,
+# character trigrams absorb typos and inflections the stemmer misses
+WORD_WEIGHT = 1.0
+BIGRAM_WEIGHT = 0.5
+TRIGRAM_WEIGHT = 0.25
+
+# -----------------------------
+# NORMALIZATION
+# -----------------------------
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Multi-word phrases collapsed to one token before tokenizing
+PHRASE_SYNONYMS = {
+    "science fiction": "scifi",
+    "sci fi": "scifi",
+    "romantic comedy": "romcom",
+    "rom com": "romcom",
+    "world war ii": "ww2",
+    "world war 2": "ww2",
+    "second world war": "ww2",
+    "super hero": "superhero",
+    "coming of age": "comingofage",
+    "film noir": "noir",
+}
+_PHRASE_RE = re.compile(
+    r"\b(" + "|".join(re.escape(p) for p in sorted(PHRASE_SYNONYMS, key=len, reverse=True)) + r")\b"
+)
+
+SYNONYMS = {
+    "film": "movie", "films": "movie", "flick": "movie", "flicks": "movie",
+    "movies": "movie", "cinema": "movie",
+    "top": "best", "greatest": "best", "great": "best", "finest": "best",
+    "good": "best", "awesome": "best", "classic": "best", "classics": "best",
+    "scary": "horror", "frightening": "horror", "creepy": "horror",
+    "funny": "comedy", "hilarious": "comedy", "comedies": "comedy",
+    "animated": "animation", "cartoon": "animation", "cartoons": "animation",
+    "kids": "family", "children": "family", "childrens": "family",
+    "romantic": "romance", "thrilling": "thriller",
+    "wwii": "ww2", "superheroes": "superhero",
+}
+
+# Descriptive words the stemmer may fold ("thrillers" -> "thriller"). Any
+# other token is treated as part of a title or name and kept as typed.
+GENRES = {
+    "action", "adventure", "animation", "biography", "comedy", "crime",
+    "documentary", "drama", "family", "fantasy", "history", "horror", "musical",
+    "mystery", "romance", "scifi", "sport", "thriller", "war", "western",
+    "noir", "superhero", "romcom", "ww2", "comingofage", "heist", "zombie",
+    "vampire", "spy", "detective", "monster", "disaster", "martial", "anime",
+    "indie", "short", "series", "sequel", "remake", "trilogy", "franchise",
+}
+VOCABULARY = GENRES | set(SYNONYMS.values()) | set(PHRASE_SYNONYMS.values())
+
+STOPWORDS = {
+    "a", "an", "the", "of", "for", "to", "in", "on", "at", "by", "with", "and",
+    "or", "about", "some", "any", "me", "my", "i", "we", "you", "want", "show",
+    "give", "list", "find", "suggest", "suggestion", "suggestions", "recommend",
+    "recommendation", "recommendations", "please", "that", "which", "are", "is",
+    "be", "like", "similar", "from", "all", "time", "ever", "watch",
+    # Every query is about movies; the word itself carries no intent
+    "movie",
+}
+
+
+def _stem(token: str) -> str:
+    """Light suffix stripping (plural / -ing / -ed); numbers are left alone."""
+    if token.isdigit() or len(token) <= 3:
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith("ing") and len(token) > 5:
+        return token[:-3]
+    if token.endswith("ed") and len(token) > 5:
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def normalize(query: str) -> list[str]:
+    """Query -> canonical tokens, e.g. 'Top Sci-Fi films' -> ['best', 'scifi']."""
+    text = " ".join(_TOKEN_RE.findall((query or "").lower()))
+    text = _PHRASE_RE.sub(lambda m: PHRASE_SYNONYMS[m.group(1)], text)
+    tokens = []
+    for token in text.split():
+        token = SYNONYMS.get(token, token)
+        stem = _stem(token)
+        stem = SYNONYMS.get(stem, stem)
+        if stem in VOCABULARY or stem in STOPWORDS:
+            token = stem
+        if token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def title_tokens(tokens: list[str]) -> frozenset:
+    """Tokens outside the genre vocabulary (titles, names, years) - must match exactly."""
+    return frozenset(t for t in tokens if t not in VOCABULARY)
+
+
+def embed(tokens: list[str]) -> np.ndarray:
+    """Hashed bag of words, bigrams and character trigrams, L2-normalized."""
+    features = [(f"w:{t}", WORD_WEIGHT) for t in tokens]
+    features += [(f"b:{a} {b}", BIGRAM_WEIGHT) for a, b in zip(tokens, tokens[1:])]
+    for token in tokens:
+        padded = f"#{token}#"
+        features += [(f"c:{padded[i:i + 3]}", TRIGRAM_WEIGHT) for i in range(len(padded) - 2)]
+
+    vector = np.zeros(EMBED_DIM, dtype=np.float32)
+    if not features:
+        return vector
+    hashes = np.array([zlib.crc32(f.encode("utf-8")) for f, _ in features], dtype=np.uint64)
+    weights = np.array([w for _, w in features], dtype=np.float32)
+    # Low bits pick the bucket, a high bit the sign (keeps collisions unbiased)
+    signs = np.where((hashes >> np.uint64(31)) & np.uint64(1), -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, (hashes % np.uint64(EMBED_DIM)).astype(np.intp), weights * signs)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+# -----------------------------
+# INDEX
+# -----------------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    id INTEGER PRIMARY KEY,
+    variant TEXT NOT NULL,
+    normalized TEXT NOT NULL,
+    query TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    result BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (variant, normalized)
+);
+"""
+
+
+class SemanticIndex:
+    """
+    Past queries and their results, searchable by embedding similarity.
+
+    Rows live in SQLite (shared by all workers); each process keeps the
+    vectors in a NumPy matrix and only loads rows it has not seen yet.
+    """
+
+    def __init__(self, path: str = SEMANTIC_DB_PATH, threshold: float = SEMANTIC_THRESHOLD,
+                 ttl: float = SEMANTIC_TTL, max_entries: int = SEMANTIC_MAX_ENTRIES):
+        self.path = str(path)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._variants = []
+        self._titles = []
+        self._created = np.zeros(0, dtype=np.float64)
+        self._matrix = np.zeros((0, EMBED_DIM), dtype=np.float32)
+        self._last_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _refresh(self) -> None:
+        """Append rows added by any process; reload fully if rows were evicted."""
+        conn = self._connect()
+        count, = conn.execute("SELECT COUNT(*) FROM queries").fetchone()
+        with self._lock:
+            new_rows = conn.execute(
+                "SELECT id, variant, vector, created_at, query FROM queries WHERE id > ? ORDER BY id",
+                (self._last_id,)
+            ).fetchall()
+            if len(self._ids) + len(new_rows) != count:
+                self._ids = np.zeros(0, dtype=np.int64)
+                self._variants = []
+                self._titles = []
+                self._created = np.zeros(0, dtype=np.float64)
+                self._matrix = np.zeros((0, EMBED_DIM), dtype=np.float32)
+                new_rows = conn.execute(
+                    "SELECT id, variant, vector, created_at, query FROM queries ORDER BY id"
+                ).fetchall()
+            if not new_rows:
+                return
+            self._ids = np.concatenate([self._ids, [row[0] for row in new_rows]])
+            self._variants += [row[1] for row in new_rows]
+            self._titles += [title_tokens(normalize(row[4])) for row in new_rows]
+            self._created = np.concatenate([self._created, [row[3] for row in new_rows]])
+            self._matrix = np.vstack([
+                self._matrix,
+                np.frombuffer(b"".join(row[2] for row in new_rows), dtype=np.float32)
+                .reshape(len(new_rows), EMBED_DIM)
+            ])
+            self._last_id = int(self._ids[-1])
+
+    def nearest(self, query: str, variant: str = "") -> tuple[int, float] | None:
+        """
+        (row id, similarity) of the closest live entry for variant that
+        names the same titles, if any.
+        """
+        tokens = normalize(query)
+        if not tokens:
+            return None
+        self._refresh()
+        vector = embed(tokens)
+        titles = title_tokens(tokens)
+        with self._lock:
+            if not len(self._ids):
+                return None
+            scores = self._matrix @ vector
+            live = self._created > time.time() - self.ttl
+            same = np.fromiter(
+                (v == variant and t == titles for v, t in zip(self._variants, self._titles)),
+                bool, len(self._variants)
+            )
+            scores[~(live & same)] = -1.0
+            if not (live & same).any():
+                return None
+            best = int(np.argmax(scores))
+            return int(self._ids[best]), float(scores[best])
+
+    def lookup(self, query: str, variant: str = ""):
+        """Stored result for a query similar enough to `query`, else None."""
+        match = self.nearest(query, variant)
+        if match is None or match[1] < self.threshold:
+            self.misses += 1
+            return None
+        row_id, similarity = match
+        conn = self._connect()
+        row = conn.execute("SELECT query, result FROM queries WHERE id = ?", (row_id,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        with conn:
+            conn.execute("UPDATE queries SET hits = hits + 1 WHERE id = ?", (row_id,))
+        self.hits += 1
+        logging.info(f"Semantic cache hit: '{query}' ~ '{row[0]}' ({similarity:.2f})")
+        return pickle.loads(row[1])
+
+    def add(self, query: str, result, variant: str = "") -> None:
+        tokens = normalize(query)
+        if not tokens:
+            return
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO queries "
+                "(variant, normalized, query, vector, result, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (variant, " ".join(tokens), query, embed(tokens).tobytes(),
+                 pickle.dumps(result), time.time())
+            )
+            conn.execute("DELETE FROM queries WHERE created_at <= ?", (time.time() - self.ttl,))
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """
+        Once past max_entries, drop the least used / oldest rows down to
+        EVICT_TO of capacity, never touching the newest PROTECT_NEWEST
+        (they have had no time to collect hits yet).
+        """
+        count, = conn.execute("SELECT COUNT(*) FROM queries").fetchone()
+        if count <= self.max_entries:
+            return
+        conn.execute(
+            "DELETE FROM queries WHERE id IN ("
+            "SELECT id FROM queries WHERE id NOT IN ("
+            "SELECT id FROM queries ORDER BY created_at DESC LIMIT ?) "
+            "ORDER BY hits, created_at LIMIT ?)",
+            (max(1, int(self.max_entries * PROTECT_NEWEST)),
+             count - int(self.max_entries * EVICT_TO))
+        )
+
+    def cached(self, unless=None):
+        """
+        Decorator: serve func(query, ...) from similar past queries.
+
+        Extra arguments (e.g. max_suggestions) form the variant, so only
+        calls with the same arguments share results.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(query, *args, **kwargs):
+                variant = repr((args, sorted(kwargs.items())))
+                try:
+                    result = self.lookup(query, variant)
+                except sqlite3.Error as e:
+                    logging.error(f"Semantic cache lookup failed: {e}")
+                    result = None
+                if result is not None:
+                    return result
+                result = func(query, *args, **kwargs)
+                if unless is None or not unless(result):
+                    try:
+                        self.add(query, result, variant)
+                    except sqlite3.Error as e:
+                        logging.error(f"Semantic cache write failed: {e}")
+                return result
+            return wrapper
+        return decorator
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._ids),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "threshold": self.threshold,
+        }
@@ -0,0 +1,477 @@
+# sharding.py
+"""
+Sharding - Users and their movies spread over N databases.
+
+Every user lives, together with all of their movies, on exactly one shard,
+so per-user reads and writes touch one database and SQLite's single-writer
+limit applies per shard instead of to the whole app.
+
+    * shards are Flask-SQLAlchemy binds ("shard_0", "shard_1", ...) from
+      DATABASE_SHARD_URIS
+    * new users are placed by a consistent-hash ring over user_id; the
+      placement is recorded in a directory table on the primary database,
+      which is the source of truth (users only move through the tools below)
+    * user and movie IDs come from a block-allocated sequence on the primary,
+      so IDs stay unique across shards and rows can move without renumbering;
+      user IDs are placed a whole block at a time, so signups do not write
+      to the primary one by one
+    * each process caches placements; moves and deletions bump a directory
+      version on the primary, which every process polls at most every
+      SHARD_DIRECTORY_CHECK seconds and drops its cache on change
+    * a ShardedSession routes statements: a top-level AND filter on user.id /
+      movie.user_id goes to the owning shard(s), everything else (e.g.
+      get_users, OR filters) is sent to all shards and the results are merged
+
+After adding a shard, `flask --app app shard-rebalance` moves only the
+users the ring now maps elsewhere (about 1/N of them). `shard-import` moves
+users out of a pre-sharding primary database. Sharding is off unless
+DATABASE_SHARD_URIS is set.
+"""
+
+import os
+import time
+import bisect
+import hashlib
+import logging
+import threading
+import sqlalchemy as sa
+from flask.globals import app_ctx
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BooleanClauseList, Grouping
+
+try:
+    from MovieWebApp.models import User, Movie, upgrade_schema
+except ModuleNotFoundError:
+    from models import User, Movie, upgrade_schema
+
+SHARD_VNODES = 64
+ID_BLOCK_SIZE = 50
+DIRECTORY_TTL = float(os.getenv("SHARD_DIRECTORY_TTL", "30"))
+DIRECTORY_CHECK = float(os.getenv("SHARD_DIRECTORY_CHECK", "1"))
+# shard_sequence row holding the directory version (not an ID sequence)
+_DIRECTORY_VERSION = "directory"
+
+# Directory and ID sequences live on the primary database
+_metadata = sa.MetaData()
+shard_directory = sa.Table(
+    "shard_directory", _metadata,
+    sa.Column("user_id", sa.Integer, primary_key=True, autoincrement=False),
+    sa.Column("shard", sa.String(64), nullable=False, index=True),
+    sa.Column("placed_at", sa.Float, nullable=False),
+)
+shard_sequence = sa.Table(
+    "shard_sequence", _metadata,
+    sa.Column("name", sa.String(32), primary_key=True),
+    sa.Column("next_id", sa.Integer, nullable=False),
+)
+
+_user = User.__table__
+_movie = Movie.__table__
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes; adding a node moves ~1/N keys."""
+
+    def __init__(self, nodes: list[str], vnodes: int = SHARD_VNODES):
+        points = sorted(
+            (self._hash(f"{node}#{index}"), node) for node in nodes for index in range(vnodes)
+        )
+        self._keys = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def node_for(self, key) -> str:
+        index = bisect.bisect(self._keys, self._hash(str(key))) % len(self._keys)
+        return self._nodes[index]
+
+
+# Columns whose value determines the owning shard
+_ROUTING_COLUMNS = {("user", "id"), ("movie", "user_id")}
+
+
+def _conjuncts(clause) -> list:
+    """Top-level AND terms of a WHERE clause (nested ANDs flattened)."""
+    if isinstance(clause, BooleanClauseList) and clause.operator is operators.and_:
+        return [term for sub in clause.clauses for term in _conjuncts(sub)]
+    if isinstance(clause, Grouping):
+        return _conjuncts(clause.element)
+    return [clause]
+
+
+def _routing_values(term, parameters: dict) -> set | None:
+    """User IDs one AND term pins down (= / IN on a routing column), else None."""
+    if not isinstance(term, BinaryExpression):
+        return None
+    column, value = term.left, term.right
+    if isinstance(column, sa.BindParameter):
+        column, value = value, column
+    table = getattr(column, "table", None)
+    if table is None or not isinstance(value, sa.BindParameter):
+        return None
+    if (getattr(table, "name", None), getattr(column, "name", None)) not in _ROUTING_COLUMNS:
+        return None
+    # session.get() passes the primary key as a separate parameter
+    current = parameters.get(value.key, value.effective_value)
+    if current is None:
+        return None
+    if term.operator is operators.eq:
+        return {current}
+    if term.operator is operators.in_op:
+        return set(current)
+    return None
+
+
+def _routed_user_ids(statement, parameters=None) -> set | None:
+    """
+    User IDs the statement's WHERE clause pins down: a top-level AND term
+    of = or IN on user.id / movie.user_id (several such terms intersect).
+    None when it is not restricted that way - an ID inside an OR, a NOT or
+    a subquery says nothing about where the other matches live.
+    """
+    whereclause = getattr(statement, "whereclause", None)
+    if whereclause is None:
+        return None
+    parameters = parameters if isinstance(parameters, dict) else {}
+    user_ids = None
+    for term in _conjuncts(whereclause):
+        values = _routing_values(term, parameters)
+        if values is not None:
+            user_ids = values if user_ids is None else user_ids & values
+    return user_ids or None
+
+
+def _app_ctx_id() -> int:
+    """One shard session per app context, like Flask-SQLAlchemy's db.session."""
+    return id(app_ctx._get_current_object())
+
+
+class ShardRouter:
+    """Placement, ID allocation, routed sessions and migration tools."""
+
+    def __init__(self, engines: dict[str, Engine], primary: Engine):
+        self.engines = dict(engines)
+        self.primary = primary
+        self.ring = HashRing(list(self.engines))
+        self._lock = threading.Lock()
+        self._placements = {}   # user_id -> (shard, expires)
+        self._id_blocks = {}    # sequence name -> [next, end)
+        self._version = None    # directory version the cache is valid for
+        self._version_checked = float("-inf")
+        self.session = scoped_session(
+            sessionmaker(
+                class_=ShardedSession,
+                shards=self.engines,
+                shard_chooser=self._shard_chooser,
+                identity_chooser=self._identity_chooser,
+                execute_chooser=self._execute_chooser,
+            ),
+            scopefunc=_app_ctx_id,
+        )
+
+    # -------------------------
+    # PLACEMENT
+    # -------------------------
+    def shard_for(self, user_id: int, fresh: bool = False) -> str:
+        """Shard holding user_id (directory first, ring for unknown users)."""
+        user_id = int(user_id)
+        now = time.monotonic()
+        if not fresh:
+            self._check_version(now)
+        cached = self._placements.get(user_id)
+        if cached and not fresh and cached[1] > now:
+            return cached[0]
+        with self.primary.connect() as conn:
+            shard = conn.execute(
+                sa.select(shard_directory.c.shard).where(shard_directory.c.user_id == user_id)
+            ).scalar()
+        if shard not in self.engines:
+            shard = self.ring.node_for(user_id)
+        self._placements[user_id] = (shard, now + DIRECTORY_TTL)
+        return shard
+
+    def forget(self, user_id: int) -> None:
+        self._placements.pop(int(user_id), None)
+
+    def revalidate(self, user_id: int) -> bool:
+        """
+        Re-read user_id's placement. True if it differs from the cached one,
+        i.e. a read that just came back empty may have asked the wrong shard.
+        """
+        cached = self._placements.get(int(user_id))
+        return cached is not None and cached[0] != self.shard_for(user_id, fresh=True)
+
+    def _check_version(self, now: float) -> None:
+        """Drop cached placements once another process moved or removed users."""
+        if now - self._version_checked < DIRECTORY_CHECK:
+            return
+        self._version_checked = now
+        with self.primary.connect() as conn:
+            version = conn.execute(
+                sa.select(shard_sequence.c.next_id)
+                .where(shard_sequence.c.name == _DIRECTORY_VERSION)
+            ).scalar()
+        if version != self._version:
+            self._placements.clear()
+            self._version = version
+
+    @staticmethod
+    def _bump_version(conn) -> None:
+        """Tell every process its cached placements may be stale (same transaction)."""
+        bumped = conn.execute(
+            sa.update(shard_sequence)
+            .where(shard_sequence.c.name == _DIRECTORY_VERSION)
+            .values(next_id=shard_sequence.c.next_id + 1)
+        ).rowcount
+        if not bumped:
+            conn.execute(sa.insert(shard_sequence).values(name=_DIRECTORY_VERSION, next_id=1))
+
+    def reroute(self, instance) -> None:
+        """Re-place a pending User / Movie whose cached placement was stale."""
+        user_id = instance.id if isinstance(instance, User) else instance.user_id
+        sa.inspect(instance).identity_token = self.shard_for(user_id, fresh=True)
+
+    def _set_placement(self, conn, user_id: int, shard: str) -> None:
+        conn.execute(sa.delete(shard_directory).where(shard_directory.c.user_id == user_id))
+        conn.execute(sa.insert(shard_directory).values(
+            user_id=user_id, shard=shard, placed_at=time.time()
+        ))
+        self._bump_version(conn)
+        self._placements[user_id] = (shard, time.monotonic() + DIRECTORY_TTL)
+
+    def place_new_users(self, count: int) -> list[tuple[int, str]]:
+        """
+        IDs and shards for new users. The directory rows were written when
+        the ID block was reserved, so this normally touches no database.
+        """
+        return [(user_id, self.shard_for(user_id)) for user_id in self.allocate_ids("user", count)]
+
+    def remove_users(self, user_ids: list[int]) -> None:
+        with self.primary.begin() as conn:
+            conn.execute(sa.delete(shard_directory).where(shard_directory.c.user_id.in_(user_ids)))
+            self._bump_version(conn)
+        for user_id in user_ids:
+            self.forget(user_id)
+
+    # -------------------------
+    # ID ALLOCATION
+    # -------------------------
+    def allocate_ids(self, name: str, count: int = 1) -> list[int]:
+        """Globally unique IDs for `name` ("user" / "movie"), reserved in blocks."""
+        ids = []
+        with self._lock:
+            block = self._id_blocks.setdefault(name, [0, 0])
+            while len(ids) < count:
+                if block[0] >= block[1]:
+                    size = max(ID_BLOCK_SIZE, count - len(ids))
+                    block[1] = self._reserve(name, size)
+                    block[0] = block[1] - size
+                take = min(count - len(ids), block[1] - block[0])
+                ids.extend(range(block[0], block[0] + take))
+                block[0] += take
+        return ids
+
+    def _reserve(self, name: str, size: int) -> int:
+        """
+        Advance the shared sequence by size; return the end of the block.
+        User blocks are placed on the ring in the same transaction (IDs a
+        process never hands out leave directory rows that rebalance drops).
+        """
+        with self.primary.begin() as conn:
+            end = conn.execute(
+                sa.update(shard_sequence)
+                .where(shard_sequence.c.name == name)
+                .values(next_id=shard_sequence.c.next_id + size)
+                .returning(shard_sequence.c.next_id)
+            ).scalar()
+            if end is None:
+                # First use: continue after the highest ID anywhere (incl. pre-sharding data)
+                table = _user if name == "user" else _movie
+                end = size + 1 + max(
+                    self._max_id(engine, table) for engine in (self.primary, *self.engines.values())
+                )
+                conn.execute(sa.insert(shard_sequence).values(name=name, next_id=end))
+            if name == "user":
+                placed_at, expires = time.time(), time.monotonic() + DIRECTORY_TTL
+                placements = [(user_id, self.ring.node_for(user_id)) for user_id in range(end - size, end)]
+                conn.execute(sa.insert(shard_directory), [
+                    {"user_id": user_id, "shard": shard, "placed_at": placed_at}
+                    for user_id, shard in placements
+                ])
+                self._placements.update(
+                    (user_id, (shard, expires)) for user_id, shard in placements
+                )
+            return end
+
+    @staticmethod
+    def _max_id(engine: Engine, table) -> int:
+        if not sa.inspect(engine).has_table(table.name):
+            return 0
+        with engine.connect() as conn:
+            return conn.execute(sa.select(sa.func.max(table.c.id))).scalar() or 0
+
+    # -------------------------
+    # SESSION ROUTING
+    # -------------------------
+    def _shard_chooser(self, mapper, instance, clause=None):
+        # Cached placement: a movie sent to a shard its user has left fails
+        # the foreign key check (see DataManager.add_movie), so writes need
+        # no directory round trip
+        if instance is None:
+            raise ValueError("Statements without an instance need an explicit shard_id")
+        if isinstance(instance, User):
+            return self.shard_for(instance.id)
+        return self.shard_for(instance.user_id)
+
+    def _identity_chooser(self, mapper, primary_key, *, lazy_loaded_from, **kw):
+        if lazy_loaded_from is not None:
+            return [lazy_loaded_from.identity_token]
+        if mapper.class_ is User:
+            return [self.shard_for(primary_key[0])]
+        # A movie ID alone does not say which shard holds it
+        return list(self.engines)
+
+    def _execute_chooser(self, orm_context):
+        if orm_context.is_insert:
+            raise ValueError("Bulk INSERTs must pass bind_arguments={'shard_id': ...}")
+        user_ids = _routed_user_ids(orm_context.statement, orm_context.parameters)
+        if not user_ids:
+            return list(self.engines)
+        fresh = orm_context.is_update or orm_context.is_delete
+        return sorted({self.shard_for(user_id, fresh=fresh) for user_id in user_ids})
+
+    def shards_for_users(self, user_ids) -> dict[str, list[int]]:
+        """Group user IDs by the shard that holds them (fresh lookups, for writes)."""
+        grouped = {}
+        for user_id in user_ids:
+            grouped.setdefault(self.shard_for(user_id, fresh=True), []).append(user_id)
+        return grouped
+
+    # -------------------------
+    # MIGRATION
+    # -------------------------
+    def _copy_user(self, source: Engine, target_shard: str, user_id: int) -> int:
+        """
+        Move one user and their movies from source to target_shard.
+
+        The source rows are locked (no-op UPDATE) for the duration, so
+        concurrent writes wait; the directory flips before the source rows
+        are deleted. Re-running after a crash is safe.
+        """
+        target = self.engines[target_shard]
+        with source.begin() as src:
+            locked = src.execute(
+                sa.update(_user).where(_user.c.id == user_id).values(id=_user.c.id)
+            ).rowcount
+            if not locked:
+                raise LookupError(f"User {user_id} not found on its shard")
+            user_row = dict(src.execute(sa.select(_user).where(_user.c.id == user_id)).mappings().one())
+            movie_rows = [
+                dict(row) for row in
+                src.execute(sa.select(_movie).where(_movie.c.user_id == user_id)).mappings()
+            ]
+            with target.begin() as dst:
+                # Leftovers of an interrupted earlier move
+                dst.execute(sa.delete(_movie).where(_movie.c.user_id == user_id))
+                dst.execute(sa.delete(_user).where(_user.c.id == user_id))
+                dst.execute(sa.insert(_user), [user_row])
+                if movie_rows:
+                    dst.execute(sa.insert(_movie), movie_rows)
+            if source is self.primary:
+                # Importing: the primary is already locked by this transaction
+                self._set_placement(src, user_id, target_shard)
+            else:
+                with self.primary.begin() as conn:
+                    self._set_placement(conn, user_id, target_shard)
+            src.execute(sa.delete(_movie).where(_movie.c.user_id == user_id))
+            src.execute(sa.delete(_user).where(_user.c.id == user_id))
+        return len(movie_rows)
+
+    def move_user(self, user_id: int, target_shard: str) -> int:
+        """Move a user to target_shard; returns the number of movies moved."""
+        if target_shard not in self.engines:
+            raise ValueError(f"Unknown shard: {target_shard}")
+        source = self.shard_for(user_id, fresh=True)
+        if source == target_shard:
+            return 0
+        moved = self._copy_user(self.engines[source], target_shard, user_id)
+        logging.info(f"Moved user {user_id} ({moved} movies) from {source} to {target_shard}")
+        return moved
+
+    def rebalance(self, dry_run: bool = False) -> list[tuple[int, str, str]]:
+        """Move every user whose shard differs from the ring's choice."""
+        with self.primary.connect() as conn:
+            placements = conn.execute(
+                sa.select(shard_directory.c.user_id, shard_directory.c.shard)
+                .order_by(shard_directory.c.user_id)
+            ).all()
+        moves = [
+            (user_id, shard, self.ring.node_for(user_id))
+            for user_id, shard in placements
+            if shard != self.ring.node_for(user_id)
+        ]
+        if not dry_run:
+            for user_id, _, target in moves:
+                try:
+                    self.move_user(user_id, target)
+                except LookupError:
+                    # Placed but never committed (or already deleted)
+                    self.remove_users([user_id])
+        return moves
+
+    def import_primary(self) -> int:
+        """Move users (and movies) from the unsharded primary tables onto shards."""
+        if not sa.inspect(self.primary).has_table(_user.name):
+            return 0
+        with self.primary.connect() as conn:
+            user_ids = conn.execute(sa.select(_user.c.id).order_by(_user.c.id)).scalars().all()
+        for user_id in user_ids:
+            self._copy_user(self.primary, self.ring.node_for(user_id), user_id)
+        return len(user_ids)
+
+    def status(self) -> dict:
+        """Users / movies per shard, plus how many users await rebalancing."""
+        shards = {}
+        for name, engine in self.engines.items():
+            with engine.connect() as conn:
+                shards[name] = {
+                    "users": conn.execute(sa.select(sa.func.count()).select_from(_user)).scalar(),
+                    "movies": conn.execute(sa.select(sa.func.count()).select_from(_movie)).scalar(),
+                }
+        return {"shards": shards, "pending_moves": len(self.rebalance(dry_run=True))}
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # A movie written to a shard its user has left must fail, not orphan
+    if type(dbapi_connection).__module__.startswith("sqlite3"):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+
+def init_sharding(app, db) -> ShardRouter | None:
+    """
+    Register the shard router for SQLALCHEMY_SHARD_BINDS (bind keys present
+    in SQLALCHEMY_BINDS) and create the schema on every shard. Must run
+    after db.init_app(app).
+    """
+    bind_keys = app.config.get("SQLALCHEMY_SHARD_BINDS") or []
+    if not bind_keys:
+        return None
+
+    with app.app_context():
+        engines = {key: db.engines[key] for key in bind_keys}
+        for engine in engines.values():
+            event.listen(engine, "connect", _enable_sqlite_foreign_keys)
+            db.metadata.create_all(engine, tables=[_user, _movie])
+            upgrade_schema(engine)
+        _metadata.create_all(db.engine)
+        router = ShardRouter(engines, db.engine)
+
+    app.extensions["shard_router"] = router
+    app.teardown_appcontext(lambda exc: router.session.remove())
+    return router
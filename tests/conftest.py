@@ -0,0 +1,44 @@
+# conftest.py
+"""
+Shared fixtures: a minimal Flask app on temporary SQLite files.
+
+Tests build their own small apps instead of importing app.py, which starts
+background threads and talks to external APIs at import time.
+"""
+
+import pytest
+from flask import Flask
+
+from models import db, Movie
+from data_manager import DataManager
+
+
+def make_app(tmp_path, binds: dict | None = None, **config) -> Flask:
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'primary.db'}"
+    app.config["SQLALCHEMY_BINDS"] = binds or {}
+    app.config["SECRET_KEY"] = "test"
+    app.config.update(config)
+    db.init_app(app)
+    with app.app_context():
+        # Only the primary: db.metadatas keeps bind keys of earlier test apps
+        db.create_all(bind_key=None)
+    return app
+
+
+def new_movie(user_id: int, name: str = "Heat", **fields) -> Movie:
+    values = {"director": "Michael Mann", "year": 1995, "rating": 8.3, "poster_url": ""}
+    values.update(fields)
+    return Movie(name=name, user_id=user_id, **values)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def manager(app):
+    return DataManager()
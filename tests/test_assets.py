@@ -0,0 +1,135 @@
+# test_assets.py
+"""Fingerprinted, precompressed static assets (assets.py)."""
+
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+import assets
+from assets import IMMUTABLE, build_assets, init_assets
+
+CSS = "body { color: #333; }\n" + ".movie { margin: 0 auto; padding: 1rem; }\n" * 200
+
+
+@pytest.fixture
+def static_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("ASSETS_AUTOBUILD", "0")
+    static = tmp_path / "static"
+    static.mkdir()
+    (static / "style.css").write_text(CSS)
+    (static / "scripts.js").write_text("console.log(1);")
+    return static
+
+
+def _app(static_dir):
+    app = Flask(__name__)
+    init_assets(app, static_dir)
+    return app
+
+
+def _url(app, name):
+    with app.test_request_context():
+        return app.jinja_env.globals["asset_url"](name)
+
+
+def test_build_fingerprints_and_precompresses(static_dir):
+    manifest = build_assets(static_dir)
+    built = manifest["files"]["style.css"]
+    assert built.startswith("style.") and built.endswith(".css") and built != "style.css"
+    dist = static_dir / "dist"
+    assert (dist / (built + ".gz")).exists()
+    # Tiny files are not worth compressing
+    assert not (dist / (manifest["files"]["scripts.js"] + ".gz")).exists()
+    assert json.loads((dist / "manifest.json").read_text())["files"] == manifest["files"]
+
+
+def test_asset_url_falls_back_to_static_without_build(static_dir):
+    assert _url(_app(static_dir), "style.css") == "/static/style.css"
+    build_assets(static_dir)
+    app = _app(static_dir)
+    assert _url(app, "style.css").startswith("/assets/style.")
+    assert _url(app, "missing.css") == "/static/missing.css"
+
+
+# -----------------------------
+# CONTENT NEGOTIATION
+# -----------------------------
+@pytest.mark.parametrize("accept, encoding", [
+    ("gzip, deflate, br", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("gzip", "gzip"),
+    ("identity", None),
+    (None, None),
+])
+def test_accept_encoding_picks_variant(static_dir, accept, encoding):
+    if encoding == "br" and assets.brotli is None:
+        pytest.skip("brotli not installed")
+    build_assets(static_dir)
+    app = _app(static_dir)
+    headers = {"Accept-Encoding": accept} if accept else {}
+    response = app.test_client().get(_url(app, "style.css"), headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers.get("Content-Encoding") == encoding
+    assert response.vary.as_set() == {"accept-encoding"}
+    assert response.headers["Cache-Control"] == IMMUTABLE
+    assert response.mimetype == "text/css"
+    body = response.get_data()
+    if encoding == "br":
+        body = assets.brotli.decompress(body)
+    elif encoding == "gzip":
+        body = gzip.decompress(body)
+    assert body.decode() == CSS
+
+
+def test_etag_is_per_encoding_and_conditional(static_dir):
+    build_assets(static_dir)
+    app = _app(static_dir)
+    client, url = app.test_client(), _url(app, "style.css")
+    gz = client.get(url, headers={"Accept-Encoding": "gzip"})
+    plain = client.get(url)
+    assert gz.get_etag()[0] != plain.get_etag()[0]
+    again = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": gz.headers["ETag"]})
+    assert again.status_code == 304
+
+
+@pytest.mark.parametrize("filename", ["manifest.json", ".build.lock", "../style.css", "nope.css"])
+def test_internal_and_unknown_files_are_404(static_dir, filename):
+    build_assets(static_dir)
+    assert _app(static_dir).test_client().get(f"/assets/{filename}").status_code == 404
+
+
+# -----------------------------
+# REBUILDS
+# -----------------------------
+def test_old_fingerprint_serves_during_grace_period(static_dir, monkeypatch):
+    build_assets(static_dir)
+    app = _app(static_dir)          # a worker still holding the first manifest
+    old_url = _url(app, "style.css")
+    old_name = old_url.rsplit("/", 1)[1]
+
+    (static_dir / "style.css").write_text(CSS + "footer { color: red; }\n")
+    manifest = build_assets(static_dir)
+    assert manifest["files"]["style.css"] != old_name
+    assert old_name in manifest["retired"]
+
+    client = app.test_client()
+    response = client.get(old_url, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert gzip.decompress(response.get_data()).decode() == CSS
+    assert client.get(f"/assets/{manifest['files']['style.css']}").status_code == 200
+
+    # Once the grace period is over the next build prunes it
+    monkeypatch.setattr(assets, "ASSETS_GRACE_SECONDS", 0)
+    manifest = build_assets(static_dir)
+    assert manifest["retired"] == {}
+    assert client.get(old_url).status_code == 404
+    assert not list((static_dir / "dist").glob(old_name + "*"))
+
+
+def test_unchanged_rebuild_keeps_names(static_dir):
+    first = build_assets(static_dir)
+    second = build_assets(static_dir)
+    assert second["files"] == first["files"] and second["retired"] == {}
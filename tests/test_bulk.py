@@ -0,0 +1,63 @@
+# test_bulk.py
+"""Set-based bulk operations (data_manager.py)."""
+
+import pytest
+
+from models import db, Movie, User
+
+
+@pytest.fixture
+def users(manager):
+    return manager.bulk_create_users(["Ann", "Bob", "Cyd"])
+
+
+def test_bulk_create_users_returns_ids_in_order(manager, users):
+    assert [manager.get_user(user_id).name for user_id in users] == ["Ann", "Bob", "Cyd"]
+
+
+def test_bulk_add_movies_fills_defaults(manager, users):
+    count = manager.bulk_add_movies([
+        {"name": "Heat", "user_id": users[0], "year": 1995},
+        {"name": "Thief", "user_id": users[0]},
+        {"name": "Alien", "user_id": users[1]},
+    ])
+    assert count == 3
+    thief = manager.find_movie(users[0], "Thief")
+    assert (thief.director, thief.year, thief.rating, thief.version) == ("Unknown", 0, 0.0, 1)
+    assert manager.bulk_add_movies([]) == 0
+
+
+def test_bulk_update_counts_rows_and_bumps_versions(manager, users):
+    manager.bulk_add_movies([{"name": f"Movie {i}", "user_id": users[i % 2]} for i in range(5)])
+    assert manager.bulk_update_movies({"rating": 9.0}, user_id=users[0]) == 3
+    assert manager.bulk_update_movies({"rating": 1.0}, user_id=[users[0], users[1]]) == 5
+    assert {m.version for m in manager.get_movies(users[0])} == {3}
+    # Columns outside MOVIE_UPDATABLE_FIELDS are ignored
+    assert manager.bulk_update_movies({"user_id": users[2]}, user_id=users[0]) == 0
+
+
+def test_bulk_delete_counts_rows(manager, users):
+    manager.bulk_add_movies([{"name": f"Movie {i}", "user_id": users[0]} for i in range(4)])
+    assert manager.bulk_delete_movies(user_id=users[0], name=["Movie 0", "Movie 1"]) == 2
+    assert manager.bulk_delete_movies(user_id=users[1]) == 0
+    assert len(manager.get_movies(users[0])) == 2
+
+
+@pytest.mark.parametrize("operation", [
+    lambda manager: manager.bulk_update_movies({"rating": 1.0}),
+    lambda manager: manager.bulk_delete_movies(),
+    lambda manager: manager.bulk_delete_movies(no_such_column=1),
+])
+def test_bulk_statements_refuse_missing_or_unknown_filters(manager, users, operation):
+    manager.bulk_add_movies([{"name": "Heat", "user_id": users[0]}])
+    with pytest.raises(ValueError):
+        operation(manager)
+    assert db.session.query(Movie).count() == 1
+
+
+def test_bulk_delete_users_removes_their_movies(manager, users):
+    manager.bulk_add_movies([{"name": "Heat", "user_id": user_id} for user_id in users])
+    assert manager.bulk_delete_users(users[:2]) == 2
+    assert manager.bulk_delete_users([]) == 0
+    assert [u.id for u in db.session.query(User)] == [users[2]]
+    assert db.session.query(Movie).count() == 1
@@ -0,0 +1,287 @@
+# test_cache.py
+"""Multi-tier cache (cache.py): tiers, TTLs, tags and the RESP client."""
+
+import socket
+import threading
+import time
+
+import pytest
+from flask import Flask, request
+from sqlalchemy import update
+
+from cache import (
+    Cache, MemoryBackend, SQLiteBackend, RedisBackend, _TAG_PREFIX,
+    cached_view, invalidate_on_commit,
+)
+from data_manager import DataManager
+from models import db, User
+from routing import init_replicas, pinned_to_primary, primary_reads
+from tests.conftest import make_app
+
+
+# -----------------------------
+# REDIS STAND-IN
+# -----------------------------
+class FakeRedis:
+    """Tiny RESP server: GET/MGET/SET [PX]/DEL/INCR/FLUSHDB/AUTH/SELECT."""
+
+    def __init__(self):
+        self.data = {}
+        self.commands = []
+        self._server = socket.create_server(("127.0.0.1", 0))
+        self.port = self._server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _read_command(reader):
+        header = reader.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:-2])):
+            length = int(reader.readline()[1:-2])
+            args.append(reader.read(length + 2)[:-2])
+        return args
+
+    @staticmethod
+    def _bulk(value):
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _get(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.time():
+            self.data.pop(key, None)
+            return None
+        return value
+
+    def _serve(self, conn):
+        reader = conn.makefile("rb")
+        while True:
+            args = self._read_command(reader)
+            if args is None:
+                return
+            name = args[0].decode().upper()
+            self.commands.append(name)
+            if name in ("AUTH", "SELECT", "FLUSHDB"):
+                if name == "FLUSHDB":
+                    self.data.clear()
+                reply = b"+OK\r\n"
+            elif name == "GET":
+                reply = self._bulk(self._get(args[1]))
+            elif name == "MGET":
+                reply = b"*%d\r\n" % (len(args) - 1) + b"".join(
+                    self._bulk(self._get(key)) for key in args[1:]
+                )
+            elif name == "SET":
+                expires_at = None
+                if len(args) == 5 and args[3].upper() == b"PX":
+                    expires_at = time.time() + int(args[4]) / 1000
+                self.data[args[1]] = (args[2], expires_at)
+                reply = b"+OK\r\n"
+            elif name == "DEL":
+                removed = sum(self.data.pop(key, None) is not None for key in args[1:])
+                reply = b":%d\r\n" % removed
+            elif name == "INCR":
+                value = int(self._get(args[1]) or 0) + 1
+                self.data[args[1]] = (str(value).encode(), None)
+                reply = b":%d\r\n" % value
+            else:
+                reply = b"-ERR unknown command\r\n"
+            conn.sendall(reply)
+
+    def close(self):
+        self._server.close()
+
+
+@pytest.fixture
+def redis_server():
+    server = FakeRedis()
+    yield server
+    server.close()
+
+
+# -----------------------------
+# RESP CLIENT
+# -----------------------------
+def test_redis_roundtrip(redis_server):
+    backend = RedisBackend(port=redis_server.port, password="secret", db=2)
+    backend.set_many({"a": {"x": 1}, "b": [1, 2]})
+    assert backend.get_many(["a", "b", "missing"]) == {"a": {"x": 1}, "b": [1, 2]}
+    backend.delete_many(["a"])
+    assert backend.get_many(["a"]) == {}
+    assert redis_server.commands[:2] == ["AUTH", "SELECT"]
+
+
+def test_redis_ttl_and_tag_counters(redis_server):
+    backend = RedisBackend(port=redis_server.port)
+    backend.set_many({"short": 1}, ttl=0.05)
+    assert backend.incr(f"{_TAG_PREFIX}movies") == 1
+    assert backend.incr(f"{_TAG_PREFIX}movies") == 2
+    time.sleep(0.1)
+    assert backend.get_many(["short", f"{_TAG_PREFIX}movies"]) == {f"{_TAG_PREFIX}movies": 2}
+
+
+def test_cache_over_redis_invalidates_tags(redis_server):
+    cache = Cache([MemoryBackend(), RedisBackend(port=redis_server.port)])
+    cache.set("page", "v1", tags=["movies"])
+    assert cache.get("page") == "v1"
+    cache.invalidate_tags("movies")
+    assert cache.get("page") is None
+
+
+def test_broken_tier_is_a_miss_not_an_error():
+    cache = Cache([RedisBackend(port=1, timeout=0.1)])
+    cache.set("key", "value")
+    assert cache.get("key") is None
+    assert cache.stats.errors >= 2
+
+
+# -----------------------------
+# TIERS
+# -----------------------------
+def test_backfill_keeps_remaining_ttl(tmp_path):
+    memory, shared = MemoryBackend(), SQLiteBackend(tmp_path / "cache.db")
+    Cache([shared], default_ttl=0.3).set("key", "value")
+    time.sleep(0.2)
+    cache = Cache([memory, shared], default_ttl=300)
+    assert cache.get("key") == "value"          # back-filled into memory
+    time.sleep(0.15)
+    assert cache.get("key") is None             # expired with the original
+
+
+def test_memory_lru_never_evicts_tag_versions():
+    memory = MemoryBackend(max_entries=2)
+    cache = Cache([memory])
+    cache.invalidate_tags("users")                       # users -> version 1
+    for index in range(5):
+        cache.set(f"filler{index}", index)               # would evict the tag key
+    # An entry stamped before the invalidation must stay stale
+    memory.set_many({cache._key("stale"): ("old", {"users": 0}, None)})
+    assert cache.get("stale") is None
+
+
+def test_sqlite_purges_expired_and_caps_rows(tmp_path):
+    backend = SQLiteBackend(tmp_path / "cache.db", max_entries=10, purge_every=5)
+    backend.incr(f"{_TAG_PREFIX}users")
+    backend.set_many({f"old{i}": i for i in range(4)}, ttl=0.01)
+    time.sleep(0.05)
+    backend.set_many({f"key{i}": i for i in range(20)})
+    rows = backend._connect().execute("SELECT key FROM cache").fetchall()
+    keys = {key for key, in rows}
+    assert f"{_TAG_PREFIX}users" in keys
+    assert not any(key.startswith("old") for key in keys)
+    assert len(keys) == 11 and "key19" in keys
+
+
+# -----------------------------
+# VIEWS
+# -----------------------------
+def test_cached_view_keys_on_whitelisted_args_only():
+    app = Flask(__name__)
+    cache = Cache([MemoryBackend()])
+    renders = []
+
+    @app.route("/page")
+    @cached_view(cache, vary_on=("page",))
+    def page():
+        renders.append(request.full_path)
+        return f"page {request.args.get('page', '1')}"
+
+    client = app.test_client()
+    assert client.get("/page").headers["X-Cache"] == "MISS"
+    assert client.get("/page").headers["X-Cache"] == "HIT"
+    assert client.get("/page?page=2").get_data(as_text=True) == "page 2"
+    assert client.get("/page?page=2").headers["X-Cache"] == "HIT"
+
+    # Anything outside the whitelist renders fresh and is not stored
+    for junk in ("/page?utm=1", "/page?utm=2", "/page?sql_debug=1"):
+        assert "X-Cache" not in client.get(junk).headers
+    assert len(renders) == 5
+
+
+def test_cached_view_hit_has_one_content_type():
+    app = Flask(__name__)
+    cache = Cache([MemoryBackend()])
+    app.add_url_rule("/about", "about", cached_view(cache)(lambda: "<p>about</p>"))
+
+    client = app.test_client()
+    client.get("/about")
+    hit = client.get("/about")
+    assert hit.headers["X-Cache"] == "HIT"
+    assert hit.headers.getlist("Content-Type") == ["text/html; charset=utf-8"]
+    assert hit.get_data(as_text=True) == "<p>about</p>"
+
+
+def test_page_cache_keeps_read_your_writes_with_replicas(tmp_path):
+    # The replica file is never updated: every write is "still replicating"
+    app = make_app(
+        tmp_path,
+        binds={"replica_0": f"sqlite:///{tmp_path / 'replica.db'}"},
+        SQLALCHEMY_REPLICA_BINDS=["replica_0"],
+    )
+    init_replicas(app, db)
+    with app.app_context():
+        db.metadata.create_all(db.engines["replica_0"])
+    cache = Cache([MemoryBackend()])
+    invalidate_on_commit(db.session, cache, {"user": "users"})
+    page = cached_view(cache, tags=("users",), unless=pinned_to_primary, fill_context=primary_reads)
+
+    @app.post("/users/<name>")
+    def create(name):
+        DataManager().create_user(name)
+        return "created"
+
+    @app.get("/")
+    @page
+    def home():
+        return ",".join(user.name for user in db.session.query(User).order_by(User.id))
+
+    writer, reader = app.test_client(), app.test_client()
+    assert reader.get("/").get_data(as_text=True) == ""
+    writer.post("/users/Ann")
+
+    first = reader.get("/")                      # refilled from the primary
+    assert (first.headers["X-Cache"], first.get_data(as_text=True)) == ("MISS", "Ann")
+    own = writer.get("/")                        # pinned: never a shared copy
+    assert "X-Cache" not in own.headers and own.get_data(as_text=True) == "Ann"
+    assert reader.get("/").headers["X-Cache"] == "HIT"
+
+
+# -----------------------------
+# COMMIT INVALIDATION
+# -----------------------------
+@pytest.fixture
+def tagged(app):
+    cache = Cache([MemoryBackend()])
+    invalidate_on_commit(db.session, cache, {"user": "users"})
+    cache.set("page", "cached", tags=["users"])
+    return cache
+
+
+def test_commit_of_changed_rows_invalidates_tags(tagged):
+    db.session.add(User(name="Ann"))
+    db.session.commit()
+    assert tagged.get("page") is None
+
+
+def test_bulk_statement_invalidates_tags(tagged):
+    db.session.execute(update(User).values(name="Bob").execution_options(synchronize_session=False))
+    db.session.commit()
+    assert tagged.get("page") is None
+
+
+def test_rollback_and_read_only_commits_keep_tags(tagged):
+    db.session.add(User(name="Ann"))
+    db.session.flush()
+    db.session.rollback()
+    db.session.query(User).all()
+    db.session.commit()
+    assert tagged.get("page") == "cached"
@@ -0,0 +1,95 @@
+# test_compression.py
+"""Dynamic response compression (compression.py)."""
+
+import gzip
+import io
+
+import pytest
+from flask import Flask, Response, send_file
+
+import compression
+from compression import init_compression
+
+BODY = "<tr><td>Heat</td><td>Michael Mann</td></tr>" * 100
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    init_compression(app, min_size=1024)
+
+    @app.route("/page")
+    def page():
+        return BODY
+
+    @app.route("/small")
+    def small():
+        return "<p>tiny</p>"
+
+    @app.route("/tagged")
+    def tagged():
+        response = Response(BODY)
+        response.set_etag("abc")
+        return response
+
+    @app.route("/encoded")
+    def encoded():
+        return Response(gzip.compress(BODY.encode()), headers={"Content-Encoding": "gzip"},
+                        mimetype="text/html")
+
+    @app.route("/stream")
+    def stream():
+        return Response((BODY for _ in range(3)), mimetype="text/csv")
+
+    @app.route("/file")
+    def file():
+        return send_file(io.BytesIO(BODY.encode()), mimetype="text/plain")
+
+    @app.route("/binary")
+    def binary():
+        return Response(b"\0" * 4096, mimetype="application/octet-stream")
+
+    return app.test_client()
+
+
+def test_gzip_when_brotli_not_accepted(client):
+    response = client.get("/page", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.vary
+    assert gzip.decompress(response.get_data()).decode() == BODY
+
+
+def test_brotli_preferred_when_installed(client):
+    if compression.brotli is None:
+        pytest.skip("brotli not installed")
+    response = client.get("/page", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert compression.brotli.decompress(response.get_data()).decode() == BODY
+
+
+def test_identity_response_still_varies(client):
+    response = client.get("/page", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert "Accept-Encoding" in response.vary
+    assert response.get_data(as_text=True) == BODY
+
+
+def test_small_bodies_are_left_alone(client):
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert "Accept-Encoding" not in response.vary
+
+
+def test_etag_differs_per_encoding(client):
+    response = client.get("/tagged", headers={"Accept-Encoding": "gzip"})
+    assert response.get_etag() == ("abc-gzip", False)
+
+
+@pytest.mark.parametrize("path", ["/encoded", "/stream", "/file", "/binary"])
+def test_encoded_streamed_and_binary_bodies_are_skipped(client, path):
+    response = client.get(path, headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers.get("Content-Encoding") in (None, "gzip")
+    assert "Accept-Encoding" not in response.vary
+    if path == "/encoded":
+        # Not compressed a second time
+        assert gzip.decompress(response.get_data()).decode() == BODY
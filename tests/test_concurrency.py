@@ -0,0 +1,47 @@
+# test_concurrency.py
+"""Optimistic concurrency: compare-and-swap updates (data_manager.py)."""
+
+import pytest
+
+from data_manager import VersionConflictError
+from tests.conftest import new_movie
+
+
+@pytest.fixture
+def movie(manager):
+    user = manager.create_user("Alice")
+    return manager.add_movie(new_movie(user.id))
+
+
+def test_update_bumps_version(manager, movie):
+    updated = manager.update_movie(movie.id, 1, rating=9.0)
+    assert updated.rating == 9.0
+    assert updated.version == 2
+
+
+def test_stale_version_raises_conflict(manager, movie):
+    manager.update_movie(movie.id, 1, rating=9.0)
+    with pytest.raises(VersionConflictError) as conflict:
+        manager.update_movie(movie.id, 1, rating=7.0)
+    assert (conflict.value.expected, conflict.value.current) == (1, 2)
+
+
+def test_noop_update_keeps_version(manager, movie):
+    unchanged = manager.update_movie(movie.id, 1, name=movie.name, rating=movie.rating)
+    assert unchanged.version == 1
+
+
+def test_missing_movie_returns_none(manager):
+    assert manager.update_movie(12345, None, rating=1.0) is None
+
+
+def test_update_is_scoped_to_owner(manager, movie):
+    other = manager.create_user("Mallory")
+    assert manager.update_movie(movie.id, 1, user_id=other.id, name="Hacked") is None
+    assert manager.update_movie(movie.id, 1, user_id=movie.user_id, name="Heat 2").version == 2
+
+
+def test_delete_is_scoped_to_owner(manager, movie):
+    other = manager.create_user("Mallory")
+    assert manager.delete_movie(movie.id, user_id=other.id) is False
+    assert manager.delete_movie(movie.id, user_id=movie.user_id) is True
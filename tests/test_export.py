@@ -0,0 +1,133 @@
+# test_export.py
+"""Streamed CSV / NDJSON / columnar exports (export.py)."""
+
+import csv
+import inspect
+import io
+import json
+from datetime import datetime
+
+import pytest
+from flask import abort
+
+from data_manager import DataManager
+from export import EXPORT_COLUMNS, export_response, iter_movie_rows, stream_csv, stream_ndjson
+from models import db
+from tests.conftest import make_app, new_movie
+
+TRICKY = 'Crouching Tiger, "Hidden" Dragon\nPart 1'
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path)
+    manager = DataManager()
+    with app.app_context():
+        ann, bob = manager.create_user("Ann"), manager.create_user("Bob")
+        manager.add_movie(new_movie(ann.id, "Heat"))
+        manager.add_movie(new_movie(ann.id, TRICKY, director="Ang Lee", year=2000))
+        manager.add_movie(new_movie(bob.id, "Alien", director="Ridley Scott", year=1979))
+
+    @app.route("/users/<int:user_id>/movies/export.<fmt>")
+    def export_user_movies(user_id, fmt):
+        if manager.get_user(user_id) is None:
+            abort(404)
+        return export_response(fmt, user_id, session=manager.session)
+
+    @app.route("/movies/export.<fmt>")
+    def export_all_movies(fmt):
+        return export_response(fmt, session=manager.session)
+
+    return app
+
+
+def _row(n):
+    return {"id": n, "user_id": 1, "name": f"Movie {n}", "director": "X", "year": 2000,
+            "rating": 7.5, "poster_url": "", "created_at": None}
+
+
+# -----------------------------
+# STREAM WRITERS
+# -----------------------------
+def test_csv_escapes_commas_quotes_and_newlines():
+    text = "".join(stream_csv([dict(_row(1), name=TRICKY)]))
+    assert text.splitlines()[0] == ",".join(EXPORT_COLUMNS)
+    assert '"Crouching Tiger, ""Hidden"" Dragon\nPart 1"' in text
+    parsed = list(csv.DictReader(io.StringIO(text)))
+    assert parsed[0]["name"] == TRICKY
+
+
+def test_ndjson_writes_one_object_per_line():
+    row = dict(_row(1), name=TRICKY, created_at=datetime(2024, 5, 1, 12, 30))
+    text = "".join(stream_ndjson([row, _row(2)]))
+    lines = text.split("\n")
+    assert lines[-1] == "" and len(lines) == 3                 # newline-terminated
+    first = json.loads(lines[0])
+    assert list(first) == list(EXPORT_COLUMNS)
+    assert first["name"] == TRICKY and first["created_at"] == "2024-05-01T12:30:00"
+    assert "".join(stream_ndjson([])) == ""
+
+
+@pytest.mark.parametrize("writer", [stream_csv, stream_ndjson])
+def test_writers_yield_chunks_before_reading_everything(writer):
+    consumed = []
+
+    def rows():
+        for n in range(10):
+            consumed.append(n)
+            yield _row(n)
+
+    stream = writer(rows(), flush_every=4)
+    assert inspect.isgenerator(stream)
+    first = next(stream)
+    assert consumed == [0, 1, 2, 3]                            # one chunk, not the whole input
+    assert "Movie 3" in first and "Movie 4" not in first
+    assert len(list(stream)) == 2
+
+
+# -----------------------------
+# ROW ITERATION
+# -----------------------------
+def test_iter_movie_rows_streams_plain_dicts(app):
+    with app.app_context():
+        rows = iter_movie_rows(chunk_size=2)
+        assert inspect.isgenerator(rows)
+        everything = list(rows)
+        assert [row["name"] for row in everything] == ["Heat", TRICKY, "Alien"]
+        assert set(everything[0]) == set(EXPORT_COLUMNS)
+        assert [row["name"] for row in iter_movie_rows(everything[2]["user_id"])] == ["Alien"]
+        assert not db.session.identity_map                    # no ORM objects built
+
+
+# -----------------------------
+# ROUTES
+# -----------------------------
+def test_csv_route_streams_attachment(app):
+    response = app.test_client().get("/users/1/movies/export.csv", buffered=False)
+    assert response.is_streamed
+    assert response.mimetype == "text/csv"
+    assert response.headers["Content-Disposition"] == "attachment; filename=movies_user_1.csv"
+    parsed = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row["name"] for row in parsed] == ["Heat", TRICKY]
+
+
+def test_ndjson_route_exports_everything(app):
+    response = app.test_client().get("/movies/export.ndjson", buffered=False)
+    assert response.is_streamed and response.mimetype == "application/x-ndjson"
+    assert "movies_all.ndjson" in response.headers["Content-Disposition"]
+    names = [json.loads(line)["name"] for line in response.get_data(as_text=True).splitlines()]
+    assert names == ["Heat", TRICKY, "Alien"]
+
+
+def test_parquet_route_spools_to_file(app):
+    pq = pytest.importorskip("pyarrow.parquet")
+    response = app.test_client().get("/users/2/movies/export.parquet")
+    assert response.status_code == 200
+    assert response.mimetype == "application/vnd.apache.parquet"
+    table = pq.read_table(io.BytesIO(response.get_data()))
+    assert table.column("name").to_pylist() == ["Alien"]
+
+
+@pytest.mark.parametrize("path", ["/movies/export.xml", "/users/99/movies/export.csv"])
+def test_unknown_format_or_user_is_404(app, path):
+    assert app.test_client().get(path).status_code == 404
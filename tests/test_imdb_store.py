@@ -0,0 +1,130 @@
+# test_imdb_store.py
+"""IMDb TSV ingestion and title lookup (imdb_store.py)."""
+
+import gzip
+
+import pytest
+
+from imdb_store import ImdbStore
+
+BASICS = [
+    ("tt01", "movie", "Heat", "Heat", "0", "1995"),
+    ("tt02", "movie", "Heat", "Heat", "0", "1986"),
+    ("tt03", "tvSeries", "Alien Nation", "Alien Nation", "0", "1989"),
+    ("tt04", "tvMovie", "Untitled", "Untitled", "0", "\\N"),
+]
+RATINGS = [("tt01", "8.3", "700000"), ("tt02", "5.1", "9000"), ("tt04", "6.0", "10")]
+CREW = [("tt01", "nm01", "nm01"), ("tt02", "nm02,nm01", "\\N"), ("tt04", "\\N", "\\N")]
+NAMES = [("nm01", "Michael Mann"), ("nm02", "Dick Richards")]
+
+HEADERS = {
+    "title.basics": ("tconst", "titleType", "primaryTitle", "originalTitle", "isAdult", "startYear"),
+    "title.ratings": ("tconst", "averageRating", "numVotes"),
+    "title.crew": ("tconst", "directors", "writers"),
+    "name.basics": ("nconst", "primaryName"),
+}
+
+
+def _write(directory, name, rows, compress=False):
+    text = "".join("\t".join(row) + "\n" for row in [HEADERS[name], *rows])
+    if compress:
+        path = directory / f"{name}.tsv.gz"
+        path.write_bytes(gzip.compress(text.encode()))
+    else:
+        path = directory / f"{name}.tsv"
+        path.write_text(text, encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def dumps(tmp_path):
+    directory = tmp_path / "dumps"
+    directory.mkdir()
+    _write(directory, "title.basics", BASICS, compress=True)
+    _write(directory, "title.ratings", RATINGS)
+    _write(directory, "title.crew", CREW)
+    _write(directory, "name.basics", NAMES, compress=True)
+    return directory
+
+
+@pytest.fixture
+def store(tmp_path, dumps):
+    store = ImdbStore(tmp_path / "imdb.db")
+    store.ingest_directory(dumps)
+    return store
+
+
+def test_empty_store_is_unavailable(tmp_path):
+    store = ImdbStore(tmp_path / "imdb.db")
+    assert not store.available
+    assert store.lookup_title("Heat") is None
+    assert not (tmp_path / "imdb.db").exists()
+
+
+def test_ingest_counts_rows_per_file(tmp_path, dumps):
+    report = ImdbStore(tmp_path / "imdb.db").ingest_directory(dumps)
+    # Only movie title types are kept; crew rows without a director are skipped
+    assert report == {"title.basics": 3, "title.ratings": 3, "title.crew": 2, "name.basics": 2}
+
+
+def test_lookup_prefers_year_then_votes(store):
+    assert store.lookup_title(" heat ") == {
+        "imdb_id": "tt01", "title": "Heat", "year": 1995, "rating": 8.3,
+        "director": "Michael Mann",
+    }
+    assert store.lookup_title("HEAT", 1986)["imdb_id"] == "tt02"
+    assert store.lookup_title("Heat", 2001)["imdb_id"] == "tt01"
+
+
+def test_lookup_joins_director_names_in_order(store):
+    assert store.lookup_title("Heat", 1986)["director"] == "Dick Richards, Michael Mann"
+
+
+def test_missing_values_and_other_title_types(store):
+    assert store.lookup_title("Untitled") == {
+        "imdb_id": "tt04", "title": "Untitled", "year": 0, "rating": 6.0,
+        "director": "Unknown",
+    }
+    assert store.lookup_title("Alien Nation") is None
+    assert store.lookup_title("") is None
+
+
+def test_unchanged_files_are_skipped(store, dumps):
+    assert set(store.ingest_directory(dumps).values()) == {None}
+    assert store.ingest_directory(dumps, force=True)["title.basics"] == 3
+
+
+def test_basics_reload_reapplies_ratings_and_crew(tmp_path, dumps):
+    # Ratings and crew already list tt05, but basics does not have it yet
+    _write(dumps, "title.ratings", RATINGS + [("tt05", "7.4", "60000")])
+    _write(dumps, "title.crew", CREW + [("tt05", "nm01", "nm01")])
+    store = ImdbStore(tmp_path / "imdb.db")
+    store.ingest_directory(dumps)
+    assert store.lookup_title("Thief") is None
+
+    _write(dumps, "title.basics", BASICS + [("tt05", "movie", "Thief", "Thief", "0", "1981")],
+           compress=True)
+    report = store.ingest_directory(dumps)
+    assert report["title.ratings"] == 4 and report["title.crew"] == 3
+    assert report["name.basics"] is None
+    thief = store.lookup_title("Thief")
+    assert (thief["rating"], thief["director"]) == (7.4, "Michael Mann")
+
+
+def test_titles_dropped_from_basics_are_deleted(store, dumps):
+    _write(dumps, "title.basics", BASICS[:1], compress=True)
+    store.ingest_directory(dumps)
+    assert store.lookup_title("Heat", 1986)["imdb_id"] == "tt01"
+    assert store.lookup_title("Untitled") is None
+    # The surviving title got its rating and director back
+    assert store.lookup_title("Heat")["rating"] == 8.3
+
+
+def test_failed_ingest_restores_synchronous(tmp_path, dumps):
+    _write(dumps, "title.ratings", [("tt01", "not-a-number", "1")])
+    store = ImdbStore(tmp_path / "imdb.db")
+    with pytest.raises(ValueError):
+        store.ingest_directory(dumps)
+    conn = store._connect()
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1    # NORMAL
+    assert [row[0] for row in conn.execute("SELECT file FROM ingest_state")] == ["title.basics"]
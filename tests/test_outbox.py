@@ -0,0 +1,144 @@
+# test_outbox.py
+"""Contact outbox: retries, dedup and claim leases (outbox.py)."""
+
+from datetime import datetime, timedelta
+
+import pytest
+import requests
+
+from models import db, ContactMessage
+from outbox import DeliveryError, GitHubIssues, OutboxDispatcher, enqueue_contact, init_outbox
+from tests.conftest import make_app
+
+
+class FakeIssues:
+    """Records calls; fails the next `failures` creates with DeliveryError."""
+
+    configured = True
+
+    def __init__(self, failures=0, existing=None, error=None):
+        self.failures = failures
+        self.existing = existing
+        self.error = error or DeliveryError("GitHub request failed: timeout")
+        self.created = []
+        self.lookups = 0
+
+    def create_issue(self, title, body):
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        self.created.append(body)
+        return f"https://github.test/issues/{len(self.created)}"
+
+    def find_issue(self, marker, since):
+        self.lookups += 1
+        return self.existing
+
+
+def _make_due(contact):
+    contact.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_transient_failure_is_retried_with_backoff(app):
+    sender = FakeIssues(failures=1)
+    dispatcher = OutboxDispatcher(app, sender)
+    contact = enqueue_contact("Ann", "ann@example.com", "Hello")
+
+    assert dispatcher.run_once()["retried"] == 1
+    assert (contact.status, contact.attempts, contact.claimed_until) == ("pending", 1, None)
+    assert contact.next_attempt_at > datetime.utcnow()
+    assert dispatcher.run_once()["claimed"] == 0
+
+    _make_due(contact)
+    assert dispatcher.run_once()["sent"] == 1
+    assert contact.status == "sent"
+    assert sender.lookups == 1
+
+
+def test_retry_reuses_issue_created_by_failed_attempt(app):
+    sender = FakeIssues(failures=1, existing="https://github.test/issues/7")
+    dispatcher = OutboxDispatcher(app, sender)
+    contact = enqueue_contact("Ann", "ann@example.com", "Hello")
+    dispatcher.run_once()
+    _make_due(contact)
+
+    dispatcher.run_once()
+    assert contact.issue_url == "https://github.test/issues/7"
+    assert sender.created == []
+
+
+def test_double_submit_is_stored_once(app):
+    first = enqueue_contact("Ann", "ann@example.com", "Hello")
+    second = enqueue_contact(" ann", "ANN@example.com", "Hello ")
+    assert first.id == second.id
+    assert db.session.query(ContactMessage).count() == 1
+
+
+def test_permanent_error_marks_failed(app):
+    sender = FakeIssues(failures=1, error=DeliveryError("GitHub returned 422", permanent=True))
+    contact = enqueue_contact("Ann", "ann@example.com", "Hello")
+    assert OutboxDispatcher(app, sender).run_once()["failed"] == 1
+    assert contact.status == "failed"
+
+
+@pytest.mark.parametrize("status, headers, permanent", [
+    (401, {}, True),
+    (403, {}, True),
+    (403, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "0"}, False),
+    (429, {"Retry-After": "30"}, False),
+    (502, {}, False),
+])
+def test_status_classification(status, headers, permanent):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    response._content = b""
+    with pytest.raises(DeliveryError) as error:
+        GitHubIssues._raise_for_status(response)
+    assert error.value.permanent is permanent
+
+
+def test_expired_lease_is_taken_over_with_dedup_lookup(app):
+    contact = enqueue_contact("Ann", "ann@example.com", "Hello")
+    stalled = OutboxDispatcher(app, FakeIssues())
+    batch, leases, _ = stalled._claim()
+    assert [c.id for c in batch] == [contact.id]
+
+    # The stalled worker's lease runs out before it gets to send
+    db.session.query(ContactMessage).update(
+        {"claimed_until": datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.session.commit()
+
+    sender = FakeIssues(existing="https://github.test/issues/3")
+    counts = OutboxDispatcher(app, sender).run_once()
+    assert counts["sent"] == 1
+    assert sender.lookups == 1 and sender.created == []
+
+    # The original worker no longer owns the row and must not send it
+    assert stalled._renew(contact.id, leases[contact.id]) is None
+
+
+def test_lease_is_renewed_before_each_send(app):
+    contact = enqueue_contact("Ann", "ann@example.com", "Hello")
+    dispatcher = OutboxDispatcher(app, FakeIssues())
+    _, leases, taken_over = dispatcher._claim()
+    assert taken_over == set()
+
+    renewed = dispatcher._renew(contact.id, leases[contact.id])
+    assert renewed is not None and renewed >= leases[contact.id]
+    assert dispatcher._renew(contact.id, leases[contact.id]) is None
+
+
+def test_dispatcher_starts_with_first_request(tmp_path, monkeypatch):
+    monkeypatch.delenv("OUTBOX_DISPATCHER", raising=False)
+    app = make_app(tmp_path)
+    app.add_url_rule("/", "index", lambda: "ok")
+    dispatcher = init_outbox(app, GitHubIssues("owner", "repo", None))
+    assert not dispatcher.running
+    try:
+        app.test_client().get("/")
+        assert dispatcher.running
+    finally:
+        dispatcher.stop()
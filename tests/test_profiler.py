@@ -0,0 +1,152 @@
+# test_profiler.py
+"""Per-request SQL profiling, repeat / N+1 detection and the debug panel (profiler.py)."""
+
+import json
+import logging
+
+import pytest
+from sqlalchemy import select
+
+import profiler
+from models import db, Movie, User
+from profiler import analyze, init_profiler
+from tests.conftest import make_app
+
+PAGE = "<html><body><p>Movies</p></body></html>"
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv("SQL_PROFILE", "1")
+    monkeypatch.setenv("SQL_SLOW_LOG", "")
+    app = make_app(tmp_path)
+    init_profiler(app, db)
+    with app.app_context():
+        db.session.add_all(User(name=name) for name in ("Ann", "Bob", "Cyd", "Dee"))
+        db.session.commit()
+
+    @app.route("/n-plus-one")
+    def n_plus_one():
+        # One movie query per user: the loop a lazy relationship produces
+        for user in db.session.scalars(select(User)).all():
+            db.session.scalars(select(Movie).where(Movie.user_id == user.id)).all()
+        return PAGE
+
+    @app.route("/repeated")
+    def repeated():
+        for _ in range(3):
+            db.session.scalars(select(Movie).where(Movie.user_id == 1)).all()
+        return PAGE
+
+    @app.route("/single")
+    def single():
+        db.session.scalars(select(User)).all()
+        return {"ok": True}
+
+    return app.test_client()
+
+
+def _profile(response) -> dict:
+    fields = (part.split("=") for part in response.headers["X-SQL-Profile"].split("; "))
+    return {key: float(value) for key, value in fields}
+
+
+# -----------------------------
+# ANALYSIS
+# -----------------------------
+def _query(statement, parameters, duration_ms=1.0, origin="app.py:1 in view"):
+    return {"statement": statement, "parameters": repr(parameters),
+            "duration_ms": duration_ms, "origin": origin}
+
+
+def test_analyze_flags_repeats_and_n_plus_one():
+    by_id = "SELECT * FROM movie WHERE user_id = ?"
+    queries = [_query("SELECT * FROM user", ())]
+    queries += [_query(by_id, (user_id,)) for user_id in (1, 2, 3, 3)]
+    summary = analyze(queries)
+    assert summary["count"] == 5 and summary["total_ms"] == 5.0
+    assert summary["repeated"] == [{"statement": by_id, "parameters": "(3,)", "count": 2}]
+    assert summary["n_plus_one"] == [
+        {"statement": by_id, "count": 4, "origins": ["app.py:1 in view"]}
+    ]
+
+
+def test_analyze_needs_distinct_parameters_and_threshold():
+    by_id = "SELECT * FROM movie WHERE user_id = ?"
+    # Same parameters every time is a repeat, not N+1
+    assert analyze([_query(by_id, (1,))] * 5)["n_plus_one"] == []
+    below = [_query(by_id, (n,)) for n in range(profiler.N_PLUS_ONE_THRESHOLD - 1)]
+    assert analyze(below)["n_plus_one"] == []
+
+
+def test_analyze_lists_slow_queries(monkeypatch):
+    monkeypatch.setattr(profiler, "SQL_SLOW_MS", 50.0)
+    summary = analyze([_query("SELECT 1", (), 10.0), _query("SELECT 2", (), 80.0)])
+    assert [q["statement"] for q in summary["slow"]] == ["SELECT 2"]
+
+
+# -----------------------------
+# REQUESTS
+# -----------------------------
+def test_loop_of_queries_is_flagged_as_n_plus_one(client, caplog):
+    with caplog.at_level(logging.WARNING):
+        response = client.get("/n-plus-one")
+    profile = _profile(response)
+    assert profile["count"] == 5 and profile["n_plus_one"] == 1
+    assert profile["repeated"] == 0
+    warning = next(r.getMessage() for r in caplog.records if "N+1" in r.getMessage())
+    assert "4x" in warning and "test_profiler.py" in warning
+
+
+def test_identical_queries_are_flagged_as_repeated(client):
+    profile = _profile(client.get("/repeated"))
+    assert (profile["count"], profile["repeated"], profile["n_plus_one"]) == (3, 1, 0)
+
+
+def test_sql_debug_panel_is_injected_into_html(client):
+    body = client.get("/n-plus-one?sql_debug=1").get_data(as_text=True)
+    assert body.endswith('</table></div></body></html>')
+    assert "<h3>SQL: 5 queries" in body and "1 N+1</h3>" in body
+    assert "<p>Movies</p>" in body
+    assert 'id="sql-debug"' not in client.get("/n-plus-one").get_data(as_text=True)
+
+
+def test_sql_debug_panel_skips_non_html(client):
+    response = client.get("/single?sql_debug=1")
+    assert response.get_json() == {"ok": True}
+    assert _profile(response)["count"] == 1
+
+
+def test_profiling_off_without_flag(client, monkeypatch):
+    monkeypatch.delenv("SQL_PROFILE")
+    monkeypatch.delenv("FLASK_DEBUG", raising=False)
+    response = client.get("/n-plus-one?sql_debug=1")
+    assert "X-SQL-Profile" not in response.headers
+    assert response.get_data(as_text=True) == PAGE
+
+
+def test_slow_queries_are_logged_with_plan(client, monkeypatch):
+    monkeypatch.setattr(profiler, "SQL_SLOW_MS", 0.0)
+    logger, handler = profiler.slow_query_logger, _ListHandler()
+    level = logger.level
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    try:
+        client.get("/single")
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+    entry = json.loads(handler.records[0].getMessage())
+    assert entry["path"] == "/single"
+    assert entry["statement"].startswith("SELECT")
+    assert entry["url"].endswith("primary.db")
+    assert any("SCAN" in row for row in entry["plan"])
@@ -0,0 +1,49 @@
+# test_quota.py
+"""Shared upstream API quota (quota.py)."""
+
+import time
+
+import pytest
+
+from quota import ApiKeyPool, BucketStore, Limit, BACKGROUND
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BucketStore(tmp_path / "quota.db")
+
+
+def test_keys_with_same_suffix_get_separate_buckets(store):
+    pool = ApiKeyPool("omdb", ["aaaa-1234", "bbbb-1234"], [Limit("day", 1, 86400)], store)
+    assert {pool.acquire(), pool.acquire()} == {"aaaa-1234", "bbbb-1234"}
+    assert pool.acquire() is None
+
+
+def test_stats_do_not_reveal_keys(store):
+    pool = ApiKeyPool("omdb", ["secret-key-1234"], [Limit("day", 5, 86400)], store)
+    labels = list(pool.remaining()["keys"])
+    assert labels and not any("1234" in label for label in labels)
+
+
+def test_background_keeps_reserve(store):
+    pool = ApiKeyPool("omdb", ["key"], [Limit("day", 10, 86400)], store)
+    taken = 0
+    while pool.acquire(BACKGROUND):
+        taken += 1
+    assert taken == 8           # stops with 2 of 10 tokens left
+    assert pool.acquire() == "key"
+
+
+def test_exhausted_key_stays_blocked_despite_refill(store):
+    # 100 tokens/s would refill within milliseconds
+    pool = ApiKeyPool("gemini", ["key"], [Limit("second", 100, 1)], store)
+    pool.mark_exhausted("key", retry_after=60)
+    assert pool.acquire() is None
+    assert pool.remaining()["keys"][pool._label("key")]["blocked_for"] > 50
+
+
+def test_block_expires(store):
+    pool = ApiKeyPool("gemini", ["key"], [Limit("second", 100, 1)], store)
+    pool.mark_exhausted("key", retry_after=0.05)
+    time.sleep(0.1)
+    assert pool.acquire() == "key"
@@ -0,0 +1,124 @@
+# test_ratelimit.py
+"""Route rate limits and admission control (ratelimit.py)."""
+
+import threading
+
+import pytest
+from flask import Flask
+
+from ratelimit import AdmissionStore, RouteLimiter
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AdmissionStore(tmp_path / "ratelimit.db")
+
+
+def make_app(limiter):
+    app = Flask(__name__)
+
+    @app.route("/work/<int:user_id>", methods=["POST"])
+    @limiter.guard()
+    def work(user_id):
+        return "ok"
+
+    return app
+
+
+def test_429_with_retry_after(store):
+    client = make_app(RouteLimiter("ai", "2/60", store=store)).test_client()
+    assert client.post("/work/1").status_code == 200
+    assert client.post("/work/1").status_code == 200
+    denied = client.post("/work/1")
+    assert denied.status_code == 429
+    assert 1 <= int(denied.headers["Retry-After"]) <= 30
+
+
+def test_user_denial_does_not_spend_ip_budget(store):
+    client = make_app(RouteLimiter("ai", "2/60", store=store)).test_client()
+    first_ip, second_ip = {"REMOTE_ADDR": "10.0.0.1"}, {"REMOTE_ADDR": "10.0.0.2"}
+    client.post("/work/1", environ_base=first_ip)
+    client.post("/work/1", environ_base=first_ip)
+    for _ in range(5):
+        # Denied by user 1's bucket; must not drain the second IP's bucket
+        assert client.post("/work/1", environ_base=second_ip).status_code == 429
+    assert client.post("/work/2", environ_base=second_ip).status_code == 200
+    assert client.post("/work/3", environ_base=second_ip).status_code == 200
+
+
+def test_denied_requests_cost_nothing(store):
+    limiter = RouteLimiter("ai", "3/60", store=store)
+    client = make_app(limiter).test_client()
+    for _ in range(3):
+        client.post("/work/1")
+    client.post("/work/1")                                   # denied by both
+    conn = store._connect()
+    tokens = dict(conn.execute("SELECT name, tokens FROM buckets").fetchall())
+    assert tokens["ai:ip:127.0.0.1"] == pytest.approx(0, abs=0.01)
+    assert tokens["ai:user:1"] == pytest.approx(0, abs=0.01)
+
+
+def test_partial_denial_debits_no_bucket(store):
+    limiter = RouteLimiter("ai", "2/60", store=store)
+    client = make_app(limiter).test_client()
+    client.post("/work/1")
+    client.post("/work/1")
+    # IP is out of tokens; user 2 is fresh and must keep its full bucket
+    assert client.post("/work/2").status_code == 429
+    row = store._connect().execute(
+        "SELECT tokens FROM buckets WHERE name = 'ai:user:2'"
+    ).fetchone()
+    assert row is None
+
+
+def test_idle_buckets_are_purged(store):
+    limiter = RouteLimiter("ai", "5/60", store=store)
+    store.take_all(["ai:ip:1.2.3.4"], limiter.limit)
+    store._connect().execute("UPDATE buckets SET updated_at = updated_at - 120")
+    store.purge("ai", limiter.limit)
+    assert store._connect().execute("SELECT COUNT(*) FROM buckets").fetchone()[0] == 0
+
+
+def test_concurrency_cap_rejects_when_full(store):
+    limiter = RouteLimiter("omdb", "100/60", max_concurrent=1, max_queue=0,
+                           queue_timeout=0.1, store=store)
+    entered, release = threading.Event(), threading.Event()
+
+    def hold():
+        with limiter.slot():
+            entered.set()
+            release.wait(2)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    entered.wait(2)
+    client = make_app(limiter).test_client()
+    assert client.post("/work/1").status_code == 429
+    release.set()
+    holder.join()
+    assert client.post("/work/1").status_code == 200
+
+
+def test_limited_only_counts_calls_that_reach_upstream(store):
+    limiter = RouteLimiter("ai", "2/60", store=store)
+    answers = {}
+
+    @limiter.limited
+    def upstream(query):
+        return query.upper()
+
+    app = Flask(__name__)
+
+    @app.route("/suggest/<query>", methods=["POST"])
+    def suggest(query):
+        if query not in answers:
+            answers[query] = upstream(query)
+        return answers[query]
+
+    client = app.test_client()
+    assert client.post("/suggest/alien").status_code == 200
+    for _ in range(5):
+        assert client.post("/suggest/alien").get_data(as_text=True) == "ALIEN"   # cached
+    assert client.post("/suggest/heat").status_code == 200
+    assert client.post("/suggest/thief").status_code == 429
+    assert upstream.__name__ == "upstream"
@@ -0,0 +1,77 @@
+# test_routing.py
+"""Read/write splitting and read-your-writes (routing.py)."""
+
+import time
+
+import pytest
+from flask import abort, session
+
+from data_manager import DataManager
+from models import db, User
+from routing import init_replicas
+from tests.conftest import make_app
+
+
+@pytest.fixture
+def app(tmp_path):
+    # The replica is a separate, never-updated file: maximal replication lag
+    app = make_app(
+        tmp_path,
+        binds={"replica_0": f"sqlite:///{tmp_path / 'replica.db'}"},
+        SQLALCHEMY_REPLICA_BINDS=["replica_0"],
+        READ_AFTER_WRITE_SECONDS=0.3,
+    )
+    init_replicas(app, db)
+    with app.app_context():
+        db.metadata.create_all(db.engines["replica_0"])
+    manager = DataManager()
+
+    @app.post("/users/<name>")
+    def create(name):
+        user = manager.create_user(name)
+        # Same request, after the write: must not ask the lagging replica
+        return {"id": user.id, "seen": manager.get_user(user.id) is not None}
+
+    @app.get("/users/<int:user_id>")
+    def show(user_id):
+        user = manager.get_user(user_id)
+        if user is None:
+            abort(404)
+        return {"name": user.name, "pinned": "_primary_until" in session}
+
+    return app
+
+
+def test_writer_reads_own_write_from_primary(app):
+    client = app.test_client()
+    created = client.post("/users/Ann").get_json()
+    assert created["seen"]
+    response = client.get(f"/users/{created['id']}")
+    assert response.status_code == 200
+    assert response.get_json() == {"name": "Ann", "pinned": True}
+
+
+def test_other_clients_read_from_replica(app):
+    user_id = app.test_client().post("/users/Ann").get_json()["id"]
+    assert app.test_client().get(f"/users/{user_id}").status_code == 404
+
+
+def test_pin_expires_after_read_after_write_window(app):
+    client = app.test_client()
+    user_id = client.post("/users/Ann").get_json()["id"]
+    time.sleep(0.35)
+    assert client.get(f"/users/{user_id}").status_code == 404
+
+
+def test_unhealthy_replica_falls_back_to_primary(app):
+    user_id = app.test_client().post("/users/Ann").get_json()["id"]
+    app.extensions["replica_router"].mark_down("replica_0")
+    assert app.test_client().get(f"/users/{user_id}").status_code == 200
+
+
+def test_writes_always_go_to_primary(app):
+    app.test_client().post("/users/Ann")
+    with app.app_context():
+        assert db.session.query(User).count() == 0           # routed to the replica
+        with db.engines[None].connect() as conn:
+            assert conn.exec_driver_sql("SELECT COUNT(*) FROM user").scalar() == 1
@@ -0,0 +1,134 @@
+# test_semantic.py
+"""Near-duplicate query matching, eviction and cross-process refresh (semantic.py)."""
+
+import pytest
+
+from semantic import SemanticIndex, normalize
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SemanticIndex(tmp_path / "semantic.db", threshold=0.8)
+
+
+def test_normalize_folds_synonyms_phrases_and_stopwords():
+    assert normalize("Top Science-Fiction films") == ["best", "scifi"]
+    assert normalize("Suggest some hilarious movies for kids") == ["comedy", "family"]
+    # Titles are kept as typed, genre words are stemmed
+    assert normalize("thrillers like Aliens") == ["thriller", "aliens"]
+
+
+# -----------------------------
+# MATCHING
+# -----------------------------
+@pytest.mark.parametrize("paraphrase", [
+    "top science fiction films",
+    "great sci-fi flicks",
+    "Greatest science-fiction movies",
+])
+def test_paraphrases_hit(index, paraphrase):
+    index.add("best sci fi movies", ["Alien"])
+    assert index.lookup(paraphrase) == ["Alien"]
+    assert index.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("near_miss", [
+    "best sci fi thrillers",
+    "best horror movies",
+    "sci fi",
+])
+def test_near_misses_below_threshold_miss(index, near_miss):
+    index.add("best sci fi movies", ["Alien"])
+    row_id, similarity = index.nearest(near_miss)
+    assert 0 < similarity < index.threshold
+    assert index.lookup(near_miss) is None
+    assert index.stats()["misses"] == 1
+
+
+def test_threshold_is_the_cut_off(index):
+    index.add("best sci fi movies", ["Alien"])
+    _, similarity = index.nearest("best sci fi thrillers")
+    index.threshold = similarity - 0.01
+    assert index.lookup("best sci fi thrillers") == ["Alien"]
+
+
+def test_titles_must_match_exactly(index):
+    index.add("sci fi movies like Alien", ["Predator"])
+    assert index.lookup("science fiction films similar to alien") == ["Predator"]
+    assert index.nearest("sci fi movies like Aliens") is None
+    assert index.nearest("sci fi movies like Alien 1979") is None
+
+
+def test_variants_and_expired_entries_do_not_match(index):
+    index.add("best sci fi movies", ["Alien"], variant="5")
+    assert index.lookup("best sci fi movies", variant="10") is None
+    index.ttl = 0
+    assert index.nearest("best sci fi movies", variant="5") is None
+
+
+def test_cached_decorator_keys_variant_on_arguments(index):
+    calls = []
+
+    @index.cached(unless=lambda result: not result)
+    def suggest(query, count=5):
+        calls.append((query, count))
+        return [f"{query} #{n}" for n in range(count)]
+
+    assert suggest("great sci-fi flicks") == suggest("top science fiction films")
+    suggest("top science fiction films", count=3)
+    assert calls == [("great sci-fi flicks", 5), ("top science fiction films", 3)]
+
+
+# -----------------------------
+# EVICTION & REFRESH
+# -----------------------------
+def _fill(index, count):
+    # Distinct titles keep every row its own entry
+    for n in range(count):
+        index.add(f"movies like title{n}", [n])
+
+
+def test_eviction_keeps_used_and_newest_rows(tmp_path):
+    index = SemanticIndex(tmp_path / "semantic.db", max_entries=10)
+    _fill(index, 10)
+    assert index.lookup("films like title0") == [0]        # one hit protects the oldest row
+    index.add("movies like title10", [10])                 # 11 > 10: evict down to 9
+
+    conn = index._connect()
+    kept = [row[0] for row in conn.execute("SELECT query FROM queries ORDER BY id")]
+    assert len(kept) == 9
+    assert "movies like title0" in kept and "movies like title10" in kept
+    assert "movies like title1" not in kept and "movies like title2" not in kept
+
+
+def test_other_processes_pick_up_new_and_evicted_rows(tmp_path):
+    path = tmp_path / "semantic.db"
+    writer = SemanticIndex(path, max_entries=10)
+    reader = SemanticIndex(path, max_entries=10)
+    _fill(writer, 3)
+    assert reader.lookup("movies like title2") == [2]
+    assert reader.stats()["entries"] == 3
+
+    # Incremental: only the new rows are appended
+    writer.add("movies like title3", [3])
+    reader._refresh()
+    assert list(reader._ids) == [1, 2, 3, 4]
+
+    # Eviction shrinks the table: the reader reloads from scratch
+    _fill(writer, 12)
+    reader._refresh()
+    ids = [row[0] for row in writer._connect().execute("SELECT id FROM queries ORDER BY id")]
+    assert list(reader._ids) == ids
+    assert len(reader._titles) == len(reader._variants) == reader._matrix.shape[0] == len(ids)
+    assert reader.nearest("movies like title1") is None
+
+
+def test_refresh_reads_only_rows_past_last_id(index):
+    _fill(index, 2)
+    index._refresh()
+    matrix = index._matrix
+    index._refresh()
+    assert index._matrix is matrix                          # nothing new, nothing rebuilt
+    index.add("movies like title9", [9])
+    index._refresh()
+    assert index._matrix.shape[0] == 3
@@ -0,0 +1,139 @@
+# test_tracing.py
+"""Trace-ID propagation, tail sampling and JSON logging (tracing.py)."""
+
+import atexit
+import json
+import logging
+import time
+
+import pytest
+from flask import Flask
+
+import tracing
+from tracing import init_tracing, trace_headers
+
+TRACE_ID = "0af7651916cd43dd8448eb211c80319c"
+
+
+@pytest.fixture
+def traced(tmp_path, monkeypatch):
+    """A traced app plus a reader returning the JSON records written so far."""
+    monkeypatch.setattr(tracing, "LOG_FILE", str(tmp_path / "app.log"))
+    monkeypatch.setattr(tracing, "LOG_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(tracing, "SLOW_REQUEST_MS", 200.0)
+    root = logging.getLogger()
+    saved = list(root.handlers), root.level
+
+    app = Flask(__name__)
+    listener = init_tracing(app, error_log=str(tmp_path / "errors.log"))
+    atexit.unregister(listener.stop)
+
+    @app.route("/fast")
+    def fast():
+        logging.getLogger("test").info("fast view")
+        return {"outbound": trace_headers()}
+
+    @app.route("/slow")
+    def slow():
+        logging.getLogger("test").info("slow view")
+        time.sleep(0.25)
+        return "ok"
+
+    @app.route("/logged-error")
+    def logged_error():
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logging.getLogger("test").exception("division failed")
+        return "ok"
+
+    @app.route("/crash")
+    def crash():
+        raise RuntimeError("boom")
+
+    def read():
+        listener.stop()
+        path = tmp_path / "app.log"
+        lines = path.read_text().splitlines() if path.exists() else []
+        return [json.loads(line) for line in lines]
+
+    try:
+        yield app.test_client(), read
+    finally:
+        if listener._thread is not None:
+            listener.stop()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in saved[0]:
+            root.addHandler(handler)
+        root.setLevel(saved[1])
+
+
+def _messages(records) -> list:
+    return [record["message"] for record in records]
+
+
+# -----------------------------
+# TRACE IDS
+# -----------------------------
+def test_incoming_request_id_is_echoed_logged_and_propagated(traced, monkeypatch):
+    monkeypatch.setattr(tracing, "LOG_SAMPLE_RATE", 1.0)
+    client, read = traced
+    response = client.get("/fast", headers={"X-Request-ID": "req-12345678"})
+    assert response.headers["X-Request-ID"] == "req-12345678"
+    outbound = response.get_json()["outbound"]
+    assert outbound["X-Request-ID"] == "req-12345678"
+    assert outbound["traceparent"].startswith("00-req-12345678-")
+    assert {record["trace_id"] for record in read()} == {"req-12345678"}
+
+
+def test_traceparent_header_supplies_trace_id(traced):
+    client, _ = traced
+    response = client.get("/fast", headers={"traceparent": f"00-{TRACE_ID}-b7ad6b7169203331-01"})
+    assert response.headers["X-Request-ID"] == TRACE_ID
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Request-ID": "bad id; drop table"}])
+def test_missing_or_malformed_ids_are_replaced(traced, headers):
+    client, _ = traced
+    generated = client.get("/fast", headers=headers).headers["X-Request-ID"]
+    assert len(generated) == 32 and generated != headers.get("X-Request-ID")
+    assert trace_headers() == {}            # nothing leaks outside the request
+
+
+# -----------------------------
+# TAIL SAMPLING
+# -----------------------------
+def test_fast_requests_are_dropped(traced):
+    client, read = traced
+    client.get("/fast")
+    assert read() == []
+
+
+def test_slow_requests_are_kept(traced):
+    client, read = traced
+    client.get("/slow")
+    records = read()
+    assert _messages(records)[0] == "slow view"
+    assert records[-1]["sampled"] == "slow" and records[-1]["duration_ms"] >= 200
+
+
+def test_error_and_rejected_requests_are_kept(traced):
+    client, read = traced
+    assert client.get("/crash").status_code == 500
+    assert client.get("/missing").status_code == 404
+    summaries = [record for record in read() if record["logger"] == "request"]
+    assert [(r["status"], r["sampled"]) for r in summaries] == [(500, "error"), (404, "warning")]
+
+
+def test_logged_exception_keeps_request_and_traceback(traced, tmp_path):
+    client, read = traced
+    response = client.get("/logged-error")
+    assert response.status_code == 200
+    records = read()
+    failure = next(record for record in records if record["message"] == "division failed")
+    assert "Traceback" in failure["exception"]
+    assert "ZeroDivisionError" in failure["exception"]
+    assert failure["trace_id"] == response.headers["X-Request-ID"]
+    assert records[-1]["sampled"] == "error"
+    assert "ZeroDivisionError" in (tmp_path / "errors.log").read_text()
@@ -0,0 +1,109 @@
+# test_validation.py
+"""Form schemas and their user-facing error messages (validation.py)."""
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from validation import (
+    AiMovieForm, ContactForm, MovieForm, MovieUpdateForm, SuggestionQueryForm, UserForm,
+    current_year, validate_form,
+)
+
+
+def _messages(schema, data) -> dict:
+    model, errors = validate_form(schema, data)
+    assert (model is None) == bool(errors)
+    return {error["field"]: error["message"] for error in errors}
+
+
+@pytest.mark.parametrize("data", [{}, {"name": ""}, {"name": "   "}])
+def test_user_name_required(data):
+    assert _messages(UserForm, data) == {"name": "⚠️ Name cannot be empty."}
+
+
+def test_user_name_letters_only():
+    assert _messages(UserForm, {"name": "R2D2"}) == {
+        "name": "⚠️ Name must only contain letters and spaces."
+    }
+    model, _ = validate_form(UserForm, MultiDict({"name": "  Ann Lee "}))
+    assert model.name == "Ann Lee"
+
+
+@pytest.mark.parametrize("data", [{}, {"movie_name": " "}])
+def test_movie_name_required(data):
+    assert _messages(MovieForm, data) == {"movie_name": "⚠️ Please enter a movie name."}
+
+
+@pytest.mark.parametrize("field, value, message", [
+    ("year", "19x5", "⚠️ Year must be a number."),
+    ("year", "1800", "⚠️ Please enter a realistic year."),
+    ("year", str(current_year() + 2), "⚠️ Please enter a realistic year."),
+    ("rating", "great", "⚠️ Rating must be a valid number."),
+    ("rating", "11", "⚠️ Rating must be between 0 and 10."),
+])
+def test_movie_year_and_rating(field, value, message):
+    assert _messages(MovieForm, {"movie_name": "Heat", field: value}) == {field: message}
+
+
+def test_movie_manual_fields_are_optional():
+    model, _ = validate_form(MovieForm, {"movie_name": "Heat", "year": "", "rating": ""})
+    assert (model.year, model.rating, model.is_manual) == (None, None, False)
+    model, _ = validate_form(MovieForm, {"movie_name": "Heat", "year": "1995"})
+    assert model.is_manual
+
+
+def test_update_form_changes_only_set_fields():
+    model, errors = validate_form(MovieUpdateForm, {"new_rating": "9", "version": "3"})
+    assert errors == [] and model.version == 3
+    assert model.changes() == {"rating": 9.0}
+    model, _ = validate_form(MovieUpdateForm, {})
+    assert (model.changes(), model.version) == ({}, None)
+
+
+def test_update_form_rejects_bad_poster():
+    assert _messages(MovieUpdateForm, {"new_poster": "ftp://x"}) == {
+        "new_poster": "⚠️ Poster URL must start with http:// or https://"
+    }
+
+
+def test_update_form_ignores_garbled_version():
+    model, _ = validate_form(MovieUpdateForm, {"version": "abc"})
+    assert model.version is None
+
+
+@pytest.mark.parametrize("user_id", [None, "", "abc", "-1"])
+def test_ai_movie_user_id(user_id):
+    data = {"movie_name": "Heat"}
+    if user_id is not None:
+        data["user_id"] = user_id
+    assert _messages(AiMovieForm, data) == {"user_id": "❌ Invalid user selected."}
+
+
+def test_ai_movie_defaults_unknown_year_and_rating():
+    model, errors = validate_form(
+        AiMovieForm, {"user_id": "7", "movie_name": "Heat", "year": "N/A", "rating": ""}
+    )
+    assert errors == []
+    assert (model.user_id, model.year, model.rating) == (7, 0, 0.0)
+    assert _messages(AiMovieForm, {"user_id": "7"}) == {
+        "movie_name": "⚠️ Please enter a movie name."
+    }
+
+
+def test_contact_form_messages_in_field_order():
+    assert list(_messages(ContactForm, {}).values()) == [
+        "⚠️ Name cannot be empty.",
+        "⚠️ Please enter a valid email address.",
+    ]
+    assert _messages(ContactForm, {"name": "Ann", "email": "ann@"}) == {
+        "email": "⚠️ Please enter a valid email address."
+    }
+    model, _ = validate_form(ContactForm, {"name": "Ann", "email": "ann@example.com"})
+    assert model.message == ""
+
+
+@pytest.mark.parametrize("data", [{}, {"movie_query": ""}])
+def test_suggestion_query_required(data):
+    assert _messages(SuggestionQueryForm, data) == {
+        "movie_query": "⚠️ Please enter a movie name or topic for suggestions."
+    }
@@ -0,0 +1,264 @@
+# tracing.py
+"""
+Tracing - Structured JSON logging with per-request trace IDs and tail sampling.
+
+    * every request gets a trace ID (taken from an incoming X-Request-ID or
+      traceparent header, otherwise generated) that is stamped on each log
+      record and sent on outbound OMDb / Gemini / GitHub calls
+    * span("omdb", ...) times a unit of work; DB time is collected through
+      SQLAlchemy events; each request ends with one summary record holding
+      the status, duration and span totals
+    * tail sampling: a request's records are buffered and only written once
+      the request is over - always for failed (5xx or ERROR), rejected (4xx,
+      including 429s) or slow (>= SLOW_REQUEST_MS) requests and for any
+      request that logged a WARNING, otherwise for a LOG_SAMPLE_RATE fraction
+    * records go through a QueueHandler, so request threads never block on
+      file I/O; a QueueListener thread does the writing
+"""
+
+import os
+import copy
+import json
+import time
+import queue
+import re
+import random
+import atexit
+import logging
+import secrets
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_buffer = contextvars.ContextVar("log_buffer", default=None)
+_spans = contextvars.ContextVar("spans", default=None)
+
+_TRACE_ID_RE = re.compile(r"[A-Za-z0-9\-]{8,64}")
+
+# Standard LogRecord attributes; anything else was passed via extra=
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+def current_trace_id() -> str | None:
+    return _trace_id.get()
+
+
+def trace_headers() -> dict:
+    """Headers that propagate the current trace to an outbound HTTP call."""
+    trace_id = _trace_id.get()
+    if not trace_id:
+        return {}
+    return {
+        "X-Request-ID": trace_id,
+        "traceparent": f"00-{trace_id}-{secrets.token_hex(8)}-01",
+    }
+
+
+# -----------------------------
+# SPANS
+# -----------------------------
+def _record_span(kind: str, duration_ms: float) -> None:
+    spans = _spans.get()
+    if spans is not None:
+        total = spans.setdefault(kind, {"count": 0, "ms": 0.0})
+        total["count"] += 1
+        total["ms"] += duration_ms
+
+
+@contextmanager
+def span(kind: str, **attributes):
+    """Time a block (e.g. span("omdb", title=...)) and log it as a span record."""
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = repr(e)
+        raise
+    finally:
+        duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        _record_span(kind, duration_ms)
+        logging.getLogger("trace").info(
+            f"span {kind}",
+            extra={"span": kind, "duration_ms": duration_ms, "error": error, **attributes}
+        )
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _spans.get() is not None:
+        conn.info.setdefault("trace_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("trace_start")
+    if _spans.get() is not None and starts:
+        _record_span("db", (time.perf_counter() - starts.pop()) * 1000)
+
+
+# -----------------------------
+# FORMATTING & HANDLERS
+# -----------------------------
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including trace ID and extra= fields."""
+
+    def format(self, record):
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "trace_id": getattr(record, "trace_id", None),
+            "where": f"{record.pathname}:{record.lineno}",
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and key not in payload:
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exception"] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+_exception_formatter = logging.Formatter()
+
+
+class SamplingQueueHandler(QueueHandler):
+    """
+    Queue handler that holds back records while a request is in flight.
+
+    Records are stamped with the trace ID and formatted eagerly (prepare),
+    then either buffered for the request or put on the queue directly.
+    Tracebacks are rendered into exc_text here, while exc_info is still
+    live; the base prepare() would drop them.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.trace_id = _trace_id.get()
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            prepared = self.prepare(record)
+            buffer = _buffer.get()
+            if buffer is not None:
+                buffer.append(prepared)
+            else:
+                self.enqueue(prepared)
+        except Exception:
+            self.handleError(record)
+
+    def flush_buffer(self, keep: bool) -> None:
+        buffer = _buffer.get()
+        _buffer.set(None)
+        if keep and buffer:
+            for record in buffer:
+                self.enqueue(record)
+
+
+# -----------------------------
+# FLASK INTEGRATION
+# -----------------------------
+def init_tracing(app, error_log: str = "app_errors.log") -> QueueListener:
+    """Route all logging through the sampling queue and trace every request."""
+    log_queue = queue.SimpleQueue()
+    sampler = SamplingQueueHandler(log_queue)
+
+    json_handler = logging.FileHandler(LOG_FILE)
+    json_handler.setFormatter(JsonFormatter())
+
+    # Keep the plain-text error log the app has always written
+    error_handler = logging.FileHandler(error_log)
+    error_handler.setLevel(logging.ERROR)
+    error_handler.setFormatter(logging.Formatter(
+        "%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]"
+    ))
+
+    listener = QueueListener(log_queue, json_handler, error_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(sampler)
+    root.setLevel(logging.INFO)
+
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def _start_trace():
+        incoming = request.headers.get("X-Request-ID") or ""
+        traceparent = request.headers.get("traceparent", "").split("-")
+        if len(traceparent) == 4 and len(traceparent[1]) == 32:
+            incoming = traceparent[1]
+        if not _TRACE_ID_RE.fullmatch(incoming):
+            incoming = secrets.token_hex(16)
+        _trace_id.set(incoming)
+        _buffer.set([])
+        _spans.set({})
+        g.trace_active = True
+        g.trace_started = time.perf_counter()
+
+    @app.after_request
+    def _tag_response(response):
+        if _trace_id.get():
+            response.headers["X-Request-ID"] = _trace_id.get()
+        g.trace_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _end_trace(exc):
+        if not g.pop("trace_active", False):
+            return
+        duration_ms = round((time.perf_counter() - g.pop("trace_started")) * 1000, 3)
+        status = 500 if exc is not None else g.pop("trace_status", 200)
+        spans = {kind: {"count": v["count"], "ms": round(v["ms"], 3)}
+                 for kind, v in (_spans.get() or {}).items()}
+        buffered = _buffer.get() or []
+        failed = status >= 500 or any(r.levelno >= logging.ERROR for r in buffered)
+        warned = status >= 400 or any(r.levelno >= logging.WARNING for r in buffered)
+        slow = duration_ms >= SLOW_REQUEST_MS
+        if failed:
+            sampled = "error"
+        elif warned:
+            sampled = "warning"
+        elif slow:
+            sampled = "slow"
+        else:
+            sampled = "random"
+        keep = sampled != "random" or random.random() < LOG_SAMPLE_RATE
+
+        logging.getLogger("request").info(
+            f"{request.method} {request.path} {status} {duration_ms}ms",
+            extra={
+                "method": request.method,
+                "path": request.path,
+                "status": status,
+                "duration_ms": duration_ms,
+                "spans": spans,
+                "sampled": sampled,
+            }
+        )
+        sampler.flush_buffer(keep)
+        _spans.set(None)
+        _trace_id.set(None)
+
+    return listener
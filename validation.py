@@ -0,0 +1,244 @@
+# validation.py
+"""
+Validation - Pydantic schemas for every form / API payload.
+
+All routes validate through validate_form(), which returns either the
+parsed model or a list of structured errors ({"field", "message"}).
+Regular expressions are compiled once at import time and the current year
+is cached, so validation on the hot write paths costs no regex compilation
+and no datetime.now() call per request.
+
+Error messages are the same user-facing texts the routes flashed before.
+"""
+
+import re
+import time
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+from pydantic_core import PydanticCustomError
+
+# -----------------------------
+# PRECOMPILED PATTERNS
+# -----------------------------
+NAME_RE = re.compile(r"[A-Za-z\s]+")
+EMAIL_RE = re.compile(r"[\w\.-]+@[\w\.-]+\.\w+")
+URL_RE = re.compile(r"https?://")
+
+MIN_YEAR = 1888  # first known motion picture
+
+_year_cache = {"year": 0, "expires": 0.0}
+
+
+def current_year() -> int:
+    """Current year, re-read at most once an hour."""
+    now = time.time()
+    if now >= _year_cache["expires"]:
+        _year_cache["year"] = time.localtime(now).tm_year
+        _year_cache["expires"] = now + 3600
+    return _year_cache["year"]
+
+
+def _error(code: str, message: str) -> PydanticCustomError:
+    return PydanticCustomError(code, message)
+
+
+# -----------------------------
+# SHARED FIELD PARSERS
+# -----------------------------
+def parse_person_name(value: str) -> str:
+    if not value:
+        raise _error("required", "⚠️ Name cannot be empty.")
+    if not NAME_RE.fullmatch(value):
+        raise _error("name_chars", "⚠️ Name must only contain letters and spaces.")
+    return value
+
+
+def parse_year(value) -> int | None:
+    """'' -> None; otherwise a digit string within MIN_YEAR..next year."""
+    if value is None or value == "":
+        return None
+    value = str(value).strip()
+    if not value.isdigit():
+        raise _error("year_type", "⚠️ Year must be a number.")
+    year = int(value)
+    if year < MIN_YEAR or year > current_year() + 1:
+        raise _error("year_range", "⚠️ Please enter a realistic year.")
+    return year
+
+
+def parse_rating(value) -> float | None:
+    """'' -> None; otherwise a number between 0 and 10."""
+    if value is None or value == "":
+        return None
+    try:
+        rating = float(value)
+    except (TypeError, ValueError):
+        raise _error("rating_type", "⚠️ Rating must be a valid number.")
+    if not (0 <= rating <= 10):
+        raise _error("rating_range", "⚠️ Rating must be between 0 and 10.")
+    return rating
+
+
+# -----------------------------
+# SCHEMAS
+# -----------------------------
+class FormModel(BaseModel):
+    """
+    Base for form payloads: strips strings, ignores unknown fields. Missing
+    fields take their default and still go through the validators, so an
+    absent field gets the same message as an empty one.
+    """
+    model_config = ConfigDict(str_strip_whitespace=True, extra="ignore", validate_default=True)
+
+
+class UserForm(FormModel):
+    """POST /users"""
+    name: str = ""
+
+    _check_name = field_validator("name")(parse_person_name)
+
+
+class MovieForm(FormModel):
+    """POST /users/<id>/movies (manual fields are optional)."""
+    movie_name: str = ""
+    director: str = ""
+    year: int | None = None
+    rating: float | None = None
+
+    @field_validator("movie_name")
+    @classmethod
+    def _check_movie_name(cls, value):
+        if not value:
+            raise _error("required", "⚠️ Please enter a movie name.")
+        return value
+
+    _check_year = field_validator("year", mode="before")(parse_year)
+    _check_rating = field_validator("rating", mode="before")(parse_rating)
+
+    @property
+    def is_manual(self) -> bool:
+        """True if the user typed any details (skip the OMDb lookup)."""
+        return bool(self.director or self.year is not None or self.rating is not None)
+
+
+class MovieUpdateForm(FormModel):
+    """POST /users/<id>/movies/<id>/update"""
+    new_title: str = ""
+    new_director: str = ""
+    new_year: int | None = None
+    new_poster: str = ""
+    new_rating: float | None = None
+    version: int | None = None
+
+    _check_year = field_validator("new_year", mode="before")(parse_year)
+    _check_rating = field_validator("new_rating", mode="before")(parse_rating)
+
+    @field_validator("new_poster")
+    @classmethod
+    def _check_poster(cls, value):
+        if value and not URL_RE.match(value):
+            raise _error("url", "⚠️ Poster URL must start with http:// or https://")
+        return value
+
+    @field_validator("version", mode="before")
+    @classmethod
+    def _check_version(cls, value):
+        # A missing/garbled version just means "no optimistic check"
+        value = str(value or "").strip()
+        return int(value) if value.isdigit() else None
+
+    def changes(self) -> dict:
+        """Fields to pass to DataManager.update_movie (unset ones omitted)."""
+        return {k: v for k, v in {
+            "name": self.new_title or None,
+            "director": self.new_director or None,
+            "year": self.new_year,
+            "poster_url": self.new_poster or None,
+            "rating": self.new_rating,
+        }.items() if v is not None}
+
+
+class AiMovieForm(FormModel):
+    """POST /add_ai_movie (values come from our own suggestion cards)."""
+    user_id: int | None = None   # never None once valid: _check_user_id rejects it
+    movie_name: str = ""
+    director: str = ""
+    year: int = 0
+    rating: float = 0.0
+    poster_url: str = ""
+
+    @field_validator("user_id", mode="before")
+    @classmethod
+    def _check_user_id(cls, value):
+        value = str(value or "").strip()
+        if not value.isdigit():
+            raise _error("user_id", "❌ Invalid user selected.")
+        return int(value)
+
+    @field_validator("movie_name")
+    @classmethod
+    def _check_movie_name(cls, value):
+        if not value:
+            raise _error("required", "⚠️ Please enter a movie name.")
+        return value
+
+    @field_validator("year", mode="before")
+    @classmethod
+    def _check_year(cls, value):
+        # Gemini may not know the year; unknown years are stored as 0
+        value = str(value or "").strip()
+        return int(value) if value.isdigit() else 0
+
+    @field_validator("rating", mode="before")
+    @classmethod
+    def _check_rating(cls, value):
+        return parse_rating(value) or 0.0
+
+
+class ContactForm(FormModel):
+    """POST /contact"""
+    name: str = ""
+    email: str = ""
+    message: str = ""
+
+    _check_name = field_validator("name")(parse_person_name)
+
+    @field_validator("email")
+    @classmethod
+    def _check_email(cls, value):
+        if not EMAIL_RE.fullmatch(value):
+            raise _error("email", "⚠️ Please enter a valid email address.")
+        return value
+
+
+class SuggestionQueryForm(FormModel):
+    """POST /ai_suggest"""
+    movie_query: str = ""
+
+    @field_validator("movie_query")
+    @classmethod
+    def _check_query(cls, value):
+        if not value:
+            raise _error("required", "⚠️ Please enter a movie name or topic for suggestions.")
+        return value
+
+
+# -----------------------------
+# ENTRY POINT
+# -----------------------------
+def validate_form(schema: type[BaseModel], data) -> tuple[BaseModel | None, list[dict]]:
+    """
+    Validate a form (MultiDict or dict) against schema.
+
+    Returns:
+        model (BaseModel | None): Parsed payload, or None if invalid
+        errors (list[dict]): [{"field": ..., "message": ...}] in field order
+    """
+    if hasattr(data, "to_dict"):
+        data = data.to_dict()
+    try:
+        return schema.model_validate(data), []
+    except ValidationError as e:
+        return None, [
+            {"field": ".".join(str(part) for part in err["loc"]), "message": err["msg"]}
+            for err in e.errors(include_url=False)
+        ]